@@ -1,61 +1,138 @@
+import zlib
+
 import numpy as np
 import pygame
 from MusicPlayer_base_original import MusicPlayer
-from note_frequence_base import note_to_frequency
+from hauteur import frequency
+from banque_sons import LazySoundBank
+from tampons import make_sound
+from synthese import get_dtype, time_axis, cycles, sine
+from sortie_audio import get_backend
+from enveloppes import ExpDecay, PIANO, GUITARE_ADDITIVE
+
+DRUMS = ["kick", "snare", "hihat", "crash", "tom1", "tom2", "tom3", "ride"]
+
+# fût -> (source, fréquence Hz ou amplitude du bruit, enveloppe)
+DRUM_VOICES = {
+    "kick": ("sine", 60, ExpDecay(5)),
+    "snare": ("noise", 1.0, ExpDecay(12)),
+    "hihat": ("noise", 0.3, ExpDecay(20)),
+    "crash": ("noise", 0.5, ExpDecay(8)),
+    "tom1": ("sine", 100, ExpDecay(8)),
+    "tom2": ("sine", 150, ExpDecay(8)),
+    "tom3": ("sine", 200, ExpDecay(8)),
+    "ride": ("sine", 250, ExpDecay(8)),
+}
+
+def _noise(n, amplitude=1.0, key="bruit"):
+    """Bruit blanc uniforme (-amplitude..amplitude) dans le dtype de synthèse
+
+    La graine ne dépend que de `key` (le fût) et de n, comme la corde de corde.py :
+    un même fût sonne pareil d'une exécution à l'autre, et les captures du backend
+    null restent reproductibles.
+    """
+    rng = np.random.default_rng([zlib.crc32(key.encode()), n])
+    noise = rng.random(n, dtype=get_dtype())
+    noise *= 2 * amplitude
+    noise -= amplitude
+    return noise
 
 
 class Instrument:
     """Classe de base pour tous les instruments"""
 
-    def __init__(self, player: MusicPlayer, nom: str):
+    def __init__(self, player: MusicPlayer, nom: str, sample_rate: int = 44100):
         self.nom = nom
         self.player = player
+        # sans lecteur (rendu hors ligne), on garde la fréquence d'échantillonnage demandée
+        self.sample_rate = player.sample_rate if player is not None else sample_rate
 
     def _note_to_freq(self, note: str):
+        """Fréquence exacte de la note ("A4", "Bb4", "c#5"...) ; ValueError si inconnue"""
         if not note:
-            return 440
-        if note in note_to_frequency:
-            return note_to_frequency[note]
-        note_up = note.upper()
-        if note_up in note_to_frequency:
-            return note_to_frequency[note_up]
-        return 440
-
-    def jouer(self, note: str, duration: float = 0.5):
+            raise ValueError("Note vide")
+        return frequency(note)
+
+    def synthetiser(self, freq: float, duration: float):
+        """Renvoie l'onde mono (valeurs entre -1 et 1) d'une note, sans la jouer"""
+        return sine(freq, int(self.sample_rate * duration), self.sample_rate)
+
+    def jouer(self, note: str, duration: float = 0.5, blocking: bool = True):
         freq = self._note_to_freq(note)
-        self.player.play(freq, duration)
+        return self.player.play(freq, duration, blocking)
 
 
 # --------------------- Instruments spécifiques ---------------------
 class Flute(Instrument):
-    def __init__(self, player):
-        super().__init__(player, "Flûte")
-
-    def jouer(self, note: str, duration: float = 0.5):
+    def __init__(self, player, sample_rate=44100):
+        super().__init__(player, "Flûte", sample_rate)
+
+    def synthetiser(self, freq, duration):
+        # sin(2 pi f t (1 + 0.003 sin(2 pi 5 t))) : phase exacte + écart du vibrato
+        n = int(self.sample_rate * duration)
+        phase = cycles(freq, n, self.sample_rate)
+        # l'écart grandit avec t (des centaines de cycles après une minute) : calculé
+        # en float64 et réduit modulo 1, comme cycles(), avant de passer au dtype de synthèse
+        vibrato = sine(5, n, self.sample_rate, np.float64)
+        vibrato *= time_axis(n, self.sample_rate, np.float64)
+        vibrato *= 0.003 * freq
+        vibrato -= np.floor(vibrato)
+        phase += vibrato.astype(phase.dtype, copy=False)
+        phase -= np.floor(phase)  # on reste dans [0, 1[ : précision float32 préservée
+        phase *= 2 * np.pi
+        return np.sin(phase, out=phase)
+
+    def jouer(self, note: str, duration: float = 0.5, blocking: bool = True):
         freq = self._note_to_freq(note)
-        t = np.linspace(0, duration, int(self.player.sample_rate * duration), False)
-        vibrato = 1.0 + 0.003 * np.sin(2 * np.pi * 5 * t)
-        tone = np.sin(2 * np.pi * freq * t * vibrato)
-        self.player._play_tone(tone, duration)
+        return self.player.play_cached(self.nom, freq, duration, self.synthetiser, blocking)
 
 
 class Guitare(Instrument):
-    def __init__(self, player):
-        super().__init__(player, "Guitare")
-
-    def jouer(self, note: str, duration: float = 0.5):
+    """Corde pincée par modèle physique (Karplus–Strong, voir corde.py)"""
+
+    def __init__(self, player, sample_rate=44100, damping=None, brightness=None):
+        super().__init__(player, "Guitare", sample_rate)
+        from corde import DAMPING, BRIGHTNESS
+        self.damping = DAMPING if damping is None else damping
+        self.brightness = BRIGHTNESS if brightness is None else brightness
+
+    def synthetiser(self, freq, duration):
+        from corde import pluck
+        return pluck(freq, duration, self.sample_rate, self.damping, self.brightness)
+
+    def synthetiser_additif(self, freq, duration):
+        """Ancienne guitare : trois sinus et une enveloppe (gardée pour comparaison)"""
+        n = int(self.sample_rate * duration)
+        tone = sine(freq, n, self.sample_rate)
+        tone *= 0.6
+        for harmonic, gain in ((2, 0.3), (3, 0.1)):
+            partial = sine(harmonic * freq, n, self.sample_rate)
+            partial *= gain
+            tone += partial
+        return GUITARE_ADDITIVE.apply(tone, self.sample_rate)
+
+    def jouer(self, note: str, duration: float = 0.5, blocking: bool = True):
         freq = self._note_to_freq(note)
-        t = np.linspace(0, duration, int(self.player.sample_rate * duration), False)
-        tone = (0.6 * np.sin(2 * np.pi * freq * t) +
-                0.3 * np.sin(2 * np.pi * 2 * freq * t) +
-                0.1 * np.sin(2 * np.pi * 3 * freq * t))
-        env = np.minimum(1, 5 * t) * np.exp(-3 * t)
-        tone = tone * env
-        self.player._play_tone(tone, duration)
+        # les réglages de la corde font partie de la clé du cache
+        cache_name = f"{self.nom}:{self.damping}:{self.brightness}"
+        return self.player.play_cached(cache_name, freq, duration, self.synthetiser, blocking)
 
 
 class Piano(Instrument):
-    ...
+    ENVELOPE = PIANO
+
+    def __init__(self, player, sample_rate=44100):
+        super().__init__(player, "Piano", sample_rate)
+
+    def synthetiser(self, freq, duration):
+        """Même onde que Menu.Piano.make_wave (attaque courte + décroissance)"""
+        wave = sine(freq, int(self.sample_rate * duration), self.sample_rate)
+        return self.ENVELOPE.apply(wave, self.sample_rate)
+
+    def jouer(self, note: str, duration: float = 0.5, blocking: bool = True):
+        freq = self._note_to_freq(note)
+        return self.player.play_cached(self.nom, freq, duration, self.synthetiser, blocking)
+
     def interface_piano(self):
         """Interface graphique du piano"""
         pygame.init()
@@ -111,42 +188,54 @@ class Piano(Instrument):
     
   
 class Batterie(Instrument):
-    def __init__(self, player):
-        super().__init__(player, "Batterie")
+    def __init__(self, player, sample_rate=44100):
+        super().__init__(player, "Batterie", sample_rate)
         self.NOTE_DURATION = 0.5
-        self.SAMPLE_RATE = player.sample_rate
+        self.SAMPLE_RATE = self.sample_rate
         self.drum_sounds = {}
-        pygame.mixer.init(frequency=self.SAMPLE_RATE, size=-16, channels=2)
-        pygame.init()
-        self._prepare_sounds()
+        self._drum_waves = {}
+        # sans lecteur (rendu hors ligne) on n'ouvre pas la carte son
+        if player is not None:
+            get_backend().init(self.SAMPLE_RATE)
+            if not pygame.get_init():
+                pygame.init()
+            self._prepare_sounds()
 
     def _prepare_sounds(self):
-        """Génération des sons synthétiques pour la batterie"""
-        for drum in ["kick", "snare", "hihat", "crash", "tom1", "tom2", "tom3", "ride"]:
-            t = np.linspace(0, self.NOTE_DURATION, int(self.SAMPLE_RATE * self.NOTE_DURATION), False)
-            if drum == "kick":
-                freq = 60
-                wave = np.sin(2 * np.pi * freq * t) * np.exp(-5 * t)
-            elif drum == "snare":
-                wave = np.random.uniform(-1, 1, len(t)) * np.exp(-12 * t)
-            elif drum == "hihat":
-                wave = np.random.uniform(-0.3, 0.3, len(t)) * np.exp(-20 * t)
-            elif drum == "crash":
-                wave = np.random.uniform(-0.5, 0.5, len(t)) * np.exp(-8 * t)
-            else:
-                freq = 100 + 50 * ["tom1", "tom2", "tom3", "ride"].index(drum)
-                wave = np.sin(2 * np.pi * freq * t) * np.exp(-8 * t)
-            wav = np.column_stack((wave, wave))
-            wav = np.ascontiguousarray((32767 * wav).astype(np.int16))
-            self.drum_sounds[drum] = pygame.sndarray.make_sound(wav)
-
-    def jouer(self, note: str = None, duration: float = 0.5):
-        """Jouer un son de batterie générique (bruit)"""
-        t = np.linspace(0, duration, int(self.SAMPLE_RATE * duration), False)
-        noise = np.random.uniform(-1, 1, len(t))
-        envelope = np.exp(-8 * t)
-        tone = noise * envelope
-        self.player._play_tone(tone, duration)
+        """Sons synthétiques de la batterie, construits au premier usage de chaque fût"""
+        self.drum_sounds = LazySoundBank({drum: drum for drum in DRUMS}, self._make_drum_sound)
+
+    def drum_wave(self, drum):
+        """Onde mono float d'un fût, calculée une fois puis gardée (banque et séquenceur)"""
+        wave = self._drum_waves.get(drum)
+        if wave is not None:
+            return wave
+        n = int(self.SAMPLE_RATE * self.NOTE_DURATION)
+        source, value, envelope = DRUM_VOICES[drum]
+        wave = sine(value, n, self.SAMPLE_RATE) if source == "sine" else _noise(n, value, drum)
+        envelope.apply(wave, self.SAMPLE_RATE)
+        return self._drum_waves.setdefault(drum, wave)
+
+    def _make_drum_sound(self, drum):
+        return make_sound(self.drum_wave(drum))
+
+    def sequenceur(self, bars, bpm=120, swing=0.0):
+        """Séquenceur pas à pas qui réutilise les sons de cette batterie"""
+        from sequenceur import DrumSequencer
+        return DrumSequencer(self, bars, bpm, swing)
+
+    ENVELOPE = ExpDecay(8)
+
+    def synthetiser(self, freq=None, duration=0.5):
+        """Son de batterie générique (bruit), la fréquence est ignorée"""
+        noise = _noise(int(self.SAMPLE_RATE * duration))
+        return self.ENVELOPE.apply(noise, self.SAMPLE_RATE)
+
+    def jouer(self, note: str = None, duration: float = 0.5, blocking: bool = True):
+        """Jouer un fût ("kick", "snare"...) déjà synthétisé, sinon un son générique (bruit)"""
+        if note in DRUMS:
+            return self.player._play_tone(self.drum_wave(note), duration, blocking)
+        return self.player._play_tone(self.synthetiser(None, duration), duration, blocking)
 
     def interface_drum(self):
         """Interface graphique de la batterie"""
@@ -2,18 +2,36 @@
 # -*- coding: utf-8 -*-
 """
 CLI orientée objet : Choix d'un instrument + mode de jeu
+
+pygame, numpy et les modules qui en dépendent ne sont importés qu'à leur
+premier usage (ou en arrière-plan, voir prechauffer) : le menu s'affiche
+sans attendre leur chargement.
 """
-import random
-import pygame
-import numpy as np
-from note_frequence_base import note_to_frequency
-from Sequence_rand import main as main_sequence_rand
+import os
+import threading
+import time
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+from banque_sons import LazySoundBank
+
+if TYPE_CHECKING:
+    from MusicPlayer_base_original import MusicPlayer
 
-# --- Classe MusicPlayer de base ---
-from MusicPlayer_base_original import MusicPlayer
+_DEBUT = time.perf_counter()
 
-# --- Classe Instrument ---
-from Instrument import Guitare, Batterie, Flute
+# modules lourds chargés pendant que l'utilisateur lit le menu
+MODULES_LOURDS = ("pygame", "numpy", "MusicPlayer_base_original", "Instrument", "Sequence_rand")
+
+
+def prechauffer():
+    """Importe les modules lourds dans un thread d'arrière-plan"""
+    def _importer():
+        for nom in MODULES_LOURDS:
+            import_module(nom)
+    thread = threading.Thread(target=_importer, name="prechauffage", daemon=True)
+    thread.start()
+    return thread
 
 
 def normaliser(texte: str) -> str:
@@ -21,7 +39,7 @@ def normaliser(texte: str) -> str:
 
 
 class Guitare:
-    def __init__(self, player: MusicPlayer):
+    def __init__(self, player: "MusicPlayer"):
         self.nom = "Guitare"
         self.player = player
         self.SAMPLE_RATE = 44100
@@ -29,13 +47,16 @@ class Guitare:
         self.CHANNELS = 2
         self.MAX_VOLUME = 0.6
         self.NOTE_DURATION = 1.5
-        self.record_file = "touches_guitare.txt"
-        self.recorded_notes = []
+        self.DAMPING = 0.996     # corde Karplus–Strong (voir corde.py)
+        self.BRIGHTNESS = 0.0
+        self.FPS = 60  # plafond de redessin de l'interface
+        self.record_file = "touches_guitare.txt"  # une session existante n'est jamais écrasée
 
+        import pygame
+        from sortie_audio import get_backend
         if not pygame.get_init():
             pygame.init()
-        if not pygame.mixer.get_init():
-            pygame.mixer.init(frequency=self.SAMPLE_RATE, size=self.BITS, channels=self.CHANNELS)
+        get_backend().init(self.SAMPLE_RATE)
 
         self.KEY_NOTE_MAP = {
             pygame.K_a: "E3",
@@ -46,70 +67,117 @@ class Guitare:
             pygame.K_y: "E5",
         }
 
-        self.note_sounds = {}
-        for key, note in self.KEY_NOTE_MAP.items():
-            freq = note_to_frequency[note]
-            wave = self.make_guitar_wave(freq)
-            arr = self.to_stereo(wave)
-            self.note_sounds[key] = pygame.sndarray.make_sound(arr)
+        # sons construits en arrière-plan (ou à la première frappe)
+        self.note_sounds = LazySoundBank(self.KEY_NOTE_MAP, self.make_sound)
+        self.note_sounds.warm_up()
+
+    def make_sound(self, note):
+        from hauteur import frequency
+        from tampons import make_sound
+        return make_sound(self.make_guitar_wave(frequency(note)), self.MAX_VOLUME)
 
     def make_guitar_wave(self, freq, duration=None):
+        from corde import pluck
         if duration is None:
             duration = self.NOTE_DURATION
-        t = np.linspace(0, duration, int(self.SAMPLE_RATE * duration), False)
-        wave = 0.7*np.sin(2*np.pi*freq*t) + 0.3*np.sin(2*np.pi*2*freq*t) + 0.2*np.sin(2*np.pi*3*freq*t)
-        envelope = np.linspace(0, 1, int(0.005*self.SAMPLE_RATE))
-        wave[:len(envelope)] *= envelope
-        return wave.astype(np.float32)
+        # ~1 ms par corde : toute la banque se construit sans ralentir l'ouverture
+        return pluck(freq, duration, self.SAMPLE_RATE, self.DAMPING, self.BRIGHTNESS)
 
     def to_stereo(self, wave, volume=None):
+        from tampons import to_int16_stereo
         if volume is None:
             volume = self.MAX_VOLUME
-        wav = np.clip(wave * (32767 * volume), -32768, 32767).astype(np.int16)
-        if self.CHANNELS == 2:
-            wav = np.column_stack((wav, wav))
-        return wav
+        return to_int16_stereo(wave, volume)
 
     def interface_guitare(self):
         """Affiche l'interface guitare et enregistre les touches jouées"""
+        import os
+        import pygame
+        from affichage import DirtyRectScreen
+        from enregistreur import SessionRecorder, unique_path, FLUSH_INTERVAL
+        from latence import LatencyMonitor, REFRESH, enabled_from_env as latency_enabled
         # Ferme l'ancienne fenêtre si existante
         pygame.display.quit()
         pygame.display.init()
         window = pygame.display.set_mode((600, 200))
         pygame.display.set_caption("Clavier Guitare")
         font = pygame.font.SysFont(None, 28)
+        small_font = pygame.font.SysFont(None, 18)
+        latency = LatencyMonitor(self.nom) if latency_enabled() else None
 
         running = True
         pressed_keys = set()
 
+        # libellés rendus une seule fois (normal / enfoncé) et zone de chaque ligne
+        labels, rows = {}, {}
+        y = 40
+        for k, note in self.KEY_NOTE_MAP.items():
+            text = f"Touche {pygame.key.name(k)} -> {note}"
+            labels[k] = (font.render(text, True, (255, 255, 100)), font.render(text, True, (255, 0, 0)))
+            rows[k] = pygame.Rect(20, y, 560, 25)
+            y += 25
+        overlay_rect = pygame.Rect(10, 8, 580, 20)
+        overlay_text = ""
+
+        def draw_region(rect):
+            window.fill((20, 20, 20), rect)
+            for k, row in rows.items():
+                if row.colliderect(rect):
+                    window.blit(labels[k][k in pressed_keys], row.topleft)
+            if latency and overlay_rect.colliderect(rect):
+                window.blit(small_font.render(overlay_text, True, (150, 150, 150)), overlay_rect.topleft)
+
+        screen = DirtyRectScreen(window, draw_region, self.FPS)
+        screen.mark_all()
+        # réveil périodique même sans touche : overlay de latence, vidage de l'enregistrement
+        idle_timeout = int(min(REFRESH, FLUSH_INTERVAL) * 1000) if latency else int(FLUSH_INTERVAL * 1000)
+
+        # les notes partent sur le disque au fil de l'eau (instants réels, silences compris)
+        recorder = SessionRecorder(unique_path(self.record_file))
         while running:
-            for event in pygame.event.get():
+            events = screen.next_events(idle_timeout)
+            if latency and events:
+                # la frame commence au réveil : l'attente au repos n'est pas comptée
+                latency.begin_frame(screen.woke_at, screen.arrived_at)
+            for event in events:
                 if event.type == pygame.QUIT:  # Croix fermée
                     running = False
                 elif event.type == pygame.KEYDOWN:
                     if event.key in self.note_sounds:
                         self.note_sounds[event.key].play()
+                        if latency:
+                            latency.key_played()
                         pressed_keys.add(event.key)
-                        self.recorded_notes.append(f"{self.KEY_NOTE_MAP[event.key]} {self.NOTE_DURATION:.3f}")
+                        screen.mark(rows[event.key])
+                        recorder.note_on(self.KEY_NOTE_MAP[event.key])
                     elif event.key == pygame.K_ESCAPE:
                         running = False
                 elif event.type == pygame.KEYUP:
-                    pressed_keys.discard(event.key)
-
-            window.fill((20, 20, 20))
-            y = 40
-            for k, note in self.KEY_NOTE_MAP.items():
-                color = (255, 0, 0) if k in pressed_keys else (255, 255, 100)
-                img = font.render(f"Touche {pygame.key.name(k)} -> {note}", True, color)
-                window.blit(img, (20, y))
-                y += 25
-            pygame.display.flip()
-
-        # Sauvegarde des notes
-        with open(self.record_file, "w", encoding="utf-8") as f:
-            for line in self.recorded_notes:
-                f.write(line + "\n")
-        print(f"💾 Enregistrement guitare sauvegardé dans {self.record_file}")
+                    if event.key in self.KEY_NOTE_MAP:
+                        recorder.note_off(self.KEY_NOTE_MAP[event.key])
+                    if event.key in pressed_keys:
+                        pressed_keys.discard(event.key)
+                        screen.mark(rows[event.key])
+                elif screen.is_expose(event):
+                    screen.mark_all()
+
+            if latency and latency.overlay_text() != overlay_text:
+                overlay_text = latency.overlay_text()
+                screen.mark(overlay_rect)
+            screen.flush()
+            if latency and events:
+                latency.end_frame()
+            recorder.tick()
+        recorder.close()
+
+        if latency:
+            print(f"⏱️ Latences enregistrées dans {latency.dump()}")
+
+        if recorder.notes:
+            print(f"💾 Enregistrement guitare sauvegardé dans {recorder.path}")
+        else:
+            os.remove(recorder.path)
+            print("🎵 Aucune note enregistrée, rien à sauvegarder.")
 
         # Ferme juste la fenêtre Pygame, pas tout Pygame
         pygame.display.quit()
@@ -117,7 +185,7 @@ class Guitare:
 
 # ========================= CLASSE PIANO =========================
 class Piano:
-    def __init__(self, player: MusicPlayer):
+    def __init__(self, player: "MusicPlayer"):
         self.nom = "Piano"
         self.player = player
         self.SAMPLE_RATE = 44100
@@ -125,12 +193,13 @@ class Piano:
         self.CHANNELS = 2
         self.MAX_VOLUME = 0.5
         self.NOTE_DURATION = 1.0
+        self.FPS = 60  # plafond de redessin de l'interface
         self.record_file = "touches_piano.txt"
-        self.recorded_notes = []
 
+        import pygame
+        from sortie_audio import get_backend
         if not pygame.get_init(): pygame.init()
-        if not pygame.mixer.get_init():
-            pygame.mixer.init(frequency=self.SAMPLE_RATE, size=self.BITS, channels=self.CHANNELS)
+        get_backend().init(self.SAMPLE_RATE)
 
         self.KEY_NOTE_MAP = {
             pygame.K_a:"C4", pygame.K_1:"C#4", pygame.K_z:"D4", pygame.K_2:"D#4",
@@ -141,30 +210,33 @@ class Piano:
             pygame.K_SEMICOLON:"G#5", pygame.K_g:"G4", pygame.K_h:"A4", pygame.K_j:"B4"
         }
 
-        self.note_sounds = {}
-        for key,note in self.KEY_NOTE_MAP.items():
-            freq = note_to_frequency[note]
-            wave = self.make_wave(freq)
-            arr = self.to_stereo(wave)
-            self.note_sounds[key] = pygame.sndarray.make_sound(arr)
+        # sons construits en arrière-plan (ou à la première frappe)
+        self.note_sounds = LazySoundBank(self.KEY_NOTE_MAP, self.make_sound)
+        self.note_sounds.warm_up()
+
+    def make_sound(self, note):
+        from hauteur import frequency
+        from tampons import make_sound
+        return make_sound(self.make_wave(frequency(note)), self.MAX_VOLUME)
 
     def make_wave(self,freq,duration=None):
+        from synthese import sine
+        from enveloppes import PIANO
         if duration is None: duration=self.NOTE_DURATION
-        t = np.linspace(0,duration,int(self.SAMPLE_RATE*duration),False)
-        wave = np.sin(2*np.pi*freq*t)
-        attack = int(0.02*self.SAMPLE_RATE)
-        envelope = np.ones_like(wave)
-        envelope[:attack] = np.linspace(0,1,attack)
-        envelope[attack:] = np.exp(-3*(t[attack:]/duration))
-        return (wave*envelope).astype(np.float32)
+        wave = sine(freq,int(self.SAMPLE_RATE*duration),self.SAMPLE_RATE)  # directement dans le dtype de synthèse
+        return PIANO.apply(wave,self.SAMPLE_RATE)  # courbe calculée une fois par durée
 
     def to_stereo(self,wave,volume=None):
+        from tampons import to_int16_stereo
         if volume is None: volume=self.MAX_VOLUME
-        wav = np.clip(wave*(32767*volume), -32768,32767).astype(np.int16)
-        if self.CHANNELS==2: wav = np.column_stack((wav,wav))
-        return wav
+        return to_int16_stereo(wave,volume)
 
     def interface_piano(self):
+        import os
+        import pygame
+        from affichage import DirtyRectScreen
+        from enregistreur import SessionRecorder, unique_path, FLUSH_INTERVAL
+        from latence import LatencyMonitor, REFRESH, enabled_from_env as latency_enabled
         pygame.display.quit()
         pygame.display.init()
         white_keys_list = [pygame.K_a,pygame.K_z,pygame.K_e,pygame.K_r,pygame.K_t,pygame.K_y,
@@ -182,72 +254,131 @@ class Piano:
         white_key_width, white_key_height = 60, 250
         black_key_width, black_key_height = 35, 150
         black_positions = [0,1,3,4,5,7,8,10,11,12]
-
+        latency = LatencyMonitor(self.nom) if latency_enabled() else None
+        small_font = pygame.font.SysFont(None,18)
+
+        # géométrie et libellés calculés une seule fois
+        white_rects = {key: pygame.Rect(i*white_key_width,0,white_key_width,white_key_height)
+                       for i,key in enumerate(white_keys_list)}
+        black_rects = {key: pygame.Rect(black_positions[i]*white_key_width+white_key_width-black_key_width//2,
+                                        0,black_key_width,black_key_height)
+                       for i,key in enumerate(black_keys_list) if i < len(black_positions)}
+        white_labels = {key: font.render(pygame.key.name(key),True,BLACK) for key in white_rects}
+        black_labels = {key: font.render(pygame.key.name(key),True,WHITE) for key in black_rects}
+        overlay_rect = pygame.Rect(10,white_key_height+20,14*60-20,20)
+        overlay_text = ""
+
+        def draw_region(rect):
+            # la zone est déjà clippée : on redessine tout ce qui la touche, noires par-dessus
+            window.fill((30,30,30),rect)
+            for key,r in white_rects.items():
+                if r.colliderect(rect):
+                    pygame.draw.rect(window,RED if key in pressed_keys else WHITE,r)
+                    pygame.draw.rect(window,BLACK,r,2)
+                    window.blit(white_labels[key],(r.x+10,white_key_height-30))
+            for key,r in black_rects.items():
+                if r.colliderect(rect):
+                    pygame.draw.rect(window,BLUE_PRESSED if key in pressed_keys else BLACK,r)
+                    pygame.draw.rect(window,GRAY,r,2)
+                    window.blit(black_labels[key],(r.x+5,30))
+            if latency and overlay_rect.colliderect(rect):
+                window.blit(small_font.render(overlay_text,True,(150,150,150)),overlay_rect.topleft)
+
+        def key_rect(key):
+            return white_rects.get(key) or black_rects.get(key)
+
+        screen = DirtyRectScreen(window,draw_region,self.FPS)
+        screen.mark_all()
+        # réveil périodique même sans touche : overlay de latence, vidage de l'enregistrement
+        idle_timeout = int(min(REFRESH, FLUSH_INTERVAL) * 1000) if latency else int(FLUSH_INTERVAL * 1000)
+
+        # les notes partent sur le disque au fil de l'eau (instants réels, silences compris)
+        recorder = SessionRecorder(unique_path(self.record_file))
         while running:
-            for event in pygame.event.get():
+            events = screen.next_events(idle_timeout)
+            if latency and events:
+                # la frame commence au réveil : l'attente au repos n'est pas comptée
+                latency.begin_frame(screen.woke_at, screen.arrived_at)
+            for event in events:
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.KEYDOWN:
                     if event.key in self.note_sounds:
                         self.note_sounds[event.key].play()
+                        if latency:
+                            latency.key_played()
                         pressed_keys.add(event.key)
-                        self.recorded_notes.append(f"{self.KEY_NOTE_MAP[event.key]} {self.NOTE_DURATION:.3f}")
+                        if key_rect(event.key):
+                            screen.mark(key_rect(event.key))
+                        recorder.note_on(self.KEY_NOTE_MAP[event.key])
                     elif event.key == pygame.K_ESCAPE:
                         running = False
                 elif event.type == pygame.KEYUP:
-                    pressed_keys.discard(event.key)
-
-            window.fill((30,30,30))
-            for i,key in enumerate(white_keys_list):
-                color = RED if key in pressed_keys else WHITE
-                pygame.draw.rect(window,color,(i*white_key_width,0,white_key_width,white_key_height))
-                pygame.draw.rect(window,BLACK,(i*white_key_width,0,white_key_width,white_key_height),2)
-                window.blit(font.render(pygame.key.name(key),True,BLACK),(i*white_key_width+10,white_key_height-30))
-            for i,key in enumerate(black_keys_list):
-                if i < len(black_positions):
-                    x = black_positions[i]*white_key_width+white_key_width-black_key_width//2
-                    color = BLUE_PRESSED if key in pressed_keys else BLACK
-                    pygame.draw.rect(window,color,(x,0,black_key_width,black_key_height))
-                    pygame.draw.rect(window,GRAY,(x,0,black_key_width,black_key_height),2)
-                    window.blit(font.render(pygame.key.name(key),True,WHITE),(x+5,30))
-            pygame.display.flip()
+                    if event.key in self.KEY_NOTE_MAP:
+                        recorder.note_off(self.KEY_NOTE_MAP[event.key])
+                    if event.key in pressed_keys:
+                        pressed_keys.discard(event.key)
+                        if key_rect(event.key):
+                            screen.mark(key_rect(event.key))
+                elif screen.is_expose(event):
+                    screen.mark_all()
+
+            if latency and latency.overlay_text() != overlay_text:
+                overlay_text = latency.overlay_text()
+                screen.mark(overlay_rect)
+            screen.flush()
+            if latency and events:
+                latency.end_frame()
+            recorder.tick()
+        recorder.close()
+
+        if latency:
+            print(f"⏱️ Latences enregistrées dans {latency.dump()}")
 
         # Ferme juste la fenêtre Pygame
         pygame.display.quit()
 
         # --- Demande à l'utilisateur s'il veut sauvegarder ---
-        if not self.recorded_notes:
+        if not recorder.notes:
+            os.remove(recorder.path)
             print("🎵 Aucune note enregistrée, rien à sauvegarder.")
             return
 
+        # la session est déjà sur le disque : on la garde (éventuellement renommée) ou on l'efface
         sauvegarder = input("Voulez-vous sauvegarder les notes jouées ? (o/n) : ").strip().lower()
         if sauvegarder == "o":
-            nom_fichier = input(f"Nom du fichier (laisser vide pour '{self.record_file}') : ").strip()
-            if not nom_fichier:
-                nom_fichier = self.record_file
-            with open(nom_fichier, "w", encoding="utf-8") as f:
-                for line in self.recorded_notes:
-                    f.write(line + "\n")
+            nom_fichier = input(f"Nom du fichier (laisser vide pour '{recorder.path}', "
+                                f"se termine par .mid pour un fichier MIDI) : ").strip()
+            if nom_fichier.lower().endswith((".mid", ".midi")):
+                from midi import score_to_midi
+                score_to_midi(recorder.path, nom_fichier)
+                os.remove(recorder.path)
+            elif nom_fichier and nom_fichier != recorder.path:
+                os.replace(recorder.path, nom_fichier)
+            else:
+                nom_fichier = recorder.path
             print(f"💾 Enregistrement sauvegardé dans {nom_fichier}")
         else:
+            os.remove(recorder.path)
             print("❌ Les notes ne seront pas sauvegardées.")
 
 
 
 # --- Menu principal ---
 class Menu:
+    # Batterie et Flute viennent d'Instrument.py, importé seulement une fois choisies
     INSTRUMENTS = {
         "1": Piano,
         "2": Guitare,
-        "3": Batterie,
-        "4": Flute,
+        "3": "Batterie",
+        "4": "Flute",
         "piano": Piano,
         "guitare": Guitare,
-        "batterie": Batterie,
-        "flute": Flute,
-        "flûte": Flute,
-        "drum": Batterie,
-        "drums": Batterie,
+        "batterie": "Batterie",
+        "flute": "Flute",
+        "flûte": "Flute",
+        "drum": "Batterie",
+        "drums": "Batterie",
     }
 
     MODES = {
@@ -263,9 +394,17 @@ class Menu:
     def __init__(self):
         self.instrument = None
         self.mode = None
-        self.player = MusicPlayer()
+        self._player = None
         self.enable_guitar_hero = False
 
+    @property
+    def player(self):
+        # la carte son n'est ouverte qu'une fois l'instrument choisi
+        if self._player is None:
+            from MusicPlayer_base_original import MusicPlayer
+            self._player = MusicPlayer()
+        return self._player
+
     def afficher_menu_instruments(self):
         print("=== Choix de l'instrument ===")
         print("1) Piano")
@@ -285,10 +424,15 @@ class Menu:
     def choisir_instrument(self):
         while True:
             self.afficher_menu_instruments()
+            if os.environ.get("MENU_TIMING"):
+                print(f"⏱️ Menu prêt en {1000 * (time.perf_counter() - _DEBUT):.1f} ms")
             choix = normaliser(
                 input("Entrez le numéro ou le nom de l'instrument : "))
             if choix in self.INSTRUMENTS:
-                return self.INSTRUMENTS[choix](self.player)
+                classe = self.INSTRUMENTS[choix]
+                if isinstance(classe, str):
+                    classe = getattr(import_module("Instrument"), classe)
+                return classe(self.player)
             elif choix in ("q", "quit", "exit"):
                 return None
             else:
@@ -353,6 +497,7 @@ class Menu:
 
 # === Modes génériques pour autres instruments ===
 def mode_clavier(instrument):
+    from note_frequence_base import note_to_frequency
     print("🎼 Mode clavier (a–z)")
     alphabet = [chr(i) for i in range(ord("a"), ord("z") + 1)]
     notes = list(note_to_frequency.keys())
@@ -366,12 +511,13 @@ def mode_clavier(instrument):
         elif touche in mapping:
             note = mapping[touche]
             print(f"🎵 Lettre '{touche}' → note {note}")
-            instrument.jouer(note, 0.5)
+            instrument.jouer(note, 0.5, blocking=False)
         else:
             print("❌ Entrée invalide (a–z seulement).")
 
 
 def mode_aleatoire(instrument):
+    from Sequence_rand import main as main_sequence_rand
     print("🎲 Mode aléatoire : lancement de la séquence aléatoire")
     enable_guitar_hero = main_sequence_rand()
     print("✅ Séquence aléatoire terminée.")
@@ -379,6 +525,7 @@ def mode_aleatoire(instrument):
 
 
 def menu_fichier(instrument):
+    from MusicPlayer_base_original import MusicPlayer
     fichiers = ["pirate.txt", "mario.txt"]
     for i, f in enumerate(fichiers, 1):
         print(f"{i}) {f}")
@@ -399,6 +546,7 @@ def menu_fichier(instrument):
 
 
 if __name__ == "__main__":
+    prechauffer()
     while True:
         jeu = Menu()
         jeu.lancer()
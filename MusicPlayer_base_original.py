@@ -1,62 +1,76 @@
 # installer avec: pip install pygame
 #                 pip install numpy 
       
-import numpy as np
-import pygame
 
-from note_frequence_base import note_to_frequency
+from partition_binaire import load_score
+from cache_sons import shared_cache, sound_key
+from tampons import make_sound
+from synthese import sine
+from flux_audio import get_stream
+from sortie_audio import get_backend
 
-# classe qui permet de jouer de la musique grâce à pygame
+# classe qui permet de jouer de la musique grâce à pygame (ou au backend choisi, voir sortie_audio)
 class MusicPlayer:
     def __init__(self, sample_rate=44100):
-        pygame.mixer.init(frequency=44100, size=-16, channels=2)
+        self.backend = get_backend()
+        self.backend.init(sample_rate)
+        self.clock = self.backend.clock  # horloge virtuelle : les attentes ne durent rien
         self.sample_rate = sample_rate
+        self.volume = 0.05
 
     # c'est le tone passé en entrée qu'il faudra modifier en fonction de l'instrument joué
     # cette méthode pourra être appelée ensuite quelque soit l'instrument choisis
-    def _play_tone(self, tone, duration):
-        stereo_tone = np.vstack((tone, tone)).T
-        contiguous_tone = np.ascontiguousarray((32767 * stereo_tone).astype(np.int16))
-        sound = pygame.sndarray.make_sound(contiguous_tone)
+    # blocking=False : la note part dans le flux audio et on rend la main tout de suite
+    def _play_tone(self, tone, duration, blocking=True):
+        if not blocking:
+            return get_stream(self.sample_rate).schedule(tone, gain=self.volume)
+        sound = make_sound(tone)  # tampon int16 de la réserve commune, rendu aussitôt
         sound.set_volume(0.05)  # Réglez le volume
         sound.play()
-        pygame.time.delay(int(duration * 1000)) #tenir la note la durée voulue
+        self.clock.sleep(duration) #tenir la note la durée voulue
 
-    # Exemple de tonalité, extraire ce qui va bien pour pouvoir faire varier, pour simuler différents instruments
-    def play(self, frequency, duration):
-        # Créer une onde sinusoïdale à la fréquence spécifiée
-        t = np.linspace(0, duration, int(self.sample_rate * duration), False)
-        tone = np.sin(frequency * 2 * np.pi * t)
-
-        # Créer un tableau stéréo (2D) en dupliquant le ton
-        stereo_tone = np.vstack((tone, tone)).T
+    # joue un son déjà prêt (par exemple sorti du cache partagé)
+    def _play_sound(self, sound, duration):
+        sound.play()
+        self.clock.sleep(duration) #tenir la note la durée voulue
 
-        # S'assurer que le tableau est contigu en mémoire
-        contiguous_tone = np.ascontiguousarray((32767 * stereo_tone).astype(np.int16))
+    # joue une note en passant par le cache : synth(frequency, duration) n'est appelé
+    # que si ce couple (instrument, note, durée) n'a pas déjà été synthétisé
+    def play_cached(self, instrument, frequency, duration, synth, blocking=True):
+        key = sound_key(instrument, frequency, duration, self.sample_rate, self.volume)
+        if not blocking:
+            samples = shared_cache.get_array(key, lambda: synth(frequency, duration))
+            return get_stream(self.sample_rate).schedule(samples, gain=self.volume)
+        sound = shared_cache.get_sound(key, lambda: synth(frequency, duration))
+        self._play_sound(sound, duration)
 
-        # Convertir l'onde sinusoïdale en un format audio et jouer
-        sound = pygame.sndarray.make_sound(contiguous_tone)
-        sound.set_volume(0.05)  # Réglez le volume
-        sound.play()
-        pygame.time.delay(int(duration * 1000)) 
+    # Exemple de tonalité, extraire ce qui va bien pour pouvoir faire varier, pour simuler différents instruments
+    def make_tone(self, frequency, duration):
+        # Créer une onde sinusoïdale à la fréquence spécifiée (dtype de synthèse, phase exacte)
+        return sine(frequency, int(self.sample_rate * duration), self.sample_rate)
 
-    def play_from_file(self, filename):
-        with open(filename, "r") as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) != 2:
-                    continue
+    def play(self, frequency, duration, blocking=True):
+        return self.play_cached("sinus", frequency, duration, self.make_tone, blocking)
 
-                note, dur = parts[0], float(parts[1])
+    def play_from_file(self, filename, depth=None, max_voices=None):
+        # partition texte (compilée au besoin) ou .npart, chargée sans re-parser le texte
+        score = load_score(filename)
+        # les notes suivantes sont synthétisées dans un thread pendant que la note courante joue
+        # (voir prelecture.py) ; renvoie les mesures de la file (profondeur, attentes)
+        from prelecture import PlaybackPipeline, DEPTH
+        if score.polyphonic:
+            # accords : les voix sont mélangées par blocs dans ce même thread (polyphonie plafonnée)
+            from mixage import VoiceMixer, MAX_VOICES
+            synth, mixer = self.make_tone, VoiceMixer(self.sample_rate, max_voices or MAX_VOICES)
+        else:
+            synth, mixer = self._cached_array, None
+        pipeline = PlaybackPipeline(get_stream(self.sample_rate), synth,
+                                    self.volume, depth or DEPTH, mixer=mixer)
+        return pipeline.play(score)
 
-                # Silence (repos) si "0" ou "Unknown"
-                if note == "0" or note.lower() == "unknown":
-                    pygame.time.delay(int(dur * 1000))
-                else:
-                    if note in note_to_frequency:
-                        self.play(note_to_frequency[note], dur)
-                    else:
-                        print(f"⚠️ Note inconnue ignorée : {note}")
+    def _cached_array(self, frequency, duration):
+        key = sound_key("sinus", frequency, duration, self.sample_rate, self.volume)
+        return shared_cache.get_array(key, lambda: self.make_tone(frequency, duration))
 
 
 
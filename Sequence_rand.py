@@ -1,68 +1,55 @@
 import numpy as np
-import pygame
-import random
 
-from note_frequence_base import note_to_frequency
+from aleatoire import RandomSequence
+from cache_sons import shared_cache, sound_key
+from flux_audio import get_stream
+from synthese import synthesize_sequence, note_lengths, sine
 from guitar_hero import play_guitar_hero
+from sortie_audio import get_backend
+from enveloppes import ANTI_CLIC
 
 
 class MusicPlayer:
     def __init__(self, sample_rate=44100):
-        pygame.mixer.pre_init(frequency=sample_rate, size=-16, channels=2)
-        pygame.init()
+        self.backend = get_backend()
+        self.backend.init(sample_rate)
         self.sample_rate = sample_rate
+        self.volume = 0.1
 
     def _make_tone(self, frequency, duration=0.5):
-        t = np.linspace(0, duration, int(
-            self.sample_rate * duration), endpoint=False)
-        wave = np.sin(2 * np.pi * frequency * t)
+        key = sound_key("sequence", frequency, duration, self.sample_rate, self.volume)
+        return shared_cache.get_sound(key, lambda: self._make_wave(frequency, duration))
+
+    def _make_wave(self, frequency, duration=0.5):
+        wave = sine(frequency, int(self.sample_rate * duration), self.sample_rate)
 
         # Petit envelope pour éviter les clics
-        attack_len = int(0.01 * self.sample_rate)
-        decay_len = int(0.01 * self.sample_rate)
-        env = np.ones_like(wave)
-        env[:attack_len] = np.linspace(0, 1, attack_len)
-        env[-decay_len:] = np.linspace(1, 0, decay_len)
-        wave *= env
-
-        stereo = np.vstack((wave, wave)).T
-        audio = np.ascontiguousarray((32767 * stereo).astype(np.int16))
-        sound = pygame.sndarray.make_sound(audio)
-        sound.set_volume(0.1)
-        return sound
+        return ANTI_CLIC.apply(wave, self.sample_rate)
 
     def play(self, frequency, duration=0.5):
         sound = self._make_tone(frequency, duration)
         sound.play()
-        pygame.time.delay(int(duration * 1000))
-
+        self.backend.clock.sleep(duration)
 
-def generate_random_sequence(length=20, mode="mixte"):
-    """Génère une séquence de (note, fréquence, durée) selon le mode choisi."""
-    notes = list(note_to_frequency.keys())
-    sequence = []
+    def play_sequence(self, frequencies, durations):
+        """Synthétise toute la séquence d'un coup (phase continue) et la place dans le flux
 
-    # Définir la durée selon le mode choisi
-    if mode == "court":
-        fixed_duration = 0.5
-    elif mode == "moyen":
-        fixed_duration = 1.5
-    elif mode == "long":
-        fixed_duration = 3.0
-    else:
-        fixed_duration = None  # mixte => aléatoire
+        Renvoie la VoiceHandle et la trame de départ de chaque note.
+        """
+        signal = synthesize_sequence(frequencies, durations, self.sample_rate)
+        handle = get_stream(self.sample_rate).enqueue(signal, gain=self.volume)
+        lengths = note_lengths(durations, self.sample_rate)
+        onsets = handle.start + np.cumsum(lengths) - lengths
+        return handle, onsets
 
-    for _ in range(length):
-        note = random.choice(notes)
-        freq = note_to_frequency[note]
 
-        if fixed_duration is not None:
-            duration = fixed_duration
-        else:
-            duration = random.uniform(0.5, 3.0)
+def generate_random_sequence(length=20, mode="mixte", seed=None, **constraints):
+    """Génère une séquence de (note, fréquence, durée) selon le mode choisi.
 
-        sequence.append((note, freq, duration))
-    return sequence
+    seed : même graine, même séquence ; constraints : scale, key, low, high
+    (voir aleatoire.RandomSequence).
+    """
+    return RandomSequence(seed, mode, **constraints).take(length)
 
 
 def ask_sequence_length():
@@ -84,7 +71,8 @@ def ask_duration_mode():
         "1": ("court", "0.5 s"),
         "2": ("moyen", "1.5 s"),
         "3": ("long", "3.0 s"),
-        "4": ("mixte", "durées aléatoires (0.5–3.0 s)")
+        "4": ("mixte", "durées aléatoires (0.5–3.0 s)"),
+        "5": ("mélodie", "notes et durées apprises sur les partitions")
     }
 
     print("\nChoisissez la durée des notes :")
@@ -92,20 +80,33 @@ def ask_duration_mode():
         print(f"{k}. {m.capitalize()} ({desc})")
 
     while True:
-        choice = input("Votre choix (1-4) : ").strip()
+        choice = input("Votre choix (1-5) : ").strip()
         if choice in modes:
             return modes[choice][0]
-        print("❌ Choix invalide, veuillez entrer 1, 2, 3 ou 4.")
+        print("❌ Choix invalide, veuillez entrer 1, 2, 3, 4 ou 5.")
 
 
-def launch_sequence(length, mode, mp):
-    seq = generate_random_sequence(length=length, mode=mode)
-    for i, (note, freq, dur) in enumerate(seq, start=1):
-        print(f"[{i}/{length}] Lecture : {note}, {freq} Hz, Durée : {dur:.2f} s")
-        mp.play(freq, dur)
-
-
-def main():
+def launch_sequence(length, mode, mp, seed=None):
+    if mode == "mélodie":
+        # chaîne de Markov apprise sur pirate, mario et les sessions enregistrées
+        from melodie import load_model
+        generator = load_model().generate(seed)
+    else:
+        generator = RandomSequence(seed, mode)
+    print(f"🎲 Graine : {generator.seed} (MUSIC_SEED={generator.seed} pour rejouer la même séquence)")
+    seq = generator.take(length)
+    # toute la séquence est synthétisée en une passe puis jouée par le flux audio
+    handle, onsets = mp.play_sequence([freq for _, freq, _ in seq], [dur for _, _, dur in seq])
+    stream = get_stream(mp.sample_rate)
+    for i, ((note, freq, dur), onset) in enumerate(zip(seq, onsets), start=1):
+        stream.wait_for(onset)
+        print(f"[{i}/{length}] Lecture : {note}, {freq:.1f} Hz, Durée : {dur:.2f} s")
+    handle.wait()
+    return seq
+
+
+def main(midi_file=None):
+    """midi_file : la séquence jouée est aussi exportée dans ce fichier MIDI"""
     mp = MusicPlayer()
     enable_guitar_hero = False
     # Demander le nombre de notes
@@ -120,15 +121,21 @@ def main():
         is_first_time = True
         if enable_guitar_hero and is_first_time:
             is_first_time = False
-        launch_sequence(length, mode, mp)
+        seq = launch_sequence(length, mode, mp)
         print("\n🎸 Mode Guitar Hero activé !")
         print("Retrouver le mode dans le menu principal !\n")
     else:
-        launch_sequence(length, mode, mp)
+        seq = launch_sequence(length, mode, mp)
 
+    if midi_file:
+        from midi import sequence_to_midi
+        sequence_to_midi(seq, midi_file)
+        print(f"💾 Séquence exportée dans {midi_file}")
     print("\n✅ Séquence aléatoire terminée.")
     return enable_guitar_hero
 
 
 if __name__ == "__main__":
-    main()
+    import sys
+    # python Sequence_rand.py [sequence.mid]
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Boucle d'affichage économe pour les claviers pygame.
+
+- attente bloquante des évènements quand rien ne change (CPU ~0 au repos) ;
+- seuls les rectangles marqués « sales » sont redessinés puis envoyés avec
+  pygame.display.update(rects) ;
+- les redessins sont plafonnés à `fps` images/s, mais les évènements clavier
+  sont traités dès leur arrivée : le plafond ne retarde jamais un son.
+"""
+import time
+
+import pygame
+
+
+FPS = 60
+
+
+class DirtyRectScreen:
+    def __init__(self, window, draw_region, fps=FPS):
+        """draw_region(rect) redessine tout ce qui intersecte `rect` (clip déjà posé)"""
+        self.window = window
+        self.draw_region = draw_region
+        self.frame_ms = 1000 / fps if fps else 0
+        self._dirty = []
+        self._last_update = -self.frame_ms
+        self.frames = 0
+        # instants (time.perf_counter) du dernier next_events() : fin de l'attente, et
+        # instant au plus tôt où les évènements rendus ont pu entrer dans la file
+        self.woke_at = time.perf_counter()
+        self.arrived_at = self.woke_at
+        self._polled_at = self.woke_at
+
+    def mark(self, rect):
+        self._dirty.append(pygame.Rect(rect))
+
+    def mark_all(self):
+        self._dirty = [self.window.get_rect()]
+
+    def next_events(self, idle_timeout_ms=0):
+        """Renvoie les évènements en attente, en dormant tant qu'il n'y a rien à faire
+
+        idle_timeout_ms : réveil périodique même sans évènement (0 = jamais).
+        Après l'appel, woke_at est la fin de l'attente et arrived_at l'arrivée des
+        évènements : pygame ne les horodate pas, mais un évènement qui réveille
+        l'attente vient d'arriver, et un évènement trouvé sans attendre est arrivé
+        au plus tôt au relevé précédent (borne haute du temps passé dans la file).
+        """
+        if self._dirty:
+            wait_ms = int(self.frame_ms - (pygame.time.get_ticks() - self._last_update))
+        else:
+            wait_ms = idle_timeout_ms if idle_timeout_ms > 0 else None
+        if wait_ms is not None and wait_ms <= 0:
+            events = pygame.event.get()
+            self.woke_at = time.perf_counter()
+            self.arrived_at = self._polled_at
+        else:
+            pending = pygame.event.peek()
+            first = pygame.event.wait() if wait_ms is None else pygame.event.wait(wait_ms)
+            self.woke_at = time.perf_counter()
+            self.arrived_at = self._polled_at if pending else self.woke_at
+            events = [] if first.type == pygame.NOEVENT else [first]
+            events.extend(pygame.event.get())
+        self._polled_at = time.perf_counter()
+        return events
+
+    def flush(self):
+        """Redessine les zones sales si le plafond d'images/s le permet"""
+        if not self._dirty:
+            return
+        now = pygame.time.get_ticks()
+        if now - self._last_update < self.frame_ms:
+            return
+        rects = self._dirty
+        self._dirty = []
+        for rect in rects:
+            self.window.set_clip(rect)
+            self.draw_region(rect)
+        self.window.set_clip(None)
+        pygame.display.update(rects)
+        self._last_update = now
+        self.frames += 1
+
+    @staticmethod
+    def is_expose(event):
+        return event.type in (getattr(pygame, "WINDOWEXPOSED", -1), pygame.VIDEOEXPOSE)
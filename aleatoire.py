@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Séquences aléatoires reproductibles, tirées par blocs.
+
+Tout part d'une graine : la même graine redonne exactement les mêmes notes
+et les mêmes durées, quel que soit le nombre de notes demandées ou la taille
+des blocs (deux générateurs numpy indépendants, l'un pour les hauteurs,
+l'autre pour les durées, issus de la même SeedSequence). Sans graine, une
+graine est tirée puis gardée dans `.seed` pour pouvoir rejouer la session.
+
+    seq = RandomSequence(seed=42, mode="mixte", scale="pentatonique", key="A",
+                         low="A2", high="A5")
+    for name, freq, dur in seq:          # flux sans fin, mémoire constante
+        ...
+    seq.take(20)                         # liste de 20 (nom, fréquence, durée)
+    PlaybackPipeline(get_stream(), mp._cached_array).play(seq.events(10**6))  # au fil du tirage
+
+Les notes sont tirées uniformément parmi celles de la gamme (ou toutes, en
+chromatique) comprises entre `low` et `high` ; hauteurs et durées sont
+calculées d'un bloc de CHUNK notes à la fois.
+
+La variable d'environnement MUSIC_SEED fixe la graine par défaut (séquences
+aléatoires du Menu, Guitar Hero) :
+
+    MUSIC_SEED=1234 python Menu.py
+"""
+import os
+
+import numpy as np
+
+from note_frequence_base import LOWEST_NOTE, HIGHEST_NOTE
+from hauteur import note_to_midi, midi_to_name, midi_to_frequency, NOTE_OFFSETS, ACCIDENTALS
+
+
+CHUNK = 4096    # notes tirées à la fois
+
+# intervalles depuis la tonique, en demi-tons
+SCALES = {
+    "chromatique": (0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11),
+    "majeur": (0, 2, 4, 5, 7, 9, 11),
+    "mineur": (0, 2, 3, 5, 7, 8, 10),
+    "pentatonique": (0, 2, 4, 7, 9),
+    "pentatonique mineure": (0, 3, 5, 7, 10),
+    "blues": (0, 3, 5, 6, 7, 10),
+}
+
+# durée fixe (s) ou bornes (min, max) d'un tirage uniforme
+DURATIONS = {
+    "court": 0.5,
+    "moyen": 1.5,
+    "long": 3.0,
+    "mixte": (0.5, 3.0),
+}
+
+
+def default_seed():
+    """Graine de MUSIC_SEED, sinon une nouvelle graine tirée au hasard"""
+    value = os.environ.get("MUSIC_SEED")
+    if value:
+        return int(value)
+    return int(np.random.SeedSequence().generate_state(1)[0])
+
+
+def key_offset(key):
+    """"C" -> 0, "F#" -> 6, "Bb" -> 10"""
+    letter, accidentals = key[:1].upper(), key[1:]
+    if letter not in NOTE_OFFSETS or any(a not in ACCIDENTALS for a in accidentals):
+        raise ValueError(f"Tonalité inconnue : {key!r}")
+    return (NOTE_OFFSETS[letter] + sum(ACCIDENTALS[a] for a in accidentals)) % 12
+
+
+def allowed_notes(scale=None, key="C", low=LOWEST_NOTE, high=HIGHEST_NOTE):
+    """Numéros MIDI utilisables, croissants : gamme `scale` de `key`, entre low et high inclus"""
+    low = note_to_midi(low) if isinstance(low, str) else int(low)
+    high = note_to_midi(high) if isinstance(high, str) else int(high)
+    midi = np.arange(low, high + 1)
+    if scale is not None:
+        if scale not in SCALES:
+            raise ValueError(f"Gamme inconnue : {scale} ({', '.join(SCALES)})")
+        midi = midi[np.isin((midi - key_offset(key)) % 12, SCALES[scale])]
+    if not len(midi):
+        raise ValueError(f"Aucune note entre {midi_to_name(low)} et {midi_to_name(high)}")
+    return midi
+
+
+class RandomSequence:
+    def __init__(self, seed=None, mode="mixte", scale=None, key="C",
+                 low=LOWEST_NOTE, high=HIGHEST_NOTE, chunk=CHUNK):
+        """mode : clé de DURATIONS ; scale : clé de SCALES (None = chromatique)"""
+        if mode not in DURATIONS:
+            raise ValueError(f"Mode de durée inconnu : {mode} ({', '.join(DURATIONS)})")
+        self.seed = default_seed() if seed is None else int(seed)
+        self.mode = mode
+        self.chunk = chunk
+        self.midi = allowed_notes(scale, key, low, high)
+        self.frequencies = midi_to_frequency(self.midi)
+        self.names = [midi_to_name(m) for m in self.midi.tolist()]
+        self.reset()
+
+    def reset(self):
+        """Repart du début de la séquence"""
+        notes, durations = np.random.SeedSequence(self.seed).spawn(2)
+        self._notes = np.random.default_rng(notes)
+        self._durations = np.random.default_rng(durations)
+
+    def _draw(self, n):
+        """Indices dans self.midi et durées des n notes suivantes"""
+        index = self._notes.integers(len(self.midi), size=n)
+        duration = DURATIONS[self.mode]
+        if isinstance(duration, tuple):
+            durations = self._durations.uniform(*duration, size=n)
+        else:
+            durations = np.full(n, float(duration))
+        return index, durations
+
+    def _blocks(self, length):
+        remaining = length
+        while remaining is None or remaining > 0:
+            n = self.chunk if remaining is None else min(self.chunk, remaining)
+            yield self._draw(n)
+            if remaining is not None:
+                remaining -= n
+
+    def chunks(self, length=None):
+        """Blocs (numéros MIDI, fréquences, durées) de `chunk` notes ; length=None : sans fin"""
+        for index, durations in self._blocks(length):
+            yield self.midi[index], self.frequencies[index], durations
+
+    def notes(self, length=None):
+        """(nom, fréquence, durée) une par une, tirées par blocs ; length=None : sans fin"""
+        names = self.names
+        for index, durations in self._blocks(length):
+            freqs = self.frequencies[index]
+            for i, freq, dur in zip(index.tolist(), freqs.tolist(), durations.tolist()):
+                yield names[i], freq, dur
+
+    def events(self, length=None):
+        """(début s, fréquence, durée) des notes enchaînées, pour prelecture.PlaybackPipeline"""
+        start = 0.0
+        for index, durations in self._blocks(length):
+            starts = start + np.cumsum(durations) - durations
+            start = float(starts[-1] + durations[-1])
+            yield from zip(starts.tolist(), self.frequencies[index].tolist(), durations.tolist())
+
+    def __iter__(self):
+        return self.notes()
+
+    def take(self, length):
+        """Liste des `length` notes suivantes (nom, fréquence, durée)"""
+        return list(self.notes(length))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Banque de sons construite à la demande.
+
+Au lieu de synthétiser toutes les notes d'un clavier dans __init__, la banque
+ne fabrique un son qu'au premier accès (ou dans un thread de préchauffage
+lancé par warm_up()). Si une touche est frappée avant que son son soit prêt,
+il est synthétisé tout de suite dans le thread appelant : la note est jouée
+avec quelques millisecondes de retard au pire, jamais perdue.
+"""
+import threading
+
+
+class LazySoundBank:
+    def __init__(self, notes, build):
+        """notes : dict clé -> note ; build(note) renvoie le son (pygame.mixer.Sound)"""
+        self.notes = notes
+        self._build = build
+        self._sounds = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.fallback_builds = 0  # sons construits à la frappe faute d'être prêts
+
+    def __contains__(self, key):
+        return key in self.notes
+
+    def __len__(self):
+        return len(self.notes)
+
+    def __iter__(self):
+        return iter(self.notes)
+
+    def _get(self, key, on_demand):
+        sound = self._sounds.get(key)
+        if sound is not None:
+            return sound
+        # construit hors verrou : une frappe n'attend jamais le thread de préchauffage
+        sound = self._build(self.notes[key])
+        with self._lock:
+            if key not in self._sounds:
+                self._sounds[key] = sound
+                if on_demand:
+                    self.fallback_builds += 1
+            return self._sounds[key]
+
+    def __getitem__(self, key):
+        return self._get(key, on_demand=True)
+
+    def is_ready(self, key):
+        return key in self._sounds
+
+    @property
+    def ready(self):
+        return len(self._sounds) == len(self.notes)
+
+    def warm_up(self):
+        """Construit les sons restants dans un thread d'arrière-plan"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._warm_up, name="banque-sons", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def _warm_up(self):
+        for key in list(self.notes):
+            self._get(key, on_demand=False)
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Banc de mesures des performances (synthèse, lecture des partitions, démarrage,
+mémoire). Tourne sans carte son ni écran (pilotes SDL "dummy").
+
+Exemples :
+    python benchmark.py                          # affiche le JSON
+    python benchmark.py --output base.json       # sauvegarde une référence
+    python benchmark.py --compare base.json      # signale les régressions (code 1)
+    python benchmark.py --only synth             # seulement les mesures "synth.*"
+    python benchmark.py --dtype float64 --output f64.json
+    python benchmark.py --compare f64.json       # float32 (défaut) face à float64
+
+Les mesures "precision.*" donnent l'écart maximal (par échantillon, sur une
+échelle -1..1) entre la synthèse float32 et la même synthèse en float64.
+"""
+import os
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pygame
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_RATE = 44100
+NOTE = 440.0
+NOTE_DURATION = 1.0
+
+BENCHMARKS = {}
+
+
+def benchmark(name, unit, higher_is_better):
+    """Enregistre une mesure ; la fonction renvoie la valeur dans `unit`"""
+    def register(func):
+        BENCHMARKS[name] = (func, unit, higher_is_better)
+        return func
+    return register
+
+
+def best_time(func, repeat):
+    """Meilleur temps (s) sur `repeat` exécutions"""
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def samples_per_second(func, n_samples, repeat):
+    return n_samples / best_time(func, repeat)
+
+
+# ------------------------------------------------------------------ synthèse
+@benchmark("synth.flute", "samples/s", True)
+def bench_flute(repeat):
+    from Instrument import Flute
+    flute = Flute(None, SAMPLE_RATE)
+    return samples_per_second(lambda: flute.synthetiser(NOTE, NOTE_DURATION), SAMPLE_RATE, repeat)
+
+
+@benchmark("synth.guitare", "samples/s", True)
+def bench_guitare(repeat):
+    """Corde Karplus–Strong, sans le cache des notes"""
+    import corde
+    from Instrument import Guitare
+    guitare = Guitare(None, SAMPLE_RATE)
+
+    def pluck():
+        corde.cache_clear()
+        guitare.synthetiser(NOTE, NOTE_DURATION)
+    return samples_per_second(pluck, SAMPLE_RATE, repeat)
+
+
+@benchmark("synth.guitare_additive", "samples/s", True)
+def bench_guitare_additive(repeat):
+    """Ancienne guitare (trois sinus), pour comparer avec synth.guitare"""
+    from Instrument import Guitare
+    guitare = Guitare(None, SAMPLE_RATE)
+    return samples_per_second(lambda: guitare.synthetiser_additif(NOTE, NOTE_DURATION),
+                              SAMPLE_RATE, repeat)
+
+
+@benchmark("synth.guitare_banque_6_cordes", "s", False)
+def bench_guitare_bank(repeat):
+    """Les six cordes à vide de Menu.Guitare (1,5 s chacune)"""
+    import corde
+    from hauteur import frequency
+    from Menu import Guitare
+    guitare = Guitare.__new__(Guitare)  # pas de pygame : seules les ondes sont mesurées
+    guitare.SAMPLE_RATE, guitare.NOTE_DURATION = SAMPLE_RATE, 1.5
+    guitare.DAMPING, guitare.BRIGHTNESS = corde.DAMPING, corde.BRIGHTNESS
+    notes = ["E3", "A3", "D4", "G4", "B4", "E5"]
+
+    def build():
+        corde.cache_clear()
+        for note in notes:
+            guitare.make_guitar_wave(frequency(note))
+    return best_time(build, repeat)
+
+
+@benchmark("synth.piano_make_wave", "samples/s", True)
+def bench_piano(repeat):
+    from Menu import Piano
+    piano = Piano.__new__(Piano)  # pas de banque de sons : seule make_wave est mesurée
+    piano.SAMPLE_RATE, piano.NOTE_DURATION = SAMPLE_RATE, NOTE_DURATION
+    return samples_per_second(lambda: piano.make_wave(NOTE), SAMPLE_RATE, repeat)
+
+
+@benchmark("synth.batterie_prepare_sounds", "samples/s", True)
+def bench_batterie(repeat):
+    from Instrument import Batterie, DRUMS
+    from MusicPlayer_base_original import MusicPlayer
+    batterie = Batterie(MusicPlayer(SAMPLE_RATE))
+
+    def build_all():
+        batterie._prepare_sounds()
+        for drum in DRUMS:
+            batterie.drum_sounds[drum]
+    n = len(DRUMS) * int(SAMPLE_RATE * batterie.NOTE_DURATION)
+    return samples_per_second(build_all, n, repeat)
+
+
+@benchmark("synth.musicplayer_play", "samples/s", True)
+def bench_musicplayer(repeat):
+    """Tout le travail de MusicPlayer.play sauf l'attente de la durée de la note"""
+    from MusicPlayer_base_original import MusicPlayer
+    from cache_sons import shared_cache, sound_key
+    mp = MusicPlayer(SAMPLE_RATE)
+
+    def play_without_delay():
+        shared_cache.clear()  # on mesure la synthèse, pas le cache
+        key = sound_key("sinus", NOTE, NOTE_DURATION, SAMPLE_RATE, mp.volume)
+        shared_cache.get_sound(key, lambda: mp.make_tone(NOTE, NOTE_DURATION))
+    return samples_per_second(play_without_delay, SAMPLE_RATE, repeat)
+
+
+@benchmark("synth.sequence_vectorisee", "samples/s", True)
+def bench_sequence(repeat):
+    from synthese import synthesize_sequence
+    rng = np.random.default_rng(0)
+    freqs = rng.uniform(100, 2000, 1000)
+    durations = np.full(1000, 0.1)
+    n = 1000 * int(SAMPLE_RATE * 0.1)
+    return samples_per_second(lambda: synthesize_sequence(freqs, durations, SAMPLE_RATE), n, repeat)
+
+
+@benchmark("synth.sequence_boucle_vs_vectorisee", "x", True)
+def bench_sequence_loop(repeat):
+    """Gain de synthesize_sequence sur une boucle note par note (un sine() par note)"""
+    from synthese import synthesize_sequence, note_lengths, sine
+    rng = np.random.default_rng(0)
+    freqs = rng.uniform(100, 2000, 5000)
+    durations = rng.choice([0.05, 0.1, 0.25], 5000)
+    lengths = note_lengths(durations, SAMPLE_RATE)
+
+    def loop():
+        out = np.empty(int(lengths.sum()), dtype=np.float32)
+        pos = 0
+        for freq, n in zip(freqs.tolist(), lengths.tolist()):
+            out[pos:pos + n] = sine(freq, n, SAMPLE_RATE)
+            pos += n
+        return out
+    return (best_time(loop, repeat)
+            / best_time(lambda: synthesize_sequence(freqs, durations, SAMPLE_RATE), repeat))
+
+
+# --------------------------------------------------------------- partitions
+def _synthetic_score(path, lines=100_000):
+    from note_frequence_base import note_to_frequency
+    rng = np.random.default_rng(0)
+    names = np.array(list(note_to_frequency) + ["0"])
+    notes = names[rng.integers(len(names), size=lines)]
+    durations = rng.choice(["0.083", "0.125", "0.250", "0.500"], size=lines)
+    with open(path, "w") as f:
+        f.writelines(f"{n} {d}\n" for n, d in zip(notes, durations))
+
+
+@benchmark("parse.pirate_texte", "s", False)
+def bench_parse_pirate(repeat):
+    from partition_binaire import parse_text
+    return best_time(lambda: parse_text(os.path.join(HERE, "pirate.txt")), repeat)
+
+
+@benchmark("parse.synthetique_100k_texte", "s", False)
+def bench_parse_100k(repeat):
+    from partition_binaire import parse_text
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "score.txt")
+        _synthetic_score(path)
+        return best_time(lambda: parse_text(path), repeat)
+
+
+@benchmark("parse.synthetique_100k_compile", "s", False)
+def bench_load_100k(repeat):
+    """Chargement d'une partition déjà compilée (.npart, memory-map)"""
+    from partition_binaire import load_score
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "score.txt")
+        _synthetic_score(path)
+        load_score(path)
+
+        def load():
+            score = load_score(path)
+            score.frequencies(), score.durations
+        return best_time(load, repeat)
+
+
+@benchmark("random.sequence_1m_notes", "notes/s", True)
+def bench_random_sequence(repeat):
+    """Tirage de 1 million de notes (gamme, durées mixtes), consommées une à une"""
+    from collections import deque
+    from aleatoire import RandomSequence
+    n = 1_000_000
+    seq = RandomSequence(seed=0, mode="mixte", scale="majeur", low="C2", high="C7")
+
+    def draw():
+        seq.reset()
+        deque(seq.notes(n), maxlen=0)
+    return n / best_time(draw, repeat)
+
+
+@benchmark("random.melodie_markov_1m_notes", "notes/s", True)
+def bench_markov_melody(repeat):
+    """Tirage de 1 million de notes dans le modèle appris sur pirate.txt et mario.txt"""
+    from collections import deque
+    from melodie import train
+    n = 1_000_000
+    melody = train([os.path.join(HERE, "pirate.txt"), os.path.join(HERE, "mario.txt")]).generate(0)
+
+    def draw():
+        melody.reset()
+        deque(melody.notes(n), maxlen=0)
+    return n / best_time(draw, repeat)
+
+
+# --------------------------------------------------------------- démarrage
+@benchmark("startup.menu_premier_prompt", "s", False)
+def bench_menu_startup(repeat):
+    """Temps entre le lancement de `python Menu.py` et l'affichage du premier prompt"""
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.join(HERE, "Menu.py")], cwd=HERE,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True)
+        seen = ""
+        while "instrument :" not in seen:
+            c = proc.stdout.read(1)
+            if not c:
+                break
+            seen += c
+        best = min(best, time.perf_counter() - t)
+        proc.kill()
+        proc.wait()
+    return best
+
+
+# ------------------------------------------------------------------ mémoire
+def _peak_bytes_per_minute(instrument):
+    from rendu import INSTRUMENTS, rendre_partition
+    inst = INSTRUMENTS[instrument](SAMPLE_RATE)
+    tracemalloc.start()
+    tone = rendre_partition(os.path.join(HERE, "pirate.txt"), inst)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / (len(tone) / SAMPLE_RATE / 60)
+
+
+@benchmark("memory.sortie_note_1s", "bytes", False)
+def bench_output_stage(repeat):
+    """Pic mémoire Python pour convertir une note d'1 s en pygame Sound (réserve déjà chaude)"""
+    from tampons import make_sound
+    from MusicPlayer_base_original import MusicPlayer
+    tone = MusicPlayer(SAMPLE_RATE).make_tone(NOTE, NOTE_DURATION)
+    make_sound(tone)
+    tracemalloc.start()
+    for _ in range(repeat):
+        make_sound(tone)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+for _name in ("sinus", "flute", "guitare", "piano", "batterie"):
+    benchmark(f"memory.rendu_{_name}_par_minute", "bytes/min", False)(
+        lambda repeat, _name=_name: _peak_bytes_per_minute(_name))
+
+
+# ---------------------------------------------------------------- précision
+def _max_error(make):
+    """Écart max entre make() calculé en float32 et en float64"""
+    from synthese import get_dtype, set_dtype
+    saved = get_dtype()
+    try:
+        set_dtype("float64")
+        reference = np.asarray(make(), dtype=np.float64)
+        set_dtype("float32")
+        low = make()
+    finally:
+        set_dtype(saved)
+    return float(np.abs(low - reference).max())
+
+
+@benchmark("precision.sinus_60s_4khz", "max_abs_error", False)
+def bench_precision_sine(repeat):
+    """Note très longue et aiguë : la phase ne doit pas dériver en float32"""
+    from Instrument import Instrument
+    inst = Instrument(None, "Sinus", SAMPLE_RATE)
+    return _max_error(lambda: inst.synthetiser(4186.0, 60.0))
+
+
+@benchmark("precision.flute_10s", "max_abs_error", False)
+def bench_precision_flute(repeat):
+    from Instrument import Flute
+    flute = Flute(None, SAMPLE_RATE)
+    return _max_error(lambda: flute.synthetiser(2093.0, 10.0))
+
+
+@benchmark("precision.flute_180s", "max_abs_error", False)
+def bench_precision_flute_long(repeat):
+    """Le vibrato s'écarte de plus en plus de la phase avec le temps"""
+    from Instrument import Flute
+    flute = Flute(None, SAMPLE_RATE)
+    return _max_error(lambda: flute.synthetiser(2093.0, 180.0))
+
+
+@benchmark("precision.piano_10s", "max_abs_error", False)
+def bench_precision_piano(repeat):
+    from Instrument import Piano
+    piano = Piano(None, SAMPLE_RATE)
+    return _max_error(lambda: piano.synthetiser(NOTE, 10.0))
+
+
+@benchmark("precision.guitare_karplus_10s", "max_abs_error", False)
+def bench_precision_guitare(repeat):
+    import corde
+    return _max_error(lambda: corde._render(NOTE, 10.0, SAMPLE_RATE, corde.DAMPING, corde.BRIGHTNESS))
+
+
+@benchmark("precision.sequence_1000_notes", "max_abs_error", False)
+def bench_precision_sequence(repeat):
+    from synthese import synthesize_sequence
+    rng = np.random.default_rng(0)
+    freqs = rng.uniform(100, 2000, 1000)
+    return _max_error(lambda: synthesize_sequence(freqs, np.full(1000, 0.1), SAMPLE_RATE))
+
+
+# ------------------------------------------------------------ sans carte son
+@benchmark("headless.play_from_file_pirate", "x temps réel", True)
+def bench_headless_pirate(repeat):
+    """play_from_file complet (attentes comprises) sur le backend null + horloge virtuelle"""
+    from sortie_audio import NullBackend, get_backend, set_backend
+    from MusicPlayer_base_original import MusicPlayer
+    previous = get_backend()
+    backend = set_backend(NullBackend(keep_samples=False))
+    try:
+        mp = MusicPlayer(SAMPLE_RATE)
+        elapsed = best_time(lambda: mp.play_from_file(os.path.join(HERE, "pirate.txt")), repeat)
+        return backend.clock.now() / repeat / elapsed
+    finally:
+        set_backend(previous)
+
+
+# --------------------------------------------------------------- exécution
+def run(only=None, repeat=5):
+    from synthese import get_dtype
+    results = {}
+    for name, (func, unit, higher_is_better) in BENCHMARKS.items():
+        if only and only not in name:
+            continue
+        value = func(repeat)
+        results[name] = {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+        print(f"  {name:40s} {value:14.6g} {unit}", file=sys.stderr)
+    return {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pygame": pygame.version.ver,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "dtype": get_dtype().name,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Liste des régressions de plus de `threshold` (fraction) par rapport à la référence"""
+    regressions = []
+    for name, res in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or base["value"] == 0:
+            continue
+        change = (res["value"] - base["value"]) / base["value"]
+        worse = -change if res["higher_is_better"] else change
+        if worse > threshold:
+            regressions.append({"name": name, "baseline": base["value"],
+                                "current": res["value"], "change": change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesures de performance (sans carte son)")
+    parser.add_argument("--output", help="fichier JSON où écrire les résultats")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="écart toléré avant de signaler une régression (défaut 0.10)")
+    parser.add_argument("--only", help="ne lance que les mesures dont le nom contient ce texte")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dtype", choices=["float32", "float64"],
+                        help="précision de synthèse (défaut : MUSIC_DTYPE ou float32)")
+    args = parser.parse_args()
+
+    if args.dtype:
+        from synthese import set_dtype
+        set_dtype(args.dtype)
+        os.environ["MUSIC_DTYPE"] = args.dtype  # aussi pour la mesure de démarrage du Menu
+
+    report = run(args.only, args.repeat)
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(report, baseline, args.threshold)
+        for r in report["regressions"]:
+            print(f"❌ Régression {r['name']} : {r['baseline']:.6g} -> {r['current']:.6g} "
+                  f"({100 * r['change']:+.1f} %)", file=sys.stderr)
+        status = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
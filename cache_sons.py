@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Cache LRU des notes synthétisées, partagé par tous les instruments.
+
+Les partitions répètent sans cesse les mêmes couples (note, durée) : au lieu de
+refaire linspace/sin/enveloppe/conversion int16 à chaque note, on garde le
+résultat (tableau int16 stéréo et/ou pygame.mixer.Sound) sous la clé
+(instrument, fréquence, durée, fréquence d'échantillonnage, volume).
+La mémoire occupée est plafonnée, les entrées les moins récemment utilisées
+sont évincées en premier.
+"""
+import threading
+from collections import OrderedDict
+
+from sortie_audio import get_backend
+from tampons import to_int16_stereo
+
+
+MAX_BYTES = 64 * 1024 * 1024  # 64 Mo par défaut
+
+
+def sound_key(instrument, frequency, duration, sample_rate, volume):
+    """Clé de cache d'une note"""
+    return (instrument, float(frequency), float(duration), int(sample_rate), float(volume))
+
+
+class _Entry:
+    __slots__ = ("array", "sound", "nbytes")
+
+    def __init__(self, array):
+        self.array = array
+        self.sound = None
+        self.nbytes = array.nbytes
+
+
+class SoundCache:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value):
+        with self._lock:
+            self._max_bytes = value
+            self._evict()
+
+    def _evict(self):
+        # on garde toujours au moins l'entrée la plus récente
+        while self.bytes > self._max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self.bytes -= entry.nbytes
+            self.evictions += 1
+
+    def _lookup(self, key, factory):
+        """Renvoie l'entrée de la clé, en la synthétisant si besoin (appelé sous verrou)"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = _Entry(to_int16_stereo(factory()))
+        self._entries[key] = entry
+        self.bytes += entry.nbytes
+        self._evict()
+        return entry
+
+    def get_array(self, key, factory):
+        """Tableau int16 stéréo de la note ; factory() renvoie l'onde mono float si absente"""
+        with self._lock:
+            return self._lookup(key, factory).array
+
+    def get_sound(self, key, factory):
+        """Son prêt à jouer (pygame.mixer.Sound par défaut), au volume indiqué dans la clé"""
+        with self._lock:
+            entry = self._lookup(key, factory)
+            if entry.sound is None:
+                entry.sound = get_backend().make_sound(entry.array)
+                entry.sound.set_volume(key[4])
+                # make_sound copie les échantillons : la mémoire compte double
+                self.bytes += entry.array.nbytes
+                entry.nbytes += entry.array.nbytes
+                self._evict()
+            return entry.sound
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# Cache commun à MusicPlayer, Instrument.* et Sequence_rand
+shared_cache = SoundCache()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Corde pincée par modèle physique (Karplus–Strong), sans boucle par échantillon.
+
+La corde est une ligne à retard de P échantillons remplie de bruit (le
+pincement), rebouclée sur un petit filtre FIR h (amortissement, brillance,
+et interpolation linéaire pour la partie fractionnaire du retard, donc une
+corde juste même dans l'aigu) :
+
+    y[n] = sum_j h[j] * y[n - P - j]
+
+Un échantillon ne dépend que de valeurs vieilles d'au moins P échantillons :
+on calcule donc un bloc entier d'un coup avec np.convolve. En dépliant la
+récurrence m fois (noyau h*h*...*h, retard m*P), les blocs font m périodes :
+peu d'appels NumPy même pour les notes aiguës, dont la période est courte.
+Le résultat est identique, à l'arrondi près, à la boucle échantillon par
+échantillon.
+
+Les notes rendues sont gardées par (fréquence, durée, fréquence
+d'échantillonnage, amortissement, brillance, précision) : le bruit du pincement est
+tiré d'une graine fixe, une même clé donne toujours la même onde.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from synthese import get_dtype
+
+
+DAMPING = 0.996       # gain de la boucle à chaque aller-retour (plus bas = note plus courte)
+BRIGHTNESS = 0.0      # 0 = Karplus–Strong classique (moyenne de 2), 1 = pas de filtrage
+BLOCK = 256           # taille visée (échantillons) des blocs dépliés
+MAX_UNFOLD = 8        # au-delà, le noyau devient plus cher que les appels économisés
+CACHE_SIZE = 256      # nb de notes gardées
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def loop_filter(delay, damping=DAMPING, brightness=BRIGHTNESS):
+    """(P entier, noyau h) pour un retard de boucle total `delay` échantillons"""
+    beta = 0.5 + 0.5 * brightness
+    # le filtre [beta, 1 - beta] retarde déjà de (1 - beta) échantillon
+    delay -= 1 - beta
+    period = int(delay)
+    frac = delay - period
+    taps = damping * np.convolve([1 - frac, frac], [beta, 1 - beta])
+    return period, taps
+
+
+def _propagate(y, start, end, lag, kernel):
+    """y[n] = sum_j kernel[j] * y[n - lag - j] pour n dans [start, end), par blocs de `lag`"""
+    k = len(kernel) - 1
+    while start < end:
+        n = min(lag, end - start)
+        first = start - lag - k
+        y[start:start + n] = np.convolve(y[first:start - lag + n], kernel, "valid")
+        start += n
+
+
+def pluck(freq, duration, sample_rate=44100, damping=DAMPING, brightness=BRIGHTNESS):
+    """Onde mono (lecture seule, dtype de synthèse) d'une corde pincée, mise en cache"""
+    key = (float(freq), float(duration), sample_rate, float(damping), float(brightness),
+           get_dtype().str)
+    with _lock:
+        wave = _cache.get(key)
+        if wave is not None:
+            _cache.move_to_end(key)
+            return wave
+    wave = _render(*key)
+    wave.flags.writeable = False
+    with _lock:
+        _cache[key] = wave
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return wave
+
+
+def _render(freq, duration, sample_rate, damping, brightness, dtype=None):
+    n = int(sample_rate * duration)
+    period, taps = loop_filter(sample_rate / freq, damping, brightness)
+    unfold = min(MAX_UNFOLD, max(1, -(-BLOCK // period)))
+    kernel = taps
+    for _ in range(unfold - 1):
+        kernel = np.convolve(kernel, taps)
+    # noyaux calculés en float64 puis arrondis une fois : tout le reste suit le dtype
+    dtype = np.dtype(dtype or get_dtype())
+    taps, kernel = taps.astype(dtype), kernel.astype(dtype)
+
+    # marge de zéros devant : les premiers blocs lisent "avant" le pincement
+    pad = len(kernel) - 1 + unfold * period
+    y = np.zeros(pad + max(n, period), dtype=dtype)
+    rng = np.random.default_rng(int(freq * 1000) ^ 0x5EED)
+    burst = rng.uniform(-1, 1, period)
+    y[pad:pad + period] = burst - burst.mean()  # pas de composante continue
+
+    # une seule période à la fois tant que le dépliage lirait le pincement lui-même,
+    # puis des blocs de `unfold` périodes
+    switch = min(pad + n, pad + unfold * period + unfold * (len(taps) - 1))
+    _propagate(y, pad + period, switch, period, taps)
+    _propagate(y, switch, pad + n, unfold * period, kernel)
+    return y[pad:pad + n]
+
+
+def cache_clear():
+    with _lock:
+        _cache.clear()
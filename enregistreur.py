@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Enregistrement des sessions au clavier (Menu.Piano, Menu.Guitare) en partition.
+
+- instants réels d'appui et de relâchement (horloge monotone), silences compris ;
+- chaque note est écrite dès son relâchement, par un tampon d'écriture : une
+  ligne n'y attend pas plus de FLUSH_INTERVAL s, même si plus rien n'est joué
+  (tick(), appelé à chaque tour de la boucle du clavier) ; mémoire constante
+  quelle que soit la durée de la session, et un plantage ne perd que la
+  dernière seconde ;
+- le fichier produit est une partition normale, rejouable par
+  MusicPlayer.play_from_file et rendu.py :
+
+      0 0.412          silence avant la note
+      C4 0.250         note tenue 0.250 s, le curseur avance
+      @1.100 E4 0.800  note jouée pendant qu'une autre était tenue (accord)
+
+Une session jouée note après note ne produit que des lignes "NOTE DUREE"
+classiques.
+"""
+import os
+import time
+
+
+FLUSH_INTERVAL = 1.0     # s maximum d'attente d'une ligne dans le tampon
+BUFFER_SIZE = 1 << 16
+RESOLUTION = 3           # décimales écrites (ms)
+
+
+def unique_path(filename):
+    """`filename` s'il n'existe pas, sinon nom-2.txt, nom-3.txt... (jamais d'écrasement)"""
+    if not os.path.exists(filename):
+        return filename
+    root, ext = os.path.splitext(filename)
+    i = 2
+    while os.path.exists(f"{root}-{i}{ext}"):
+        i += 1
+    return f"{root}-{i}{ext}"
+
+
+class SessionRecorder:
+    def __init__(self, filename, clock=time.monotonic, flush_interval=FLUSH_INTERVAL):
+        self.path = filename
+        self.clock = clock
+        self.flush_interval = flush_interval
+        self._file = open(filename, "a", encoding="utf-8", buffering=BUFFER_SIZE)
+        self._held = {}          # note -> instant d'appui
+        self._origin = None      # premier appui = instant 0 de la partition
+        self._cursor = 0.0       # fin de la dernière note écrite en séquence (s, arrondi)
+        self._pending_since = None  # instant de la plus ancienne ligne pas encore sur disque
+        self.notes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def note_on(self, note, at=None):
+        """Touche enfoncée (KEYDOWN)"""
+        if at is None:
+            at = self.clock()
+        if note in self._held:
+            self.note_off(note, at)  # ré-appui sans relâchement : on clôt la précédente
+        if self._origin is None:
+            self._origin = at
+        self._held[note] = at
+
+    def note_off(self, note, at=None):
+        """Touche relâchée (KEYUP) : la note est écrite"""
+        if at is None:
+            at = self.clock()
+        pressed = self._held.pop(note, None)
+        if pressed is None:
+            return
+        onset = round(pressed - self._origin, RESOLUTION)
+        duration = round(max(at - pressed, 0.0), RESOLUTION)
+        if duration <= 0:
+            return
+        if onset >= self._cursor:
+            rest = round(onset - self._cursor, RESOLUTION)
+            if rest > 0:
+                self._file.write(f"0 {rest:.{RESOLUTION}f}\n")
+            self._file.write(f"{note} {duration:.{RESOLUTION}f}\n")
+            self._cursor = round(onset + duration, RESOLUTION)
+        else:
+            # une autre note sonnait encore : placement explicite, le curseur ne bouge pas
+            self._file.write(f"@{onset:.{RESOLUTION}f} {note} {duration:.{RESOLUTION}f}\n")
+        self.notes += 1
+        if self._pending_since is None:
+            self._pending_since = self.clock()
+        self.tick()
+
+    def tick(self, now=None):
+        """Vide le tampon si sa plus ancienne ligne attend depuis flush_interval s
+
+        À appeler régulièrement (boucle d'évènements réveillée au moins toutes les
+        flush_interval s) : une note reste écrite même si la session s'arrête là.
+        """
+        if self._pending_since is None:
+            return
+        if now is None:
+            now = self.clock()
+        if now - self._pending_since >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        self._pending_since = None
+
+    def close(self, at=None):
+        """Relâche les notes encore tenues puis ferme le fichier"""
+        if self._file.closed:
+            return
+        if at is None:
+            at = self.clock()
+        for note in list(self._held):
+            self.note_off(note, at)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
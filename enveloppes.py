@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Enveloppes d'amplitude partagées par toutes les voix.
+
+Une enveloppe est un petit objet paramétré (Ramp, ExpDecay, ADSR, ou un
+produit de plusieurs avec `*`) :
+
+    PIANO = Ramp(attack=0.02) * ExpDecay(3, relative=True)
+    PIANO.apply(wave, sample_rate)      # wave *= courbe, en place
+
+La courbe échantillonnée est calculée une fois par (forme, nb
+d'échantillons, fréquence d'échantillonnage, dtype), en float64 puis
+arrondie au dtype de synthèse, et gardée en lecture seule dans un cache
+LRU borné. Une note déjà vue ne coûte donc plus d'exp() : seulement une
+multiplication.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from synthese import SAMPLE_RATE, get_dtype
+
+
+CACHE_BYTES = 32 * 1024 * 1024   # mémoire maximale des courbes gardées
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_lock = threading.Lock()
+
+
+class Envelope:
+    """Base : sous-classes définissent params (clé du cache) et _compute()"""
+    params = ()
+
+    def _compute(self, n, sample_rate):
+        """Courbe float64 de n échantillons"""
+        raise NotImplementedError
+
+    def key(self):
+        return (type(self).__name__,) + tuple(self.params)
+
+    def curve(self, n, sample_rate=SAMPLE_RATE):
+        """Courbe de n échantillons (dtype de synthèse, lecture seule), mise en cache"""
+        global _cache_bytes
+        dtype = get_dtype()
+        key = (self.key(), int(n), int(sample_rate), dtype.str)
+        with _lock:
+            curve = _cache.get(key)
+            if curve is not None:
+                _cache.move_to_end(key)
+                return curve
+        curve = self._compute(int(n), sample_rate).astype(dtype)
+        curve.flags.writeable = False
+        with _lock:
+            if key not in _cache:
+                _cache[key] = curve
+                _cache_bytes += curve.nbytes
+                # on garde toujours au moins la courbe la plus récente
+                while _cache_bytes > CACHE_BYTES and len(_cache) > 1:
+                    _, old = _cache.popitem(last=False)
+                    _cache_bytes -= old.nbytes
+            return _cache[key]
+
+    def apply(self, wave, sample_rate=SAMPLE_RATE):
+        """wave *= courbe, en place ; renvoie wave"""
+        wave *= self.curve(len(wave), sample_rate)
+        return wave
+
+    def __mul__(self, other):
+        return Product(self, other)
+
+    def __repr__(self):
+        return f"{type(self).__name__}{tuple(self.params)}"
+
+
+class Ramp(Envelope):
+    """Fondus linéaires : 0 -> 1 sur `attack` s au début, 1 -> 0 sur `release` s à la fin"""
+
+    def __init__(self, attack=0.0, release=0.0):
+        self.attack = attack
+        self.release = release
+        self.params = (attack, release)
+
+    def _compute(self, n, sample_rate):
+        curve = np.ones(n)
+        a = min(int(self.attack * sample_rate), n)
+        r = min(int(self.release * sample_rate), n)
+        if a:
+            curve[:a] = np.arange(a) / a
+        if r:
+            curve[n - r:] *= np.arange(r)[::-1] / r
+        return curve
+
+
+class ExpDecay(Envelope):
+    """exp(-rate * t) ; relative=True : rate par durée de note (exp(-rate * t / durée))"""
+
+    def __init__(self, rate, relative=False):
+        self.rate = rate
+        self.relative = relative
+        self.params = (rate, relative)
+
+    def _compute(self, n, sample_rate):
+        rate = self.rate * sample_rate / n if self.relative and n else self.rate
+        curve = np.arange(n, dtype=np.float64)
+        curve *= -rate / sample_rate
+        return np.exp(curve, out=curve)
+
+
+class ADSR(Envelope):
+    """Attaque, décroissance vers `sustain` (niveau 0..1), maintien, relâchement (s)
+
+    Le relâchement occupe les `release` dernières secondes de la note et part
+    du niveau atteint à ce moment : une note trop courte pour l'attaque et la
+    décroissance ne saute donc jamais.
+    """
+
+    def __init__(self, attack=0.01, decay=0.1, sustain=0.7, release=0.1):
+        self.attack = attack
+        self.decay = decay
+        self.sustain = sustain
+        self.release = release
+        self.params = (attack, decay, sustain, release)
+
+    def _compute(self, n, sample_rate):
+        a = int(self.attack * sample_rate)
+        d = int(self.decay * sample_rate)
+        r = min(int(self.release * sample_rate), n)
+        held = n - r
+        k = np.arange(held, dtype=np.float64)
+        curve = np.full(held, float(self.sustain))
+        if a:
+            attack = k < a
+            curve[attack] = k[attack] / a
+        if d:
+            decay = (k >= a) & (k < a + d)
+            curve[decay] = 1 - (1 - self.sustain) * (k[decay] - a) / d
+        level = curve[-1] if held else 1.0
+        release = level * np.arange(r, dtype=np.float64)[::-1] / r if r else np.zeros(0)
+        return np.concatenate((curve, release))
+
+
+class Product(Envelope):
+    """Produit de plusieurs enveloppes (ex. Ramp(attack=0.02) * ExpDecay(3))"""
+
+    def __init__(self, *envelopes):
+        flat = []
+        for env in envelopes:
+            flat.extend(env.envelopes if isinstance(env, Product) else [env])
+        self.envelopes = tuple(flat)
+        self.params = tuple(env.key() for env in flat)
+
+    def _compute(self, n, sample_rate):
+        curve = self.envelopes[0]._compute(n, sample_rate)
+        for env in self.envelopes[1:]:
+            curve *= env._compute(n, sample_rate)
+        return curve
+
+    def __repr__(self):
+        return " * ".join(repr(env) for env in self.envelopes)
+
+
+def cache_clear():
+    global _cache_bytes
+    with _lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+
+# ------------------------------------------------------------ voix communes
+# piano : attaque de 20 ms puis décroissance sur toute la note (Instrument, Menu, pianoson)
+PIANO = Ramp(attack=0.02) * ExpDecay(3, relative=True)
+# séquence aléatoire : simples fondus de 10 ms contre les clics
+ANTI_CLIC = Ramp(attack=0.01, release=0.01)
+# ancienne guitare additive : min(1, 5 t) * exp(-3 t)
+GUITARE_ADDITIVE = Ramp(attack=0.2) * ExpDecay(3)
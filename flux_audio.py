@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur de sortie audio en flux continu (non bloquant).
+
+Les voix (notes) sont placées à l'échantillon près sur une ligne de temps ;
+un thread producteur les mélange bloc par bloc dans un tampon circulaire de
+taille fixe, en restant en avance sur la carte son. L'appelant récupère tout
+de suite une VoiceHandle et n'est jamais bloqué par pygame.time.delay.
+
+pygame.mixer n'offre pas de callback « pull » : le thread producteur joue donc
+aussi le rôle du callback et alimente un canal réservé via Channel.queue(),
+un bloc à la fois.
+
+Avec une horloge virtuelle (sortie_audio.NullBackend), il n'y a pas de
+thread : le flux est réveillé par l'horloge à chaque avance et fait le même
+travail dans le thread qui attend.
+"""
+import threading
+
+import numpy as np
+
+from synthese import get_dtype
+from sortie_audio import POLL, get_backend
+
+
+BLOCK_SIZE = 1024      # trames par bloc (~23 ms à 44,1 kHz)
+BUFFER_BLOCKS = 8      # taille du tampon circulaire, en blocs
+
+
+class RingBuffer:
+    """Tampon circulaire stéréo de capacité fixe (dtype de synthèse)"""
+
+    def __init__(self, capacity, dtype=np.float32):
+        self.data = np.zeros((capacity, 2), dtype=dtype)
+        self.capacity = capacity
+        self.read_pos = 0   # positions absolues (en trames)
+        self.write_pos = 0
+
+    @property
+    def fill(self):
+        return self.write_pos - self.read_pos
+
+    @property
+    def free(self):
+        return self.capacity - self.fill
+
+    def write(self, block):
+        n = len(block)
+        i = self.write_pos % self.capacity
+        first = min(n, self.capacity - i)
+        self.data[i:i + first] = block[:first]
+        self.data[:n - first] = block[first:]
+        self.write_pos += n
+
+    def read(self, n, out):
+        i = self.read_pos % self.capacity
+        first = min(n, self.capacity - i)
+        out[:first] = self.data[i:i + first]
+        out[first:n] = self.data[:n - first]
+        self.read_pos += n
+
+
+class VoiceHandle:
+    """Note programmée dans le flux, rendue immédiatement à l'appelant"""
+
+    def __init__(self, samples, start, scale, clock=None):
+        # samples : (N, 2) ou (N, 1) ; le mono est diffusé sur les 2 canaux
+        self.samples = samples
+        self.start = start
+        self.end = start + len(samples)
+        self.scale = scale
+        self._clock = clock
+        self._done = threading.Event()
+        self._stopped = False
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def stop(self):
+        self._stopped = True
+
+    def wait(self, timeout=None):
+        """Attend la fin de la note (optionnel, pour les modes séquentiels)"""
+        clock = self._clock
+        if clock is None or not clock.virtual:
+            return self._done.wait(timeout)
+        # horloge virtuelle : c'est l'attente elle-même qui fait avancer le flux
+        limit = None if timeout is None else clock.now() + timeout
+        while not self.done and (limit is None or clock.now() < limit):
+            clock.sleep(POLL)
+        return self.done
+
+
+class StreamingMixer:
+    def __init__(self, sample_rate=44100, block_size=BLOCK_SIZE, buffer_blocks=BUFFER_BLOCKS,
+                 backend=None):
+        self.backend = backend or get_backend()
+        self.backend.init(sample_rate)
+        self.channel = self.backend.reserve_channel()
+        self.clock = self.backend.clock
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        dtype = get_dtype()
+        self.ring = RingBuffer(block_size * buffer_blocks, dtype)
+
+        self._voices = []
+        self._lock = threading.Lock()
+        self._tail = 0          # fin de la dernière voix ajoutée par enqueue()
+        self._block = np.zeros((block_size, 2), dtype=dtype)
+        self._out = np.zeros((block_size, 2), dtype=dtype)
+        self._scratch = np.zeros((block_size, 2), dtype=dtype)
+        self._pcm = np.zeros((block_size, 2), dtype=np.int16)
+        self.underruns = 0
+        self.late_voices = 0
+        self.played = 0         # trames transmises à la carte son
+        self._streaming = False
+        self._mixed = []        # voix entièrement mélangées, pas encore transmises
+
+        self._running = True
+        if self.clock.virtual:
+            self._thread = None
+            self.clock.add_listener(self)
+        else:
+            self._thread = threading.Thread(target=self._run, name="flux-audio", daemon=True)
+            self._thread.start()
+
+    # ------------------------------------------------------------------ API
+    def schedule(self, samples, start=None, gain=1.0):
+        """Programme une voix à la trame absolue `start` (défaut : au plus tôt)
+
+        samples : onde mono float (-1..1) ou tableau int16 (N, 2) du cache.
+        """
+        if samples.dtype == np.int16:
+            scale = gain / 32767
+        else:
+            scale = gain
+        if samples.ndim == 1:
+            samples = samples.reshape(-1, 1)
+        with self._lock:
+            earliest = self.ring.write_pos
+            if start is None:
+                start = earliest
+            elif start < earliest:
+                # déjà mélangé : on joue le plus tôt possible
+                self.late_voices += 1
+                start = earliest
+            voice = VoiceHandle(samples, start, scale, self.clock)
+            self._voices.append(voice)
+            self._tail = max(self._tail, voice.end)
+        if self._thread is None:
+            self.clock.sleep(0)  # horloge virtuelle : la note part tout de suite
+        return voice
+
+    def enqueue(self, samples, gain=1.0):
+        """Programme une voix juste après la précédente (enchaînement sans trou)"""
+        return self.schedule(samples, self.queue_end(), gain)
+
+    def queue_end(self):
+        """Trame où commencerait une voix ajoutée par enqueue()"""
+        with self._lock:
+            return max(self._tail, self.ring.write_pos)
+
+    def mixed_until(self):
+        """Première trame pas encore mélangée : une voix programmée avant partirait en retard"""
+        return self.ring.write_pos
+
+    def now(self):
+        """Position de lecture approximative, en trames"""
+        return self.played
+
+    def wait_for(self, frame, poll=POLL):
+        """Attend que la lecture atteigne la trame absolue `frame`"""
+        while self.played < frame and self._running:
+            self.clock.sleep(poll)
+
+    def stats(self):
+        return {
+            "underruns": self.underruns,
+            "late_voices": self.late_voices,
+            "fill": self.ring.fill,
+            "fill_ratio": self.ring.fill / self.ring.capacity,
+            "capacity": self.ring.capacity,
+            "active_voices": len(self._voices),
+        }
+
+    def close(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+        else:
+            self.clock.remove_listener(self)
+        self.channel.stop()
+
+    # ------------------------------------------------------- thread producteur
+    def _mix_block(self):
+        """Mélange les voix actives dans le prochain bloc du tampon circulaire"""
+        block = self._block
+        block.fill(0)
+        b0 = self.ring.write_pos
+        b1 = b0 + self.block_size
+        with self._lock:
+            voices = list(self._voices)
+        finished = []
+        for v in voices:
+            if v._stopped or v.end <= b0:
+                finished.append(v)
+                continue
+            if v.start >= b1:
+                continue
+            s, e = max(b0, v.start), min(b1, v.end)
+            # gain appliqué dans un brouillon réutilisé : aucun temporaire par voix
+            scratch = self._scratch[:e - s, :v.samples.shape[1]]
+            np.multiply(v.samples[s - v.start:e - v.start], v.scale, out=scratch, casting="unsafe")
+            block[s - b0:e - b0] += scratch
+            if v.end <= b1:
+                finished.append(v)
+        if finished:
+            with self._lock:
+                for v in finished:
+                    self._voices.remove(v)
+        self.ring.write(block)
+        self._mixed.extend(finished)
+
+    def _has_work(self):
+        return bool(self._voices) or self.ring.fill > 0
+
+    def _feed_device(self):
+        """Transmet un bloc à la carte son quand le canal a de la place (True si transmis)"""
+        if self.channel.get_queue() is not None:
+            return False
+        if self.ring.fill < self.block_size:
+            if self._voices:
+                self.underruns += 1
+            return False
+        if self._streaming and not self.channel.get_busy():
+            # la carte son a tout consommé avant qu'on la réalimente
+            self.underruns += 1
+        self.ring.read(self.block_size, self._out)
+        np.multiply(self._out, 32767, out=self._out)
+        np.clip(self._out, -32768, 32767, out=self._pcm, casting="unsafe")
+        sound = self.backend.make_sound(self._pcm)
+        if self.channel.get_busy():
+            self.channel.queue(sound)
+        else:
+            self.channel.play(sound)
+        self.played += self.block_size
+        self._streaming = True
+        # une voix est terminée quand ses dernières trames sont parties à la carte son
+        still_pending = []
+        for v in self._mixed:
+            if v.end <= self.played or v._stopped:
+                v._done.set()
+            else:
+                still_pending.append(v)
+        self._mixed = still_pending
+        return True
+
+    def _run(self):
+        period = self.block_size / self.sample_rate / 4
+        while self._running:
+            if not self._has_work():
+                self._streaming = False
+                self.clock.sleep(period)
+                continue
+            while self.ring.free >= self.block_size and self._voices:
+                self._mix_block()
+            self._feed_device()
+            self.clock.sleep(period)
+
+    # ------------------------------------------------------ horloge virtuelle
+    def next_wakeup(self):
+        """Instant où le canal aura fini son bloc en cours (None si rien à jouer)"""
+        return self.channel.busy_until() if self._has_work() else None
+
+    def advance(self, now):
+        """Le travail du thread producteur, fait d'un coup jusqu'à l'instant `now`"""
+        if not self._has_work():
+            self._streaming = False
+            return
+        while self._running and self._has_work():
+            while self.ring.free >= self.block_size and self._voices:
+                self._mix_block()
+            if not self._feed_device():
+                break
+
+
+_stream = None
+_stream_lock = threading.Lock()
+
+
+def get_stream(sample_rate=44100):
+    """Moteur de flux partagé par tout le processus (créé au premier usage)"""
+    global _stream
+    with _stream_lock:
+        if _stream is None:
+            _stream = StreamingMixer(sample_rate)
+        return _stream
+
+
+def close_stream():
+    """Ferme le moteur partagé (il sera recréé au prochain get_stream)"""
+    global _stream
+    with _stream_lock:
+        if _stream is not None:
+            _stream.close()
+            _stream = None
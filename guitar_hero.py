@@ -1,86 +1,189 @@
-import random
+import os
 import time
 from note_frequence_base import note_to_frequency
+from hauteur import frequency
+from scores import ScoreStore
 from MusicPlayer_base_original import MusicPlayer
+from flux_audio import get_stream
+from synthese import synthesize_sequence
+from sortie_audio import get_clock
+from aleatoire import default_seed
 import select
 import sys
 
+import numpy as np
 
-def choose_notes():
+# Fenêtres de frappe (s après le début de la note) et durée d'une manche
+PERFECT_WINDOW = 0.300
+GOOD_WINDOW = 0.700
+ROUND_DURATION = 1.0
+ROUND_FADE = 0.02   # s : attaque et relâchement de chaque manche, pour entendre où elle commence
+
+
+class TerminalKeys:
+    """Lecture des touches une à une, sans attendre Entrée (mode cbreak du terminal)
+
+    Si l'entrée n'est pas un terminal (tube, fichier), on retombe sur une
+    lecture ligne par ligne. Les instants sont ceux de `clock` (sortie_audio) :
+    avec une horloge virtuelle, chaque ligne est la frappe d'une manche,
+    "A" (aussitôt) ou "A 0.25" (0.25 s après le début de l'attente), et une
+    attente sans touche avance l'horloge sans dormir.
+    """
+
+    def __init__(self, stream=sys.stdin, clock=None):
+        self.stream = stream
+        self.clock = clock or get_clock()
+        self.raw = False
+        self._saved = None
+
+    def __enter__(self):
+        if self.stream.isatty():
+            try:
+                import termios
+                import tty
+            except ImportError:
+                return self
+            fd = self.stream.fileno()
+            self._saved = termios.tcgetattr(fd)
+            tty.setcbreak(fd)
+            self.raw = True
+        return self
+
+    def __exit__(self, *exc):
+        if self._saved is not None:
+            import termios
+            termios.tcsetattr(self.stream.fileno(), termios.TCSADRAIN, self._saved)
+
+    def poll(self, timeout):
+        """(touche, instant de l'horloge) si une touche arrive avant `timeout` s, sinon None"""
+        wait = 0.0 if self.clock.virtual else max(0.0, timeout)
+        ready, _, _ = select.select([self.stream], [], [], wait)
+        if ready:
+            if self.raw:
+                key = os.read(self.stream.fileno(), 1).decode(errors="ignore")
+            else:
+                line = self.stream.readline()
+                key = line.strip() if line else None  # fin de l'entrée : plus de touche
+            if key is not None and self.clock.virtual and not self.raw:
+                key, _, delay = key.partition(" ")
+                delay = float(delay or 0)
+                if delay > timeout:
+                    key = None  # trop tard pour cette manche
+                else:
+                    self.clock.sleep(delay)
+            if key is not None:
+                return key, self.clock.now()
+        if self.clock.virtual or ready:
+            self.clock.sleep(timeout)
+        return None
+
+    def wait_until(self, instant):
+        """Attend `instant` en ignorant les touches tapées d'ici là"""
+        if self.clock.virtual:
+            # entrée scriptée : les lignes suivantes sont pour les prochaines manches
+            self.clock.sleep_until(instant)
+            return
+        while self.clock.now() < instant:
+            self.poll(instant - self.clock.now())
+
+    def drain(self):
+        """Oublie les touches tapées hors d'une fenêtre de jeu"""
+        while self.poll(0) is not None:
+            pass
+
+
+def choose_notes(rng=None):
+    rng = rng or np.random.default_rng()
     notes = list(note_to_frequency.keys())
-    return random.sample(notes, 5)
+    return [notes[i] for i in rng.choice(len(notes), 5, replace=False).tolist()]
 
 
 def has_note_been_pressed(key_to_press, pressed_key):
-    return key_to_press == pressed_key
+    return key_to_press.upper() == pressed_key.upper()
 
 
 def has_time_elapsed(start_time, duration):
     return (time.time() + duration) <= (start_time + duration)
 
 
-def play_guitar_hero():
+def judge(key_to_press, pressed_key, reaction, perfect=PERFECT_WINDOW, good=GOOD_WINDOW):
+    """Verdict d'une manche : "perfect", "good" ou "miss" """
+    if pressed_key is None or not has_note_been_pressed(key_to_press, pressed_key):
+        return "miss"
+    if reaction <= perfect:
+        return "perfect"
+    if reaction <= good:
+        return "good"
+    return "miss"
+
+
+def play_guitar_hero(perfect=PERFECT_WINDOW, good=GOOD_WINDOW, round_duration=ROUND_DURATION,
+                     seed=None):
+    """seed : même graine, mêmes notes et mêmes touches (MUSIC_SEED par défaut)"""
     print("Bienvenue dans le jeu Guitar Hero !")
     correct = 0
     errors = 0
     mp = MusicPlayer()
-    notes = choose_notes()
+    seed = default_seed() if seed is None else seed
+    rng = np.random.default_rng(seed)
+    notes = choose_notes(rng)
     name = input("Entrez votre nom : ")
     time_in_seconds = input("Combien de secondes voulez-vous jouer ? ")
     time_in_seconds = int(time_in_seconds)
     keys = ["A", "Z", "E", "R", "T"]
-    keys_and_notes = [(note, key) for note, key in zip(
-        random.choices(notes, k=time_in_seconds), random.choices(keys, k=time_in_seconds))]
-    for i in range(time_in_seconds):
-        print(
-            f"{keys_and_notes[i][1]} pour jouer {keys_and_notes[i][0]}")
-        mp.play(note_to_frequency[keys_and_notes[i]
-                                  [0]], 1)
-        ready, _, _ = select.select([sys.stdin], [], [], 1)
-        if ready:
-            pressed_key = sys.stdin.readline().strip()
-            if has_note_been_pressed(keys_and_notes[i][1], pressed_key):
-                print("Correct!")
-                correct += 1
-                continue
-            else:
+    n_rounds = int(time_in_seconds / round_duration)
+    keys_and_notes = [(notes[n], keys[k]) for n, k in zip(
+        rng.integers(len(notes), size=n_rounds).tolist(), rng.integers(len(keys), size=n_rounds).tolist())]
+    print(f"🎲 Graine : {seed} (MUSIC_SEED={seed} pour rejouer la même partie)")
+
+    # toutes les notes partent d'un bloc dans le flux audio, sans trou entre les manches :
+    # le début de la manche i est exactement i * round_duration après la première note.
+    # Chaque manche a sa propre attaque, même quand la note est celle de la manche précédente
+    signal = synthesize_sequence([frequency(note) for note, _ in keys_and_notes],
+                                 [round_duration] * n_rounds, mp.sample_rate,
+                                 articulate=True, fade=ROUND_FADE)
+    stream = get_stream(mp.sample_rate)
+    handle = stream.enqueue(signal, gain=mp.volume)
+    stream.wait_for(handle.start)
+    clock = stream.clock
+    start = clock.now()
+
+    hits = []
+    with TerminalKeys(clock=clock) as keyboard:
+        for i, (note, key) in enumerate(keys_and_notes):
+            onset = start + i * round_duration
+            deadline = onset + round_duration
+            # attente du début de la manche ; les frappes en avance ne comptent pas
+            keyboard.wait_until(onset)
+            print(f"{key} pour jouer {note}")
+
+            pressed_key, reaction = None, None
+            got = keyboard.poll(deadline - clock.now())
+            if got is not None:
+                pressed_key, pressed_at = got
+                reaction = pressed_at - onset
+
+            verdict = judge(key, pressed_key, reaction, perfect, good)
+            hits.append((key, pressed_key, reaction, verdict))
+            if verdict == "miss":
                 print("Raté !")
                 errors += 1
-        else:
-            pressed_key = ""
-            print("Raté !")
-            errors += 1
-        
+            else:
+                print(f"{'Parfait' if verdict == 'perfect' else 'Correct'} ! ({1000 * reaction:.0f} ms)")
+                correct += 1
+        handle.stop()
 
     print("Bien joué", name, "Vous avez eu", correct,
           "corrects et", errors, "erreurs.")
-    filename = "guitar_hero_scores.txt"
-    with open(filename, "a") as file:
-        try:
-            with open(filename, "r") as read_file:
-                lines = read_file.readlines()
-                updated_lines = []
-                user_found = False
-
-                for line in lines:
-                    if name in line:
-                        last_correct = int(line.split(
-                            ": ")[1].split(" corrects")[0])
-                        if correct > last_correct:
-                            updated_lines.append(
-                                f"{name}: {correct} corrects, {errors} erreurs\n")
-                            user_found = True
-                        else:
-                            updated_lines.append(line)
-                            return
-                    else:
-                        print(line)
-                        updated_lines.append(line)
-
-                if user_found:
-                    with open(filename, "w") as write_file:
-                        write_file.writelines(updated_lines)
-                    return
-        except FileNotFoundError:
-            pass
-        file.write(f"{name}: {correct} corrects, {errors} erreurs\n")
+    reactions = [h[2] for h in hits if h[3] != "miss"]
+    if reactions:
+        p50, p95 = np.percentile(reactions, [50, 95])
+        perfects = sum(1 for h in hits if h[3] == "perfect")
+        print(f"⏱️ Réaction : médiane {1000 * p50:.0f} ms, p95 {1000 * p95:.0f} ms, "
+              f"{perfects} parfaits sur {len(hits)} notes")
+    with ScoreStore() as store:
+        store.import_legacy()  # ancien guitar_hero_scores.txt, une seule fois
+        store.record_round(name, correct, errors, hits=hits)
+        print("\n🏆 Meilleurs scores :")
+        for rank, (player, best_correct, best_errors) in enumerate(store.leaderboard(5), start=1):
+            print(f"{rank}. {player}: {best_correct} corrects, {best_errors} erreurs")
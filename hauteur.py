@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Hauteurs en tempérament égal, calculées à partir des numéros de note MIDI.
+
+    A4 = MIDI 69 = 440 Hz (référence réglable), C4 = MIDI 60
+    fréquence = A4 * 2 ** ((midi - 69) / 12)
+
+Les noms acceptent dièses et bémols ("C#4", "Db4", "Bb4") et n'importe quelle
+octave. parse_notes convertit tout un tableau de noms en une fois.
+"""
+import re
+
+import numpy as np
+
+
+A4_MIDI = 69
+reference_a4 = 440.0   # modifiable : hauteur.reference_a4 = 442.0
+
+REST = -1      # "0" / "Unknown"
+INVALID = -2   # nom de note illisible
+
+NOTE_OFFSETS = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+ACCIDENTALS = {"#": 1, "b": -1}
+SHARP_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+
+_NOTE_RE = re.compile(r"^([A-Ga-g])([#b]*)(-?\d+)$")
+
+
+def is_rest(name):
+    return name == "0" or name.lower() == "unknown"
+
+
+def note_to_midi(name):
+    """"A4" -> 69, "Bb4" -> 70 ; ValueError si le nom est illisible"""
+    m = _NOTE_RE.match(name.strip())
+    if m is None:
+        raise ValueError(f"Note inconnue : {name!r}")
+    letter, accidentals, octave = m.groups()
+    shift = sum(ACCIDENTALS[a] for a in accidentals)
+    return 12 * (int(octave) + 1) + NOTE_OFFSETS[letter.upper()] + shift
+
+
+def midi_to_name(midi):
+    """69 -> "A4" (dièses)"""
+    midi = int(midi)
+    return f"{SHARP_NAMES[midi % 12]}{midi // 12 - 1}"
+
+
+def midi_to_frequency(midi, a4=None):
+    """Fréquence exacte (float) d'un numéro MIDI ou d'un tableau de numéros"""
+    if a4 is None:
+        a4 = reference_a4
+    return a4 * np.exp2((np.asarray(midi, dtype=np.float64) - A4_MIDI) / 12)
+
+
+def frequency(name, a4=None):
+    """Fréquence exacte d'un nom de note ; ValueError si le nom est illisible"""
+    return float(midi_to_frequency(note_to_midi(name), a4))
+
+
+def _safe_midi(name):
+    if is_rest(name):
+        return REST
+    try:
+        return note_to_midi(name)
+    except ValueError:
+        return INVALID
+
+
+def parse_notes(names, a4=None, strict=True):
+    """Tableau de noms -> (numéros MIDI int16, fréquences float64)
+
+    Les silences valent REST (fréquence 0). Avec strict=False, les noms
+    illisibles valent INVALID au lieu de lever ValueError. Chaque nom distinct
+    n'est analysé qu'une fois, puis le résultat est diffusé sur tout le tableau.
+    """
+    names = np.asarray(names, dtype=str)
+    unique, inverse = np.unique(names, return_inverse=True)
+    unique_midi = np.array([_safe_midi(n) for n in unique], dtype=np.int16)
+    if strict and (unique_midi == INVALID).any():
+        bad = ", ".join(unique[unique_midi == INVALID])
+        raise ValueError(f"Notes inconnues : {bad}")
+    midi = unique_midi[inverse.reshape(names.shape)]
+    freqs = np.where(midi >= 0, midi_to_frequency(midi, a4), 0.0)
+    return midi, freqs
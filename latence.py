@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Mesure de la latence touche -> son dans les claviers pygame (Menu.Piano,
+Menu.Guitare).
+
+Pour chaque KEYDOWN on garde : l'instant d'arrivée de l'évènement dans la
+file (DirtyRectScreen.arrived_at : pygame ne donne pas l'horodatage SDL, le
+temps passé dans la file est donc compté par excès, jamais oublié), l'instant
+où play() a été appelé, et la durée de la frame précédente. Une frame est le
+travail de la boucle, du réveil (fin de pygame.event.wait) jusqu'après
+l'envoi des zones redessinées : l'attente au repos entre deux touches n'en
+fait pas partie. Les dernières mesures sont gardées dans des tampons
+circulaires de taille fixe (p50/p95/p99 calculés à la demande), assez léger
+pour rester activé en production.
+
+Activation : variable d'environnement MUSIC_LATENCY=1 ; les mesures sont
+écrites à la fermeture du clavier dans MUSIC_LATENCY_FILE (défaut :
+latence_<instrument>.json).
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+
+WINDOW = 1024          # nb de mesures gardées pour les percentiles
+REFRESH = 0.5          # s entre deux recalculs de l'affichage
+
+
+def enabled_from_env():
+    return os.environ.get("MUSIC_LATENCY", "") not in ("", "0")
+
+
+class _Rolling:
+    """Tampon circulaire de mesures (secondes)"""
+
+    def __init__(self, size):
+        self.values = np.zeros(size, dtype=np.float64)
+        self.count = 0
+
+    def add(self, value):
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+
+    def filled(self):
+        return self.values[:min(self.count, len(self.values))]
+
+    def percentiles(self):
+        data = self.filled()
+        if not len(data):
+            return {"p50": None, "p95": None, "p99": None}
+        p50, p95, p99 = np.percentile(data, [50, 95, 99])
+        return {"p50": p50, "p95": p95, "p99": p99}
+
+
+class LatencyMonitor:
+    def __init__(self, name, window=WINDOW):
+        self.name = name
+        self.event_to_play = _Rolling(window)
+        self.frame_times = _Rolling(window)
+        # (lecture de l'évènement, appel à play(), durée de la frame) des dernières touches
+        self.keys = np.zeros((window, 3), dtype=np.float64)
+        self.key_count = 0
+        self._frame_start = None
+        self._arrived_at = None
+        self._last_frame = 0.0
+        self._overlay = ""
+        self._overlay_at = 0.0
+
+    @staticmethod
+    def now():
+        return time.perf_counter()
+
+    def begin_frame(self, woke_at=None, arrived_at=None):
+        """Début du travail d'une frame, à la sortie de l'attente des évènements
+
+        woke_at : fin de l'attente (défaut : maintenant) ; arrived_at : arrivée des
+        évènements de la frame dans la file (défaut : woke_at).
+        """
+        self._frame_start = time.perf_counter() if woke_at is None else woke_at
+        self._arrived_at = self._frame_start if arrived_at is None else arrived_at
+
+    def end_frame(self):
+        """Fin du travail de la frame (évènements traités, zones sales envoyées)"""
+        if self._frame_start is None:
+            return
+        self._last_frame = time.perf_counter() - self._frame_start
+        self.frame_times.add(self._last_frame)
+        self._frame_start = None
+
+    def key_played(self, played_at=None):
+        """À appeler juste après le play() déclenché par un KEYDOWN"""
+        if played_at is None:
+            played_at = time.perf_counter()
+        read_at = self._arrived_at if self._arrived_at is not None else played_at
+        self.event_to_play.add(played_at - read_at)
+        self.keys[self.key_count % len(self.keys)] = (read_at, played_at, self._last_frame)
+        self.key_count += 1
+
+    def summary(self):
+        to_ms = lambda p: {k: (None if v is None else 1000 * v) for k, v in p.items()}
+        return {
+            "instrument": self.name,
+            "keys": self.key_count,
+            "frames": self.frame_times.count,
+            "event_to_play_ms": to_ms(self.event_to_play.percentiles()),
+            "frame_ms": to_ms(self.frame_times.percentiles()),
+        }
+
+    def overlay_text(self):
+        """Texte court à afficher à l'écran (recalculé au plus toutes les REFRESH s)"""
+        now = time.perf_counter()
+        if now - self._overlay_at >= REFRESH:
+            s = self.summary()
+            fmt = lambda v: "-" if v is None else f"{v:.2f}"
+            e, f = s["event_to_play_ms"], s["frame_ms"]
+            self._overlay = (f"touche->play p50 {fmt(e['p50'])} p95 {fmt(e['p95'])} "
+                             f"p99 {fmt(e['p99'])} ms | frame p95 {fmt(f['p95'])} ms")
+            self._overlay_at = now
+        return self._overlay
+
+    def dump(self, filename=None):
+        if filename is None:
+            filename = os.environ.get("MUSIC_LATENCY_FILE", f"latence_{self.name.lower()}.json")
+        n = min(self.key_count, len(self.keys))
+        # remet les dernières touches dans l'ordre chronologique
+        order = np.roll(np.arange(n), -(self.key_count % len(self.keys)) if self.key_count > n else 0)
+        report = self.summary()
+        report["samples"] = [
+            {"event_read": r[0], "play_called": r[1], "frame_s": r[2]}
+            for r in self.keys[order].tolist()
+        ]
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return filename
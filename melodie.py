@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mélodies apprises : chaîne de Markov d'ordre n sur des notes (hauteur, durée).
+
+Entraînement : chaque partition du corpus (texte, .npart ou .mid) est lue
+une fois puis oubliée. Ses notes deviennent des symboles (numéro MIDI ou
+silence, durée en ms ; pour un accord, seule la note la plus haute compte),
+et les n-grammes de tous les ordres 0..ORDER sont comptés d'un bloc
+(np.unique sur une fenêtre glissante). Seuls ces compteurs restent en
+mémoire, quelle que soit la taille du corpus.
+
+Modèle : pour chaque ordre, une table creuse (un contexte = les k symboles
+précédents -> ses successeurs observés) au format CSR, avec une table
+d'alias (Vose) par contexte : le tirage de la note suivante coûte deux
+nombres aléatoires et deux lectures, quel que soit le nombre de
+successeurs. Un contexte jamais vu (ou sans suite dans le corpus) se
+rabat sur l'ordre inférieur, jusqu'à l'ordre 0 (fréquence des symboles).
+
+Le modèle est enregistré dans MODEL_FILE (.npz, à côté des partitions) et
+rechargé tant qu'aucune partition du corpus n'est plus récente.
+
+    melody = load_model()                      # corpus par défaut, entraîné si besoin
+    melody.generate(seed=42).take(20)          # [(nom, fréquence, durée), ...]
+
+    python melodie.py train pirate.txt mario.txt "touches_*.txt"
+    python melodie.py generate -n 20 --seed 42
+"""
+import glob
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+
+from aleatoire import CHUNK, default_seed
+from hauteur import note_to_midi, midi_to_name, midi_to_frequency
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS = ["pirate.txt", "mario.txt", "touches_*.txt"]   # motifs relatifs à HERE
+MODEL_FILE = os.path.join(HERE, "melodie.npz")
+ORDER = 2           # nb de symboles de contexte (2 = trigrammes)
+REST = -1           # hauteur d'un silence dans les symboles
+FORMAT_VERSION = 1
+
+
+def find_corpus(patterns=CORPUS, root=HERE):
+    """Fichiers du corpus, triés ; motifs glob relatifs à root"""
+    files = set()
+    for pattern in patterns:
+        files.update(glob.glob(os.path.join(root, pattern)))
+    return sorted(files)
+
+
+def score_symbols(filename):
+    """(hauteur MIDI ou REST, durée ms) de chaque note d'une partition, dans l'ordre"""
+    from partition_binaire import load_score
+    score = load_score(filename)
+    if not len(score):
+        return np.zeros((0, 2), dtype=np.int64)
+    names = [n.decode() for n in score.pitches["name"].tolist()]
+    table = np.array([REST] + [note_to_midi(n) for n in names[1:]], dtype=np.int64)
+    pitch = table[score.events["pitch"]]
+    start = np.asarray(score.events["start"], dtype=np.int64)
+    ms = np.rint(np.asarray(score.events["ticks"], dtype=np.float64)
+                 * 1000 / score.ticks_per_second).astype(np.int64)
+    if score.polyphonic:
+        # accords : la note la plus haute de chaque début fait la mélodie
+        order = np.lexsort((-pitch, start))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = start[order][1:] != start[order][:-1]
+        keep = order[first]
+        pitch, ms = pitch[keep], ms[keep]
+    keep = ms > 0
+    return np.stack((pitch[keep], ms[keep]), axis=1)
+
+
+def _alias_table(weights):
+    """Table d'alias de Vose : (probabilités, alias relatifs) pour des poids > 0"""
+    n = len(weights)
+    scaled = np.asarray(weights, dtype=np.float64) * n / np.sum(weights)
+    prob = np.ones(n)
+    alias = np.arange(n)
+    small = [i for i in range(n) if scaled[i] < 1.0]
+    large = [i for i in range(n) if scaled[i] >= 1.0]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] -= 1.0 - scaled[s]
+        (small if scaled[l] < 1.0 else large).append(l)
+    return prob, alias
+
+
+class Trainer:
+    """Compte les n-grammes d'un corpus, une partition à la fois"""
+
+    def __init__(self, order=ORDER):
+        self.order = order
+        self.symbols = {}                               # (hauteur, ms) -> identifiant
+        self.counts = [Counter() for _ in range(order + 1)]
+        self.files = 0
+        self.notes = 0
+
+    def add_file(self, filename):
+        self.add_symbols(score_symbols(filename))
+        self.files += 1
+
+    def add_symbols(self, pairs):
+        """pairs : tableau (N, 2) de (hauteur, durée ms) d'une même mélodie"""
+        if not len(pairs):
+            return
+        unique, inverse = np.unique(pairs, axis=0, return_inverse=True)
+        local = np.array([self.symbols.setdefault(tuple(p), len(self.symbols))
+                          for p in unique.tolist()], dtype=np.int64)
+        ids = local[inverse.ravel()]
+        self.notes += len(ids)
+        for k in range(self.order + 1):
+            if len(ids) <= k:
+                break
+            # toutes les fenêtres (contexte de k symboles, suivant) d'un coup
+            grams, counts = np.unique(np.lib.stride_tricks.sliding_window_view(ids, k + 1),
+                                      axis=0, return_counts=True)
+            table = self.counts[k]
+            for gram, count in zip(map(tuple, grams.tolist()), counts.tolist()):
+                table[gram] += count
+
+    def model(self):
+        """Tables de tirage (MarkovMelody) à partir des compteurs"""
+        if not self.symbols:
+            raise ValueError("Corpus vide : aucune note à apprendre")
+        symbols = np.array(sorted(self.symbols, key=self.symbols.get), dtype=np.int64)
+        base = len(symbols)
+        tables = []
+        for k, table in enumerate(self.counts):
+            grams = np.array(sorted(table), dtype=np.int64).reshape(-1, k + 1)
+            counts = np.array([table[g] for g in map(tuple, grams.tolist())], dtype=np.float64)
+            keys = _context_keys(grams[:, :k], base)
+            # grams est trié par contexte puis suivant : un contexte = une tranche contiguë
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else keys
+            ptr = np.r_[starts, len(keys)].astype(np.int64)
+            prob = np.empty(len(keys))
+            alias = np.empty(len(keys), dtype=np.int64)
+            for lo, hi in zip(ptr[:-1].tolist(), ptr[1:].tolist()):
+                p, a = _alias_table(counts[lo:hi])
+                prob[lo:hi] = p
+                alias[lo:hi] = a + lo
+            tables.append((keys[starts], ptr, grams[:, k].copy(), prob, alias))
+        return MarkovMelody(symbols, tables)
+
+
+def _context_keys(contexts, base):
+    """Contextes (R, k) -> entiers uniques : somme des symboles x base ** position"""
+    if contexts.shape[1] and base ** contexts.shape[1] >= 2 ** 63:
+        raise ValueError(f"Trop de symboles ({base}) pour un contexte d'ordre {contexts.shape[1]}")
+    keys = np.zeros(len(contexts), dtype=np.int64)
+    for j in range(contexts.shape[1]):
+        keys = keys * base + contexts[:, j]
+    return keys
+
+
+class MarkovMelody:
+    def __init__(self, symbols, tables, sources=()):
+        """symbols : (V, 2) hauteur, ms ; tables[k] : clés, ptr, suivants, prob, alias (ordre k)"""
+        self.symbols = symbols
+        self.tables = tables
+        self.order = len(tables) - 1
+        self.sources = list(sources)
+        self._rows = [dict(zip(keys.tolist(), range(len(keys)))) for keys, *_ in tables]
+        pitch = symbols[:, 0]
+        self.names = [midi_to_name(p) if p != REST else "0" for p in pitch.tolist()]
+        self.frequencies = np.where(pitch == REST, 0.0, midi_to_frequency(np.maximum(pitch, 0)))
+        self.durations = symbols[:, 1] / 1000.0
+
+    def __len__(self):
+        """Nombre de symboles (hauteur, durée) distincts"""
+        return len(self.symbols)
+
+    def generate(self, seed=None, **options):
+        return MelodySequence(self, seed, **options)
+
+    # --------------------------------------------------------- persistance
+    def save(self, path=MODEL_FILE):
+        arrays = {"version": np.array(FORMAT_VERSION), "symbols": self.symbols,
+                  "sources": np.array(self.sources, dtype=str)}
+        for k, table in enumerate(self.tables):
+            for name, array in zip(("keys", "ptr", "next", "prob", "alias"), table):
+                arrays[f"{name}{k}"] = array
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path=MODEL_FILE):
+        """ValueError si le fichier n'est pas un modèle de cette version"""
+        with np.load(path) as data:
+            if "version" not in data or int(data["version"]) != FORMAT_VERSION:
+                raise ValueError(f"{path} : version du modèle non gérée")
+            tables = []
+            while f"keys{len(tables)}" in data:
+                k = len(tables)
+                tables.append(tuple(data[f"{name}{k}"] for name in ("keys", "ptr", "next", "prob", "alias")))
+            return cls(data["symbols"], tables, data["sources"].tolist())
+
+
+class MelodySequence:
+    """Mélodie tirée d'un MarkovMelody : même interface que aleatoire.RandomSequence"""
+
+    def __init__(self, model, seed=None, chunk=CHUNK):
+        self.model = model
+        self.seed = default_seed() if seed is None else int(seed)
+        self.chunk = chunk
+        self.reset()
+
+    def reset(self):
+        self._rng = np.random.default_rng(self.seed)
+        self._history = []
+        self._uniforms = self._uniform_pairs()
+
+    def _uniform_pairs(self):
+        # nombres aléatoires tirés par blocs, deux par note
+        while True:
+            yield from self._rng.random((self.chunk, 2)).tolist()
+
+    def _next_ids(self, length):
+        model = self.model
+        base = len(model.symbols)
+        tables = [tuple(t[1:]) for t in model.tables]
+        rows = model._rows
+        history = self._history
+        uniforms = self._uniforms
+        produced = 0
+        while length is None or produced < length:
+            u, v = next(uniforms)
+            # contexte le plus long déjà vu, sinon ordre inférieur
+            for k in range(min(model.order, len(history)), -1, -1):
+                key = 0
+                for s in history[len(history) - k:]:
+                    key = key * base + s
+                row = rows[k].get(key)
+                if row is not None:
+                    break
+            ptr, nexts, prob, alias = tables[k]
+            lo = ptr[row]
+            slot = lo + int(u * (ptr[row + 1] - lo))
+            symbol = int(nexts[slot] if v < prob[slot] else nexts[alias[slot]])
+            history.append(symbol)
+            if len(history) > model.order:
+                del history[0]
+            produced += 1
+            yield symbol
+
+    def notes(self, length=None):
+        """(nom, fréquence, durée) une par une ; length=None : sans fin"""
+        model = self.model
+        names, freqs, durations = model.names, model.frequencies.tolist(), model.durations.tolist()
+        for s in self._next_ids(length):
+            yield names[s], freqs[s], durations[s]
+
+    def events(self, length=None):
+        """(début s, fréquence, durée) des notes enchaînées, pour prelecture.PlaybackPipeline"""
+        start = 0.0
+        for _, freq, dur in self.notes(length):
+            yield start, freq, dur
+            start += dur
+
+    def __iter__(self):
+        return self.notes()
+
+    def take(self, length):
+        return list(self.notes(length))
+
+
+# ------------------------------------------------------------- chargement
+def train(files, order=ORDER):
+    trainer = Trainer(order)
+    for filename in files:
+        try:
+            trainer.add_file(filename)
+        except (OSError, ValueError) as exc:
+            print(f"⚠️ {filename} ignoré : {exc}")
+    model = trainer.model()
+    model.sources = [os.path.abspath(f) for f in files]
+    return model
+
+
+def is_up_to_date(model_file, files):
+    if not os.path.exists(model_file):
+        return False
+    built = os.path.getmtime(model_file)
+    return all(os.path.getmtime(f) <= built for f in files)
+
+
+def load_model(files=None, path=MODEL_FILE, order=ORDER):
+    """Modèle du corpus (défaut : CORPUS), rechargé depuis path ou réentraîné si besoin"""
+    files = find_corpus() if files is None else list(files)
+    sources = [os.path.abspath(f) for f in files]
+    if is_up_to_date(path, files):
+        try:
+            model = MarkovMelody.load(path)
+            if sorted(model.sources) == sorted(sources) and model.order == order:
+                return model
+        except (OSError, ValueError, KeyError):
+            pass  # modèle illisible ou d'une autre version : on réentraîne
+    model = train(files, order)
+    try:
+        model.save(path)
+    except OSError:
+        pass  # dossier en lecture seule : le modèle reste en mémoire
+    return model
+
+
+def main(argv=None):
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Mélodies apprises sur des partitions (Markov)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    tr = sub.add_parser("train", help="entraîne et enregistre le modèle")
+    tr.add_argument("sources", nargs="*", default=CORPUS, help="partitions ou motifs glob")
+    tr.add_argument("--order", type=int, default=ORDER)
+    tr.add_argument("-o", "--output", default=MODEL_FILE)
+    gen = sub.add_parser("generate", help="tire une mélodie")
+    gen.add_argument("-n", type=int, default=20)
+    gen.add_argument("--seed", type=int)
+    gen.add_argument("--model", default=MODEL_FILE)
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        files = find_corpus(args.sources, root=os.getcwd())
+        t = time.perf_counter()
+        model = train(files, args.order)
+        model.save(args.output)
+        print(f"💾 {args.output} : {len(files)} partitions, {len(model)} symboles, ordre "
+              f"{model.order}, {time.perf_counter() - t:.2f} s")
+    else:
+        model = MarkovMelody.load(args.model) if os.path.exists(args.model) else load_model()
+        melody = model.generate(args.seed)
+        print(f"🎲 Graine : {melody.seed}")
+        for name, freq, dur in melody.notes(args.n):
+            print(f"{name} {dur:.3f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
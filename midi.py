@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fichiers MIDI standard (SMF type 0 et 1) : lecture et écriture.
+
+Lecture : le fichier est mappé en mémoire (mmap) et parcouru une seule fois,
+piste par piste. Seuls les octets de contrôle sont lus un à un (délais et
+longueurs en quantité de longueur variable, octets d'état, running status
+compris) ; les données des méta-évènements et sysex sont sautées d'un bloc
+grâce à leur longueur. Les notes sont appariées (note on / note off, ou note
+on à vélocité nulle) au fil du parcours, puis toutes les dates en ticks sont
+converties en secondes d'un coup avec la carte des tempos (np.searchsorted).
+
+Résultat : un tableau NumPy structuré NOTE_DTYPE, une ligne par note :
+
+    onset (s)  duration (s)  pitch (MIDI)  velocity  channel  track
+
+MidiSong.to_score() le transforme en partition (partition_binaire.CompiledScore) :
+partition_binaire.load_score accepte donc directement les .mid, et avec lui
+MusicPlayer.play_from_file, rendu.py et rendu_lot.py.
+
+Écriture : write_midi() produit un fichier type 0 à partir de débuts, notes et
+durées ; score_to_midi() convertit une partition texte (sessions enregistrées
+au clavier) et sequence_to_midi() une séquence de Sequence_rand.
+
+Exemples :
+    python midi.py info morceau.mid
+    python midi.py export touches_piano.txt touches_piano.mid
+"""
+import mmap
+import struct
+import sys
+
+import numpy as np
+
+from hauteur import note_to_midi, midi_to_name, midi_to_frequency, is_rest
+
+
+NOTE_DTYPE = np.dtype([("onset", "<f8"), ("duration", "<f8"), ("pitch", "u1"),
+                       ("velocity", "u1"), ("channel", "u1"), ("track", "<u2")])
+
+DEFAULT_TEMPO = 500_000      # µs par noire (120 BPM) tant qu'aucun tempo n'est donné
+TICKS_PER_QUARTER = 480      # résolution des fichiers écrits
+VELOCITY = 100               # vélocité des notes exportées
+DRUM_CHANNEL = 9             # canal 10 : percussions General MIDI
+
+# nb d'octets de données des messages de canal, par quartet de poids fort
+_DATA_BYTES = {0x8: 2, 0x9: 2, 0xA: 2, 0xB: 2, 0xC: 1, 0xD: 1, 0xE: 2}
+
+
+class MidiSong:
+    """Notes d'un fichier MIDI (NOTE_DTYPE, triées par début) et carte des tempos"""
+
+    def __init__(self, notes, tempos, ticks_per_quarter, fmt=1, tracks=1):
+        self.notes = notes
+        self.tempos = tempos            # [(tick, µs par noire)], trié
+        self.ticks_per_quarter = ticks_per_quarter
+        self.format = fmt
+        self.tracks = tracks
+
+    def __len__(self):
+        return len(self.notes)
+
+    @property
+    def length(self):
+        """Durée totale en secondes"""
+        if not len(self.notes):
+            return 0.0
+        return float((self.notes["onset"] + self.notes["duration"]).max())
+
+    def to_score(self, drums=False):
+        """Partition jouable (CompiledScore) ; drums=False ignore le canal 10 (percussions)"""
+        from partition_binaire import (CompiledScore, EVENT_DTYPE, FLAG_POLYPHONIC,
+                                       PITCH_DTYPE, REST, TICKS_PER_SECOND)
+        notes = self.notes if drums else self.notes[self.notes["channel"] != DRUM_CHANNEL]
+        start = np.rint(notes["onset"] * TICKS_PER_SECOND).astype(np.int64)
+        ticks = np.rint(notes["duration"] * TICKS_PER_SECOND).astype(np.int64)
+        end = start + ticks
+        # une note qui commence avant la fin de la précédente : accords / chevauchements
+        polyphonic = bool(len(notes) > 1 and (start[1:] < np.maximum.accumulate(end)[:-1]).any())
+
+        used = np.unique(notes["pitch"])
+        table = np.zeros(len(used) + 1, dtype=PITCH_DTYPE)
+        table["name"][0] = b"0"
+        table["name"][1:] = [midi_to_name(m).encode() for m in used]
+        table["frequency"][1:] = midi_to_frequency(used)
+        pitch = np.searchsorted(used, notes["pitch"]) + 1
+
+        if not polyphonic and len(notes):
+            # une note après l'autre : les trous deviennent des silences explicites, comme
+            # dans une partition texte
+            gap_start = np.concatenate(([0], end[:-1]))
+            gap = start - gap_start
+            has_gap = gap > 0
+            n = len(notes) + int(has_gap.sum())
+            events = np.zeros(n, dtype=EVENT_DTYPE)
+            at = np.arange(len(notes)) + np.cumsum(has_gap)
+            events["start"][at] = start
+            events["ticks"][at] = ticks
+            events["pitch"][at] = pitch
+            rests = at[has_gap] - 1
+            events["start"][rests] = gap_start[has_gap]
+            events["ticks"][rests] = gap[has_gap]
+            events["pitch"][rests] = REST
+            return CompiledScore(table, events, TICKS_PER_SECOND, 0)
+
+        events = np.zeros(len(notes), dtype=EVENT_DTYPE)
+        events["start"] = start
+        events["ticks"] = ticks
+        events["pitch"] = pitch
+        return CompiledScore(table, events, TICKS_PER_SECOND, FLAG_POLYPHONIC if polyphonic else 0)
+
+
+# ------------------------------------------------------------------ lecture
+def _read_track(buf, pos, end, track, notes, tempos):
+    """Parcourt une piste MTrk ; ajoute (début, fin, hauteur, vélocité, canal, piste) en ticks"""
+    tick = 0
+    status = 0
+    held = {}   # (canal << 7) | hauteur -> [(tick d'appui, vélocité)]
+    while pos < end:
+        # délai : quantité de longueur variable (7 bits par octet, bit 7 = suite)
+        byte = buf[pos]
+        pos += 1
+        delta = byte & 0x7F
+        while byte & 0x80:
+            byte = buf[pos]
+            pos += 1
+            delta = (delta << 7) | (byte & 0x7F)
+        tick += delta
+
+        byte = buf[pos]
+        if byte & 0x80:
+            pos += 1
+            if byte < 0xF0:
+                status = byte
+            elif byte == 0xFF:
+                # méta-évènement : annule le running status, comme sysex et messages système
+                status = 0
+                kind = buf[pos]
+                pos += 1
+                byte = buf[pos]
+                pos += 1
+                length = byte & 0x7F
+                while byte & 0x80:
+                    byte = buf[pos]
+                    pos += 1
+                    length = (length << 7) | (byte & 0x7F)
+                if kind == 0x51 and length == 3:
+                    tempos.append((tick, (buf[pos] << 16) | (buf[pos + 1] << 8) | buf[pos + 2]))
+                elif kind == 0x2F:
+                    break
+                pos += length
+                continue
+            elif byte in (0xF0, 0xF7):
+                status = 0
+                byte = buf[pos]
+                pos += 1
+                length = byte & 0x7F
+                while byte & 0x80:
+                    byte = buf[pos]
+                    pos += 1
+                    length = (length << 7) | (byte & 0x7F)
+                pos += length
+                continue
+            else:
+                # messages système sans longueur (horloge, start/stop...) : rien à lire
+                if byte < 0xF8:
+                    status = 0
+                continue
+        elif not status:
+            raise ValueError(f"Octet de données {byte:#04x} sans running status à l'octet {pos}")
+        # sinon running status : l'octet lu est déjà la première donnée
+
+        kind = status >> 4
+        if kind == 0x9 or kind == 0x8:
+            pitch = buf[pos]
+            velocity = buf[pos + 1]
+            pos += 2
+            key = ((status & 0x0F) << 7) | pitch
+            if kind == 0x9 and velocity:
+                held.setdefault(key, []).append((tick, velocity))
+            else:
+                pressed = held.get(key)
+                if pressed:
+                    start, vel = pressed.pop(0)
+                    notes.append((start, tick, pitch, vel, status & 0x0F, track))
+        else:
+            pos += _DATA_BYTES[kind]
+
+    # notes jamais relâchées : elles durent jusqu'à la fin de la piste
+    for key, pressed in held.items():
+        for start, vel in pressed:
+            notes.append((start, tick, key & 0x7F, vel, key >> 7, track))
+
+
+def _tick_to_seconds(ticks, tempos, division):
+    """Dates en ticks -> secondes, avec la carte des tempos (vectorisé)"""
+    ticks = np.asarray(ticks, dtype=np.float64)
+    if division & 0x8000:
+        # division SMPTE : images/s (octet signé) x ticks par image, tempo sans effet
+        fps = 256 - (division >> 8)
+        return ticks / (fps * (division & 0xFF))
+    changes = np.array(sorted(tempos) or [(0, DEFAULT_TEMPO)], dtype=np.float64)
+    if changes[0, 0] > 0:
+        changes = np.vstack(([0, DEFAULT_TEMPO], changes))
+    at, tempo = changes[:, 0], changes[:, 1]
+    seconds_per_tick = tempo / 1e6 / division
+    # instant (s) de chaque changement de tempo
+    origin = np.concatenate(([0.0], np.cumsum(np.diff(at) * seconds_per_tick[:-1])))
+    i = np.searchsorted(at, ticks, side="right") - 1
+    return origin[i] + (ticks - at[i]) * seconds_per_tick[i]
+
+
+def load_midi(filename):
+    """Lit un fichier MIDI type 0 ou 1 -> MidiSong ; ValueError si le fichier est invalide"""
+    with open(filename, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        buf = memoryview(mm)
+        try:
+            if buf[:4] != b"MThd":
+                raise ValueError(f"{filename} n'est pas un fichier MIDI")
+            size, fmt, n_tracks, division = struct.unpack_from(">IHHH", buf, 4)
+            if fmt not in (0, 1):
+                raise ValueError(f"{filename} : MIDI type {fmt} non géré (types 0 et 1 seulement)")
+            pos = 8 + size
+            notes, tempos = [], []
+            track = 0
+            while pos + 8 <= len(buf) and track < n_tracks:
+                chunk, length = struct.unpack_from(">4sI", buf, pos)
+                pos += 8
+                if chunk == b"MTrk":
+                    try:
+                        _read_track(buf, pos, min(pos + length, len(buf)), track, notes, tempos)
+                    except IndexError:
+                        raise ValueError(f"{filename} : piste {track} tronquée") from None
+                    track += 1
+                pos += length  # blocs inconnus : ignorés
+        finally:
+            buf.release()
+
+    raw = np.array(notes, dtype=np.int64).reshape(-1, 6)
+    song = np.zeros(len(raw), dtype=NOTE_DTYPE)
+    onset = _tick_to_seconds(raw[:, 0], tempos, division)
+    song["onset"] = onset
+    song["duration"] = _tick_to_seconds(raw[:, 1], tempos, division) - onset
+    song["pitch"], song["velocity"] = raw[:, 2], raw[:, 3]
+    song["channel"], song["track"] = raw[:, 4], raw[:, 5]
+    song = song[np.lexsort((song["pitch"], song["onset"]))]
+    tempo_map = sorted(tempos) or [(0, DEFAULT_TEMPO)]
+    return MidiSong(song, tempo_map, division, fmt, track)
+
+
+# ------------------------------------------------------------------ écriture
+def _vlq(value):
+    """Entier -> quantité de longueur variable"""
+    out = bytearray([value & 0x7F])
+    value >>= 7
+    while value:
+        out.insert(0, (value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(out)
+
+
+def write_midi(filename, onsets, pitches, durations, velocities=VELOCITY, bpm=120,
+               ticks_per_quarter=TICKS_PER_QUARTER, channel=0, name=None):
+    """Écrit des notes (débuts s, numéros MIDI, durées s) dans un fichier MIDI type 0"""
+    tempo = int(round(60_000_000 / bpm))
+    ticks_per_second = ticks_per_quarter * 1e6 / tempo
+    onsets = np.asarray(onsets, dtype=np.float64)
+    start = np.rint(onsets * ticks_per_second).astype(np.int64)
+    end = np.maximum(np.rint((onsets + np.asarray(durations, dtype=np.float64))
+                             * ticks_per_second).astype(np.int64), start + 1)
+    pitches = np.asarray(pitches, dtype=np.int64)
+    velocities = np.broadcast_to(np.asarray(velocities, dtype=np.int64), pitches.shape)
+    # un octet de données MIDI n'a que 7 bits : hors de 0..127 la piste serait corrompue
+    bad = np.flatnonzero((pitches < 0) | (pitches > 127))
+    if len(bad):
+        i = int(bad[0])
+        raise ValueError(f"Note {i} hors de la plage MIDI 0..127 : hauteur {pitches[i]} "
+                         f"({midi_to_name(pitches[i])})")
+    bad = np.flatnonzero((velocities < 0) | (velocities > 127))
+    if len(bad):
+        i = int(bad[0])
+        raise ValueError(f"Note {i} ({midi_to_name(pitches[i])}) : vélocité {velocities[i]} "
+                         f"hors de la plage MIDI 0..127")
+    if not 0 <= channel <= 15:
+        raise ValueError(f"Canal MIDI {channel} hors de la plage 0..15")
+
+    # tous les évènements d'un coup : note off avant note on au même tick
+    ticks = np.concatenate((end, start))
+    order = np.lexsort((np.repeat([0, 1], len(start)), ticks))
+    is_on = order >= len(start)
+    key = np.concatenate((pitches, pitches))[order]
+    vel = np.concatenate((np.zeros_like(velocities), velocities))[order]
+    delta = np.diff(ticks[order], prepend=0)
+
+    track = bytearray()
+    if name:
+        encoded = name.encode("utf-8")
+        track += b"\x00\xff\x03" + _vlq(len(encoded)) + encoded
+    track += b"\x00\xff\x51\x03" + tempo.to_bytes(3, "big")
+    on, off = 0x90 | channel, 0x80 | channel
+    for d, o, k, v in zip(delta.tolist(), is_on.tolist(), key.tolist(), vel.tolist()):
+        track += _vlq(d) + bytes((on if o else off, k, v))
+    track += b"\x00\xff\x2f\x00"
+
+    with open(filename, "wb") as f:
+        f.write(b"MThd" + struct.pack(">IHHH", 6, 0, 1, ticks_per_quarter))
+        f.write(b"MTrk" + struct.pack(">I", len(track)))
+        f.write(track)
+    return filename
+
+
+def score_to_midi(score_file, midi_file, **options):
+    """Partition (texte, .npart ou session enregistrée) -> fichier MIDI ; les silences disparaissent"""
+    from partition_binaire import CompiledScore, SUFFIX, TICKS_PER_SECOND, load_score, parse_text
+    if score_file.lower().endswith((SUFFIX, ".mid", ".midi")):
+        score = load_score(score_file)
+    else:
+        # texte lu en mémoire : pas de .npart laissé à côté d'une session qu'on va effacer
+        table, events, flags = parse_text(score_file)
+        score = CompiledScore(table, events, TICKS_PER_SECOND, flags)
+    names = [n.decode() for n in score.pitches["name"].tolist()]
+    midi = np.array([-1] + [note_to_midi(n) for n in names[1:]])[score.events["pitch"]]
+    keep = midi >= 0
+    return write_midi(midi_file, score.starts[keep], midi[keep], score.durations[keep], **options)
+
+
+def sequence_to_midi(sequence, midi_file, **options):
+    """Séquence [(nom, fréquence, durée)] (Sequence_rand) -> fichier MIDI, notes enchaînées"""
+    durations = np.array([dur for _, _, dur in sequence], dtype=np.float64)
+    onsets = np.cumsum(durations) - durations
+    # les silences ("0") ne donnent pas de note mais gardent leur place
+    notes = [i for i, (name, _, _) in enumerate(sequence) if not is_rest(name)]
+    pitches = [note_to_midi(sequence[i][0]) for i in notes]
+    return write_midi(midi_file, onsets[notes], pitches, durations[notes], **options)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Fichiers MIDI : résumé et export")
+    sub = parser.add_subparsers(dest="command", required=True)
+    info = sub.add_parser("info", help="résumé d'un fichier MIDI")
+    info.add_argument("fichier")
+    export = sub.add_parser("export", help="partition texte -> MIDI")
+    export.add_argument("partition")
+    export.add_argument("sortie")
+    export.add_argument("--bpm", type=float, default=120)
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        song = load_midi(args.fichier)
+        print(f"🎼 {args.fichier} : type {song.format}, {song.tracks} piste(s), {len(song)} notes, "
+              f"{song.length:.1f} s, {len(song.tempos)} tempo(s)")
+        score = song.to_score()
+        print(f"   {'polyphonique' if score.polyphonic else 'monophonique'}, "
+              f"{len(score.pitches) - 1} hauteurs distinctes")
+    else:
+        score_to_midi(args.partition, args.sortie, bpm=args.bpm)
+        print(f"💾 {args.partition} -> {args.sortie}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Mixeur polyphonique pour les partitions avec accords.
+
+- les voix sont additionnées (dtype de synthèse, float32 par défaut) bloc par
+  bloc de BLOCK trames, au fil des notes : blocks() alimente la lecture en
+  flux (prelecture.py), mix() recopie les mêmes blocs dans un seul tampon
+  pour le rendu hors ligne ; chaque note ne coûte que sa propre longueur, le
+  coût suit le nombre de voix actives, pas la longueur de la partition ;
+- polyphonie plafonnée à `max_voices` : une note de plus vole la voix la
+  plus ancienne, coupée avec un court fondu pour éviter le clic ;
+- marge (headroom, en dB) puis écrêtage doux au-delà de `knee` : un accord
+  de dix notes sature en douceur au lieu de cliquer.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from synthese import get_dtype
+
+
+MAX_VOICES = 16
+HEADROOM_DB = -6.0
+KNEE = 0.8            # au-dessus, la courbe s'aplatit (tanh) vers 1
+STEAL_FADE = 0.005    # s de fondu sur une voix volée
+BLOCK = 4096          # trames par bloc mélangé
+WAVES = 256           # ondes de notes gardées pendant le mélange (LRU)
+
+
+def soft_clip(buffer, knee=KNEE):
+    """Écrêtage doux en place : linéaire jusqu'à `knee`, tend vers ±1 au-delà"""
+    over = np.flatnonzero(np.abs(buffer) > knee)
+    if len(over):
+        x = buffer[over]
+        excess = (np.abs(x) - knee) / (1 - knee)
+        buffer[over] = np.sign(x) * (knee + (1 - knee) * np.tanh(excess))
+    return buffer
+
+
+class VoiceMixer:
+    def __init__(self, sample_rate=44100, max_voices=MAX_VOICES, headroom_db=HEADROOM_DB,
+                 soft_clip=True):
+        self.sample_rate = sample_rate
+        self.max_voices = max_voices
+        self.headroom_db = headroom_db
+        self.soft_clip = soft_clip
+        self.stats = {}
+
+    def mix(self, starts, frequencies, durations, synth):
+        """Mélange des notes (début s, fréquence Hz, durée s) -> signal mono (get_dtype())
+
+        synth(freq, dur) renvoie l'onde d'une note. Une fréquence nulle est un silence.
+        Rendu hors ligne : les blocs de blocks() sont recopiés dans un seul tampon.
+        """
+        sr = self.sample_rate
+        starts = np.asarray(starts, dtype=np.float64)
+        durations = np.asarray(durations, dtype=np.float64)
+        ends = np.rint(starts * sr).astype(np.int64) + (durations * sr).astype(np.int64)
+        out = np.zeros(int(ends.max()) if len(ends) else 0, dtype=get_dtype())
+        order = np.argsort(starts, kind="stable")
+        events = zip(starts[order].tolist(), np.asarray(frequencies, dtype=np.float64)[order].tolist(),
+                     durations[order].tolist())
+        for first, block in self.blocks(events, synth):
+            out[first:first + len(block)] = block
+        return out
+
+    def blocks(self, events, synth, block=BLOCK):
+        """Mélange au fil de l'eau : (première trame, bloc mono de `block` trames au plus)
+
+        events : (début s, fréquence Hz, durée s) triés par début, lus au fur et à
+        mesure (sans fin possible). synth(freq, dur) n'est rappelée que pour un couple
+        absent des WAVES dernières ondes. Les passages où rien ne sonne sont sautés ;
+        self.stats est rempli une fois tous les blocs rendus.
+        """
+        sr = self.sample_rate
+        dtype = get_dtype()
+        gain = dtype.type(10 ** (self.headroom_db / 20))
+        fade = max(1, int(STEAL_FADE * sr))
+        ramp = np.linspace(1.0, 0.0, fade, dtype=dtype)
+        waves = OrderedDict()
+        active = []    # voix non volées, dans l'ordre d'arrivée : active[0] est la plus ancienne
+        sounding = []  # voix à rendre : [début, onde, fin, début du fondu] (trames absolues)
+        stolen = peak = voices = clipped = 0
+
+        notes = self._notes(events)
+        upcoming = next(notes, None)
+        first = 0
+        while upcoming is not None or sounding:
+            if not sounding:
+                first = max(first, upcoming[0] // block * block)
+            last = first + block
+            # on admet les notes qui commencent avant la fin du bloc plus un fondu : une voix
+            # volée plus tard ne touche donc jamais un bloc déjà rendu
+            while upcoming is not None and upcoming[0] < last + fade:
+                start, freq, dur, n = upcoming
+                active = [v for v in active if v[2] > start]
+                if len(active) >= self.max_voices:
+                    voice = active.pop(0)
+                    voice[3] = max(voice[0], start - fade)
+                    voice[2] = start
+                    stolen += 1
+                wave = waves.get((freq, dur))
+                if wave is None:
+                    wave = np.asarray(synth(freq, dur), dtype=dtype)[:n]
+                    waves[(freq, dur)] = wave
+                    if len(waves) > WAVES:
+                        waves.popitem(last=False)
+                else:
+                    waves.move_to_end((freq, dur))
+                voice = [start, wave, start + len(wave), start + len(wave)]
+                active.append(voice)
+                sounding.append(voice)
+                voices += 1
+                peak = max(peak, len(active))
+                upcoming = next(notes, None)
+
+            if upcoming is None:
+                last = min(last, max(v[2] for v in sounding))
+            out = np.zeros(last - first, dtype=dtype)
+            for voice in sounding:
+                self._render(out, first, voice, ramp)
+            sounding = [v for v in sounding if v[2] > last]
+
+            out *= gain
+            if self.soft_clip:
+                over = int(np.count_nonzero(np.abs(out) > KNEE))
+                if over:
+                    clipped += over
+                    soft_clip(out)
+            yield first, out
+            first = last
+
+        self.stats = {"voices": voices, "stolen": stolen, "peak_voices": peak,
+                      "soft_clipped_samples": clipped}
+
+    def _notes(self, events):
+        """(trame de début, fréquence, durée, trames) des notes jouées, silences retirés"""
+        sr = self.sample_rate
+        previous = 0
+        for start, freq, dur in events:
+            start = int(round(start * sr))
+            n = int(dur * sr)
+            if start < previous:
+                raise ValueError("Notes non triées par début : le mixeur les prend dans l'ordre d'arrivée")
+            previous = start
+            if freq == 0 or n <= 0:
+                continue
+            yield start, freq, dur, n
+
+    @staticmethod
+    def _render(out, first, voice, ramp):
+        """Ajoute à `out` (trames first..) la part d'une voix, fondu de sortie compris si volée"""
+        start, wave, end, fade_at = voice
+        last = first + len(out)
+        a, b = max(first, start), min(last, fade_at)
+        if a < b:
+            out[a - first:b - first] += wave[a - start:b - start]
+        a, b = max(first, fade_at), min(last, end)
+        if a < b:
+            out[a - first:b - first] += wave[a - start:b - start] * ramp[a - fade_at:b - fade_at]
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Format binaire compilé pour les partitions texte (pirate.txt, mario.txt, ...).
+
+Le fichier texte "NOTE DUREE" reste la référence : il est compilé une fois
+en un fichier .npart à côté de lui, recompilé automatiquement s'il est plus
+ancien que le texte, puis chargé par memory-map sans aucune copie.
+
+Syntaxe du texte, une ligne par évènement :
+    C4 0.5              une note puis on avance de 0.5 s (format historique)
+    C4 E4 G4 0.5        accord : les notes partent ensemble (aussi "C4+E4+G4 0.5")
+    @2.0 A3 1.5         note placée à 2.0 s du début, sans faire avancer le curseur
+    0 0.25              silence
+
+Structure d'un .npart (little-endian) :
+    en-tête   MAGIC, version, ticks par seconde, nb de hauteurs, nb d'évènements, drapeaux
+    hauteurs  nb_hauteurs x (nom S4, fréquence float32) ; l'indice 0 est le silence
+    évènements nb_evenements x (début uint64, hauteur uint16, durée uint64), en ticks
+
+Les fichiers MIDI (.mid) sont lus par midi.py et donnent la même partition
+en mémoire : load_score() accepte les trois formats.
+
+Exemple :
+    python partition_binaire.py pirate.txt mario.txt
+"""
+import os
+import struct
+import sys
+
+import numpy as np
+
+from hauteur import parse_notes, midi_to_name, midi_to_frequency, INVALID
+
+
+MAGIC = b"NPART\x00"
+VERSION = 4  # v2 : fréquences exactes (hauteur.py) ; v3 : instant de début (polyphonie) ;
+             # v4 : durées sur 64 bits (plus de 71 minutes en µs)
+TICKS_PER_SECOND = 1_000_000  # durées stockées en microsecondes (exactes pour "0.083")
+SUFFIX = ".npart"
+
+HEADER = struct.Struct("<6sHIIII")  # magic, version, ticks/s, nb hauteurs, nb évènements, drapeaux
+PITCH_DTYPE = np.dtype([("name", "S4"), ("frequency", "<f4")])
+EVENT_DTYPE = np.dtype([("start", "<u8"), ("pitch", "<u2"), ("ticks", "<u8")])
+
+REST = 0
+FLAG_POLYPHONIC = 1  # accords ou débuts explicites : les notes peuvent se chevaucher
+
+
+class CompiledScore:
+    """Partition chargée : tableaux NumPy structurés, mappés depuis le fichier"""
+
+    def __init__(self, pitches, events, ticks_per_second, flags=0):
+        self.pitches = pitches
+        self.events = events
+        self.ticks_per_second = ticks_per_second
+        self.flags = flags
+
+    @property
+    def polyphonic(self):
+        """False : une note après l'autre, durations suffit pour jouer la partition"""
+        return bool(self.flags & FLAG_POLYPHONIC)
+
+    def __len__(self):
+        return len(self.events)
+
+    @property
+    def durations(self):
+        """Durées en secondes (float64)"""
+        return self.events["ticks"] / self.ticks_per_second
+
+    @property
+    def starts(self):
+        """Instant de début de chaque évènement en secondes (float64)"""
+        return self.events["start"] / self.ticks_per_second
+
+    @property
+    def length(self):
+        """Durée totale de la partition en secondes"""
+        if not len(self.events):
+            return 0.0
+        return float((self.events["start"] + self.events["ticks"]).max()) / self.ticks_per_second
+
+    def frequencies(self):
+        """Fréquence de chaque évènement (0 pour un silence)"""
+        return self.pitches["frequency"][self.events["pitch"]]
+
+    def names(self):
+        return self.pitches["name"][self.events["pitch"]]
+
+
+def compiled_path(text_file):
+    return os.path.splitext(text_file)[0] + SUFFIX
+
+
+def parse_text(filename):
+    """Lit une partition texte -> (table des hauteurs, évènements, drapeaux)
+
+    Les noms de notes sont convertis d'un bloc par hauteur.parse_notes ; la
+    table ne contient que les hauteurs présentes, triées par numéro MIDI.
+    """
+    names, note_line = [], []
+    durations, at = [], []
+    with open(filename, "r") as f:
+        for line in f:
+            parts = line.split()
+            start = None
+            if parts and parts[0].startswith("@"):
+                start = float(parts[0][1:])
+                parts = parts[1:]
+            if len(parts) < 2:
+                continue
+            notes = [n for part in parts[:-1] for n in part.split("+") if n]
+            names.extend(notes)
+            note_line.extend([len(durations)] * len(notes))
+            durations.append(parts[-1])
+            at.append(-1.0 if start is None else start)
+
+    midi, _ = parse_notes(names, strict=False)
+    midi = np.asarray(midi, dtype=np.int16).reshape(-1)
+    note_line = np.asarray(note_line, dtype=np.int64)
+    line_ticks = np.rint(np.asarray(durations, dtype=np.float64) * TICKS_PER_SECOND).astype(np.int64)
+    at = np.asarray(at, dtype=np.float64)
+    if (midi == INVALID).any():
+        for note in sorted(set(np.asarray(names)[midi == INVALID])):
+            print(f"⚠️ Note inconnue ignorée : {note}")
+        keep = midi != INVALID
+        midi = midi[keep]
+        note_line = note_line[keep]
+
+    # une ligne dont toutes les notes sont inconnues disparaît, durée comprise
+    lines, note_line = np.unique(note_line, return_inverse=True)
+    line_ticks, at = line_ticks[lines], at[lines]
+    # curseur : les lignes sans "@" avancent de leur durée, les autres sont placées à part
+    advance = np.where(at < 0, line_ticks, 0)
+    cursor = np.concatenate(([0], np.cumsum(advance)[:-1])) if len(advance) else advance
+    line_start = np.where(at < 0, cursor, np.rint(at * TICKS_PER_SECOND).astype(np.int64))
+    polyphonic = len(midi) > len(lines) or (at >= 0).any()
+
+    used = np.unique(midi[midi >= 0])
+    table = np.zeros(len(used) + 1, dtype=PITCH_DTYPE)
+    table["name"][0] = b"0"
+    table["name"][1:] = [midi_to_name(m).encode() for m in used]
+    table["frequency"][1:] = midi_to_frequency(used)
+
+    events = np.zeros(len(midi), dtype=EVENT_DTYPE)
+    # indice 0 = silence, sinon position (à partir de 1) dans la table
+    events["pitch"] = np.where(midi >= 0, np.searchsorted(used, midi) + 1, REST)
+    events["ticks"] = line_ticks[note_line]
+    events["start"] = line_start[note_line]
+    if polyphonic:
+        # ordre des débuts : le mixeur traite les voix dans l'ordre d'arrivée
+        events = events[np.argsort(events["start"], kind="stable")]
+    return table, events, FLAG_POLYPHONIC if polyphonic else 0
+
+
+def write_compiled(binary_file, table, events, flags=0):
+    # écriture dans un fichier temporaire puis renommage : jamais de .npart à moitié écrit
+    tmp = binary_file + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, TICKS_PER_SECOND, len(table), len(events), flags))
+        f.write(table.tobytes())
+        f.write(events.tobytes())
+    os.replace(tmp, binary_file)
+
+
+def compile_score(text_file, binary_file=None):
+    """Compile une partition texte en .npart, renvoie le chemin produit"""
+    if binary_file is None:
+        binary_file = compiled_path(text_file)
+    write_compiled(binary_file, *parse_text(text_file))
+    return binary_file
+
+
+def load_compiled(binary_file):
+    """Charge un .npart par memory-map (aucune copie des évènements)"""
+    with open(binary_file, "rb") as f:
+        header = f.read(HEADER.size)
+    magic, version, ticks_per_second, n_pitches, n_events, flags = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{binary_file} n'est pas une partition compilée valide")
+
+    offset = HEADER.size
+    pitches = np.memmap(binary_file, dtype=PITCH_DTYPE, mode="r", offset=offset, shape=(n_pitches,))
+    offset += n_pitches * PITCH_DTYPE.itemsize
+    if n_events:
+        events = np.memmap(binary_file, dtype=EVENT_DTYPE, mode="r", offset=offset, shape=(n_events,))
+    else:
+        events = np.zeros(0, dtype=EVENT_DTYPE)  # mmap refuse une longueur nulle
+    return CompiledScore(pitches, events, ticks_per_second, flags)
+
+
+def is_up_to_date(text_file, binary_file):
+    return (os.path.exists(binary_file)
+            and os.path.getmtime(binary_file) >= os.path.getmtime(text_file))
+
+
+def load_score(filename, cache=True):
+    """Charge une partition texte, .npart ou MIDI, en (re)compilant le texte si besoin
+
+    cache=False : un texte sans .npart à jour est lu en mémoire, aucun .npart n'est écrit
+    (ValueError si ce n'est pas une partition, sans rien laisser sur le disque).
+    """
+    if filename.lower().endswith((".mid", ".midi")):
+        from midi import load_midi
+        return load_midi(filename).to_score()
+    if filename.endswith(SUFFIX):
+        return load_compiled(filename)
+    binary_file = compiled_path(filename)
+    if is_up_to_date(filename, binary_file):
+        try:
+            return load_compiled(binary_file)
+        except ValueError:
+            pass  # ancienne version du format : on recompile
+    table, events, flags = parse_text(filename)
+    if not cache:
+        return CompiledScore(table, events, TICKS_PER_SECOND, flags)
+    try:
+        write_compiled(binary_file, table, events, flags)
+    except OSError:
+        # dossier en lecture seule : on se contente de la version en mémoire
+        return CompiledScore(table, events, TICKS_PER_SECOND, flags)
+    return load_compiled(binary_file)
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:]:
+        out = compile_score(name)
+        print(f"💾 {name} -> {out} ({len(load_compiled(out))} évènements)")
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Lecture anticipée d'une partition : la note suivante est prête avant la fin
+de celle qui joue. Une partition avec accords passe par le même chemin, ses
+voix mélangées par blocs (mixage.VoiceMixer.blocks) au lieu d'une voix par
+note.
+
+Trois étages :
+
+- lecture : les évènements du .npart (mappé en mémoire) sont lus par
+  tranches de READ_CHUNK, jamais toute la partition d'un coup ;
+- synthèse : un thread prépare les ondes (cache partagé compris) et les
+  dépose dans une file bornée de `depth` tampons ;
+- lecture audio : le thread appelant ne fait que retirer un tampon et le
+  programmer dans le flux continu à sa trame exacte, au plus `lead` s avant
+  qu'il ne sonne.
+
+Le temps de synthèse ne s'ajoute donc plus entre deux notes, et la mémoire
+reste bornée (file + voix programmées + cache LRU) quelle que soit la
+longueur de la partition. Les silences deviennent des voix nulles sans
+mémoire (np.broadcast_to) : le flux ne s'arrête jamais en cours de morceau.
+
+stats() : profondeur de la file (min / moyenne / max au moment de chaque
+retrait), attentes de l'étage audio faute de tampon prêt (stalls) et notes
+programmées en retard.
+"""
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+DEPTH = 32          # tampons préparés d'avance
+LEAD = 0.3          # s : une note est programmée LEAD s avant de sonner (> avance du flux, ~0.23 s)
+READ_CHUNK = 4096   # évènements lus à la fois dans la partition
+
+_END = object()
+
+
+def read_events(score, chunk=READ_CHUNK):
+    """(début s, fréquence Hz, durée s) de chaque évènement, lus par tranches"""
+    tps = score.ticks_per_second
+    frequencies = score.pitches["frequency"]
+    for first in range(0, len(score), chunk):
+        events = score.events[first:first + chunk]
+        starts = (events["start"] / tps).tolist()
+        durations = (events["ticks"] / tps).tolist()
+        freqs = frequencies[events["pitch"]].tolist()
+        yield from zip(starts, freqs, durations)
+
+
+def silence(n):
+    """Voix nulle de n trames, sans mémoire (toutes les trames pointent sur le même zéro)"""
+    return np.broadcast_to(np.zeros((1, 1), dtype=np.int16), (n, 1))
+
+
+class PlaybackPipeline:
+    def __init__(self, stream, synth, gain=1.0, depth=DEPTH, lead=LEAD, mixer=None):
+        """synth(freq, durée) -> onde mono float ou tableau int16 (N, 2) (ex. cache partagé)
+
+        mixer : mixage.VoiceMixer pour les partitions avec accords ; les voix sont alors
+        mélangées par blocs dans le thread de synthèse (synth doit rendre l'onde mono float).
+        """
+        self.stream = stream
+        self.synth = synth
+        self.mixer = mixer
+        self.gain = gain
+        self.depth = depth
+        self.lead = lead
+        self._queue = None
+        self._stop = threading.Event()
+        self._worker = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.notes = 0
+        self.stalls = 0
+        self.stall_time = 0.0
+        self.late_notes = 0
+        self.synth_time = 0.0
+        self._takes = 0
+        self._depth_min = None
+        self._depth_max = 0
+        self._depth_sum = 0
+
+    # ------------------------------------------------------ étage synthèse
+    def _synthesize(self, events):
+        """(trame de début, tampon) de chaque note, une voix par note"""
+        sr = self.stream.sample_rate
+        for start, freq, dur in events:
+            n = int(sr * dur)
+            if n <= 0:
+                continue
+            samples = silence(n) if freq == 0 else self.synth(freq, dur)
+            yield int(round(start * sr)), samples
+
+    def _produce(self, buffers):
+        try:
+            while not self._stop.is_set():
+                t = time.perf_counter()
+                item = next(buffers, None)
+                self.synth_time += time.perf_counter() - t
+                if item is None:
+                    self._put(_END)
+                    return
+                self._put(item)
+        except Exception as exc:  # remonté tel quel dans le thread qui joue
+            self._put(exc)
+
+    def _put(self, item):
+        # put avec délai : un stop() ne laisse jamais le thread bloqué sur une file pleine
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    # ----------------------------------------------------- étage lecture audio
+    def _take(self):
+        depth = self._queue.qsize()
+        self._takes += 1
+        self._depth_min = depth if self._depth_min is None else min(self._depth_min, depth)
+        self._depth_max = max(self._depth_max, depth)
+        self._depth_sum += depth
+        if depth:
+            return self._queue.get()
+        t = time.perf_counter()
+        item = self._queue.get()
+        if item is not _END:
+            # la synthèse n'a pas suivi : l'étage audio a attendu ce tampon
+            self.stalls += 1
+            self.stall_time += time.perf_counter() - t
+        return item
+
+    def play(self, score):
+        """Joue une partition chargée (partition_binaire.load_score) ; bloque jusqu'à la fin
+
+        score peut aussi être un itérable de (début s, fréquence Hz, durée s), même sans
+        fin (ex. aleatoire.RandomSequence.events()) : il est lu au fil de la lecture.
+        Avec un mixeur, chaque tampon programmé est un bloc mélangé (accords compris).
+        """
+        events = read_events(score) if hasattr(score, "events") else iter(score)
+        if self.mixer is not None:
+            buffers = self.mixer.blocks(events, self.synth)
+        else:
+            buffers = self._synthesize(events)
+        self._reset_stats()
+        self._stop.clear()
+        self._queue = queue.Queue(self.depth)
+        self._worker = threading.Thread(target=self._produce, args=(buffers,),
+                                        name="prelecture", daemon=True)
+        self._worker.start()
+
+        stream = self.stream
+        lead = int(self.lead * stream.sample_rate)
+        # amorçage : on laisse la file se remplir avant la première note
+        while self._queue.qsize() < self.depth and self._worker.is_alive():
+            time.sleep(0.001)
+
+        base = None
+        last = None
+        try:
+            while True:
+                item = self._take()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                offset, samples = item
+                if base is None:
+                    # la première note part dans `lead` s : le flux, qui mélange toujours un peu
+                    # d'avance, ne dépasse jamais une note pas encore programmée
+                    base = stream.queue_end() + lead - offset
+                frame = base + offset
+                stream.wait_for(frame - lead)
+                late = stream.mixed_until() - frame
+                if late > 0:
+                    # trop tard pour cette trame : tout le reste glisse d'autant, le rythme est gardé
+                    self.late_notes += 1
+                    base += late
+                    frame += late
+                last = stream.schedule(samples, frame, self.gain)
+                self.notes += 1
+            if last is not None:
+                last.wait()
+        finally:
+            self.stop()
+        return self.stats()
+
+    def stop(self):
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def stats(self):
+        return {
+            "notes": self.notes,
+            "depth": self.depth,
+            "queue_depth_min": self._depth_min or 0,
+            "queue_depth_mean": self._depth_sum / self._takes if self._takes else 0.0,
+            "queue_depth_max": self._depth_max,
+            "stalls": self.stalls,
+            "stall_time": self.stall_time,
+            "late_notes": self.late_notes,
+            "synth_time": self.synth_time,
+        }
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rendu hors ligne d'une partition (fichier "NOTE DUREE", accords compris) vers un fichier WAV.
+
+Contrairement à MusicPlayer.play_from_file, rien n'est joué : toute la
+partition est synthétisée dans un seul tableau NumPy alloué d'avance, sans
+carte son et sans attente, donc aussi vite que le processeur le permet.
+
+Exemple :
+    python rendu.py pirate.txt pirate.wav --instrument flute
+"""
+import argparse
+import wave
+
+import numpy as np
+
+from Instrument import Instrument, Flute, Guitare, Piano, Batterie
+from mixage import VoiceMixer, MAX_VOICES
+from partition_binaire import load_score
+from synthese import get_dtype
+from tampons import CHUNK, fill_int16_stereo, shared_pool
+
+
+SAMPLE_RATE = 44100
+VOLUME = 0.8
+
+# Nom -> fabrique d'instrument (sans lecteur : pas de carte son)
+INSTRUMENTS = {
+    "sinus": lambda sr: Instrument(None, "Sinus", sr),
+    "flute": lambda sr: Flute(None, sr),
+    "guitare": lambda sr: Guitare(None, sr),
+    "piano": lambda sr: Piano(None, sr),
+    "batterie": lambda sr: Batterie(None, sr),
+}
+
+
+def rendre_evenements(frequencies, durations, instrument):
+    """Synthétise des tableaux (fréquences, durées) dans un seul buffer (dtype de synthèse)
+
+    Une fréquence nulle est un silence.
+    """
+    sr = instrument.sample_rate
+    lengths = [int(sr * dur) for dur in durations]
+    buffer = np.zeros(sum(lengths), dtype=get_dtype())  # les silences restent à zéro
+
+    pos = 0
+    for freq, dur, n in zip(frequencies, durations, lengths):
+        if freq != 0 and n > 0:
+            buffer[pos:pos + n] = instrument.synthetiser(freq, dur)[:n]
+        pos += n
+    return buffer
+
+
+def rendre_partition(score, instrument, max_voices=MAX_VOICES):
+    """Rend toute une partition (fichier texte, .npart, .mid ou partition déjà chargée),
+    renvoie le signal mono (dtype de synthèse)
+
+    Une partition avec accords passe par le mixeur polyphonique ; une partition
+    monophonique garde le rendu note après note, identique à avant.
+    """
+    if isinstance(score, str):
+        score = load_score(score)
+    if score.polyphonic:
+        mixer = VoiceMixer(instrument.sample_rate, max_voices)
+        return mixer.mix(score.starts, score.frequencies(), score.durations, instrument.synthetiser)
+    return rendre_evenements(score.frequencies().tolist(), score.durations.tolist(), instrument)
+
+
+def ecrire_wav(filename, tone, sample_rate=SAMPLE_RATE, volume=VOLUME):
+    """Écrit un signal mono float (-1..1) en WAV 16 bits stéréo"""
+    with wave.open(filename, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        # par morceaux, dans un tampon de la réserve : pas de copie stéréo pleine longueur
+        with shared_pool.borrow(min(len(tone), CHUNK)) as pcm:
+            for start in range(0, len(tone), CHUNK):
+                part = tone[start:start + CHUNK]
+                w.writeframes(fill_int16_stereo(part, pcm[:len(part)], volume))
+
+
+def rendre_fichier(score, wav_file, instrument="sinus", sample_rate=SAMPLE_RATE, volume=VOLUME,
+                   max_voices=MAX_VOICES):
+    """Partition (fichier ou déjà chargée) -> WAV, renvoie la durée audio produite en secondes"""
+    inst = INSTRUMENTS[instrument](sample_rate)
+    tone = rendre_partition(score, inst, max_voices)
+    ecrire_wav(wav_file, tone, sample_rate, volume)
+    return len(tone) / sample_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendu hors ligne d'une partition en WAV")
+    parser.add_argument("partition", help="fichier texte NOTE DUREE (ex : pirate.txt), .npart ou .mid")
+    parser.add_argument("sortie", help="fichier WAV à écrire")
+    parser.add_argument("--instrument", default="sinus", choices=sorted(INSTRUMENTS))
+    parser.add_argument("--sample-rate", type=int, default=SAMPLE_RATE)
+    parser.add_argument("--volume", type=float, default=VOLUME)
+    parser.add_argument("--voices", type=int, default=MAX_VOICES,
+                        help="polyphonie maximale pour les accords (défaut %(default)s)")
+    args = parser.parse_args()
+
+    duree = rendre_fichier(args.partition, args.sortie, args.instrument,
+                           args.sample_rate, args.volume, args.voices)
+    print(f"💾 {args.sortie} : {duree:.2f} s d'audio rendues")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rendu en lot d'un dossier (ou d'un motif glob) de partitions vers des WAV.
+
+- un processus par cœur disponible (ProcessPoolExecutor) ;
+- une partition dont le WAV est déjà à jour est sautée : l'empreinte SHA-256
+  du texte et des réglages de rendu est notée dans rendus.json, dans le
+  dossier de sortie ;
+- les WAV reprennent le chemin des partitions sous leur dossier commun
+  (a/x.txt -> a/x.wav, x.mid -> x.mid.wav) : deux partitions n'écrivent
+  jamais dans le même fichier ;
+- un fichier qui n'est pas une partition (guitar_hero_scores.txt...) est
+  ignoré avec un avertissement ; une partition dont le rendu échoue est
+  signalée sans arrêter les autres ;
+- bilan final : fichiers/s et secondes d'audio produites par seconde.
+
+Aucune carte son ni écran n'est utilisé (pilotes SDL "dummy").
+
+Exemples :
+    python rendu_lot.py . -o wav --instrument piano
+    python rendu_lot.py "touches_*.txt" -o wav --instrument guitare
+"""
+import os
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import glob
+import hashlib
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from rendu import INSTRUMENTS, SAMPLE_RATE, VOLUME, rendre_fichier
+from mixage import MAX_VOICES
+
+
+MANIFEST = "rendus.json"
+PATTERN = "*.txt"
+
+
+class NotAScore(ValueError):
+    """Fichier illisible comme partition : ignoré, sans compter comme un échec"""
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS, Windows
+        return os.cpu_count() or 1
+
+
+def find_scores(sources, pattern=PATTERN):
+    """Dossiers, motifs glob ou fichiers -> liste triée de partitions, sans doublon"""
+    found = set()
+    for source in sources:
+        if os.path.isdir(source):
+            found.update(glob.glob(os.path.join(source, pattern)))
+        elif os.path.isfile(source):
+            found.add(source)
+        else:
+            found.update(p for p in glob.glob(source) if os.path.isfile(p))
+    return sorted(found)
+
+
+def content_hash(score, settings):
+    """Empreinte du texte de la partition et des réglages qui changent le WAV"""
+    h = hashlib.sha256()
+    with open(score, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def output_names(scores):
+    """Nom de WAV (relatif au dossier de sortie, aussi clé du manifeste) de chaque partition
+
+    Le chemin est pris relativement au dossier commun des partitions, sous-dossiers
+    compris : a/x.txt et b/x.txt donnent a/x.wav et b/x.wav. Seul .txt disparaît du
+    nom ; une autre extension est gardée (x.txt -> x.wav, x.mid -> x.mid.wav).
+    """
+    if not scores:
+        return {}
+    paths = [os.path.abspath(s) for s in scores]
+    root = os.path.commonpath([os.path.dirname(p) for p in paths])
+    names = {}
+    for score, path in zip(scores, paths):
+        rel = os.path.relpath(path, root)
+        stem, ext = os.path.splitext(rel)
+        names[score] = (stem if ext == ".txt" else rel).replace(os.sep, "/") + ".wav"
+    return names
+
+
+def output_path(name, out_dir):
+    return os.path.join(out_dir, *name.split("/"))
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _render_one(score, wav_file, settings):
+    """Tâche d'un processus du pool : (secondes d'audio, temps de rendu)"""
+    from partition_binaire import load_score
+    t = time.perf_counter()
+    try:
+        # lue une seule fois, en mémoire : pas de .npart laissé à côté d'un fichier qui
+        # n'est pas une partition, et une erreur de rendu reste un échec
+        loaded = load_score(score, cache=False)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise NotAScore(str(e)) from None
+    seconds = rendre_fichier(loaded, wav_file, settings["instrument"], settings["sample_rate"],
+                             settings["volume"], settings["voices"])
+    return seconds, time.perf_counter() - t
+
+
+def render_batch(scores, out_dir, instrument="sinus", sample_rate=SAMPLE_RATE, volume=VOLUME,
+                 voices=MAX_VOICES, jobs=None, force=False):
+    """Rend les partitions en parallèle, renvoie le bilan (dict)"""
+    os.makedirs(out_dir, exist_ok=True)
+    settings = {"instrument": instrument, "sample_rate": sample_rate,
+                "volume": volume, "voices": voices}
+    manifest = load_manifest(out_dir)
+    todo, skipped = [], 0
+    for score, name in output_names(scores).items():
+        wav_file = output_path(name, out_dir)
+        digest = content_hash(score, settings)
+        if not force and os.path.exists(wav_file) and manifest.get(name) == digest:
+            skipped += 1
+        else:
+            os.makedirs(os.path.dirname(wav_file), exist_ok=True)
+            todo.append((score, name, wav_file, digest))
+
+    report = {"rendered": 0, "skipped": skipped, "ignored": 0, "failed": 0, "audio_seconds": 0.0}
+    jobs = jobs or available_cores()
+    start = time.perf_counter()
+    if todo:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(todo))) as pool:
+            futures = {pool.submit(_render_one, score, wav_file, settings): (score, name, wav_file, digest)
+                       for score, name, wav_file, digest in todo}
+            for future in as_completed(futures):
+                score, name, wav_file, digest = futures[future]
+                try:
+                    seconds, elapsed = future.result()
+                except NotAScore as e:
+                    report["ignored"] += 1
+                    print(f"⚠️ {score} ignoré, ce n'est pas une partition : {e}", file=sys.stderr)
+                    continue
+                except Exception as e:
+                    report["failed"] += 1
+                    print(f"❌ {score} : {e}", file=sys.stderr)
+                    continue
+                manifest[name] = digest
+                report["rendered"] += 1
+                report["audio_seconds"] += seconds
+                print(f"💾 {score} -> {wav_file} ({seconds:.1f} s d'audio en {elapsed:.2f} s)")
+        save_manifest(out_dir, manifest)
+    wall = time.perf_counter() - start
+    report["wall_seconds"] = wall
+    report["jobs"] = jobs
+    report["files_per_second"] = report["rendered"] / wall if wall > 0 else 0.0
+    report["audio_seconds_per_second"] = report["audio_seconds"] / wall if wall > 0 else 0.0
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendu en lot de partitions en WAV (sans carte son)")
+    parser.add_argument("sources", nargs="+", help="dossier(s), motif(s) glob ou fichier(s)")
+    parser.add_argument("-o", "--output", required=True, help="dossier des WAV produits")
+    parser.add_argument("--instrument", default="sinus", choices=sorted(INSTRUMENTS))
+    parser.add_argument("--pattern", default=PATTERN, help="fichiers pris dans un dossier (défaut %(default)s)")
+    parser.add_argument("--sample-rate", type=int, default=SAMPLE_RATE)
+    parser.add_argument("--volume", type=float, default=VOLUME)
+    parser.add_argument("--voices", type=int, default=MAX_VOICES)
+    parser.add_argument("--jobs", type=int, help="nb de processus (défaut : nb de cœurs disponibles)")
+    parser.add_argument("--force", action="store_true", help="refait aussi les WAV déjà à jour")
+    args = parser.parse_args()
+
+    scores = find_scores(args.sources, args.pattern)
+    if not scores:
+        print("Aucune partition trouvée.", file=sys.stderr)
+        sys.exit(1)
+    report = render_batch(scores, args.output, args.instrument, args.sample_rate, args.volume,
+                          args.voices, args.jobs, args.force)
+    print(f"✅ {report['rendered']} rendus, {report['skipped']} à jour, {report['ignored']} ignorés, "
+          f"{report['failed']} en échec "
+          f"en {report['wall_seconds']:.2f} s avec {report['jobs']} processus : "
+          f"{report['files_per_second']:.2f} fichiers/s, "
+          f"{report['audio_seconds_per_second']:.0f} s d'audio/s")
+    sys.exit(1 if report["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
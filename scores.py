@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Stockage des scores Guitar Hero dans une base SQLite embarquée.
+
+- une ligne par partie (historique complet), plus le meilleur score de chaque
+  joueur, tenu à jour dans la même transaction ;
+- clé joueur exacte (nom sans espaces autour, casse respectée) : "Mathis",
+  "MATHIS" et "Math" sont trois joueurs distincts ;
+- index pour le classement (top N) et pour l'historique d'un joueur ;
+- mode WAL + délai d'attente : plusieurs bornes peuvent écrire en même temps.
+
+L'ancien fichier texte guitar_hero_scores.txt est importé une seule fois.
+"""
+import os
+import re
+import sqlite3
+import time
+
+
+DB_FILE = "guitar_hero_scores.db"
+LEGACY_FILE = "guitar_hero_scores.txt"
+
+_LEGACY_LINE = re.compile(r"^(.*): (\d+) corrects, (\d+) erreurs$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rounds (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    correct INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    played_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rounds_by_player ON rounds (player, played_at);
+
+CREATE TABLE IF NOT EXISTS best (
+    player TEXT PRIMARY KEY,
+    correct INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    rounds INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS best_ranking ON best (correct DESC, errors ASC);
+
+CREATE TABLE IF NOT EXISTS hits (
+    round_id INTEGER NOT NULL REFERENCES rounds (id),
+    idx INTEGER NOT NULL,
+    expected TEXT NOT NULL,
+    pressed TEXT,
+    reaction REAL,
+    judgement TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hits_by_round ON hits (round_id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def player_key(name):
+    return name.strip()
+
+
+class ScoreStore:
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _insert_round(self, player, correct, errors, played_at):
+        round_id = self.conn.execute(
+            "INSERT INTO rounds (player, correct, errors, played_at) VALUES (?, ?, ?, ?)",
+            (player, correct, errors, played_at)).lastrowid
+        # meilleur score : plus de corrects, puis moins d'erreurs à égalité
+        self.conn.execute(
+            """INSERT INTO best (player, correct, errors, rounds, updated_at) VALUES (?, ?, ?, 1, ?)
+               ON CONFLICT (player) DO UPDATE SET
+                   rounds = rounds + 1,
+                   updated_at = excluded.updated_at,
+                   errors = CASE WHEN excluded.correct > correct
+                                   OR (excluded.correct = correct AND excluded.errors < errors)
+                                 THEN excluded.errors ELSE errors END,
+                   correct = MAX(correct, excluded.correct)""",
+            (player, correct, errors, played_at))
+        return round_id
+
+    def record_round(self, name, correct, errors, played_at=None, hits=()):
+        """Enregistre une partie (transaction atomique), renvoie son identifiant
+
+        hits : détail de chaque note, [(attendue, pressée ou None, réaction en s ou None,
+        "perfect" / "good" / "miss"), ...], pour régler la difficulté.
+        """
+        if played_at is None:
+            played_at = time.time()
+        with self.conn:
+            round_id = self._insert_round(player_key(name), correct, errors, played_at)
+            self.conn.executemany(
+                "INSERT INTO hits (round_id, idx, expected, pressed, reaction, judgement) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(round_id, i) + tuple(hit) for i, hit in enumerate(hits)])
+        return round_id
+
+    def reaction_times(self, name=None, judgement=None):
+        """Temps de réaction (s) enregistrés, pour un joueur et/ou un verdict donnés"""
+        query = ("SELECT hits.reaction FROM hits JOIN rounds ON rounds.id = hits.round_id "
+                 "WHERE hits.reaction IS NOT NULL")
+        params = []
+        if name is not None:
+            query += " AND rounds.player = ?"
+            params.append(player_key(name))
+        if judgement is not None:
+            query += " AND hits.judgement = ?"
+            params.append(judgement)
+        return [r for (r,) in self.conn.execute(query, params)]
+
+    def best(self, name):
+        """(corrects, erreurs, nb de parties) du joueur, ou None"""
+        return self.conn.execute(
+            "SELECT correct, errors, rounds FROM best WHERE player = ?", (player_key(name),)).fetchone()
+
+    def leaderboard(self, n=10):
+        """Top N : [(joueur, corrects, erreurs), ...]"""
+        return self.conn.execute(
+            "SELECT player, correct, errors FROM best ORDER BY correct DESC, errors ASC LIMIT ?",
+            (n,)).fetchall()
+
+    def history(self, name, limit=20):
+        """Dernières parties du joueur : [(date, corrects, erreurs), ...], la plus récente d'abord"""
+        return self.conn.execute(
+            "SELECT played_at, correct, errors FROM rounds WHERE player = ? "
+            "ORDER BY played_at DESC LIMIT ?", (player_key(name), limit)).fetchall()
+
+    def import_legacy(self, filename=LEGACY_FILE):
+        """Importe une fois l'ancien fichier texte "nom: X corrects, Y erreurs"
+
+        Renvoie le nombre de lignes importées (0 si déjà fait ou fichier absent).
+        """
+        if not os.path.exists(filename):
+            return 0
+        key = "imported:" + os.path.abspath(filename)
+        with self.conn:
+            # on réserve l'import d'abord : l'INSERT ouvre la transaction en écriture, une
+            # autre partie qui démarre en même temps attend puis trouve la clé déjà prise
+            claimed = self.conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES (?, '0')", (key,)).rowcount
+            if claimed != 1:
+                return 0
+            played_at = os.path.getmtime(filename)
+            count = 0
+            with open(filename, "r", encoding="utf-8") as f:
+                for line in f:
+                    m = _LEGACY_LINE.match(line.strip())
+                    if m:
+                        self._insert_round(player_key(m.group(1)), int(m.group(2)),
+                                           int(m.group(3)), played_at)
+                        count += 1
+            self.conn.execute("UPDATE meta SET value = ? WHERE key = ?", (str(count), key))
+        return count
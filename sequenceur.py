@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Séquenceur pas à pas pour la batterie.
+
+Un motif est une grille de pas par fût, une mesure à la fois :
+
+    {"kick":  "X...x...X...x...",
+     "snare": "....X.......X...",
+     "hihat": "x.x.x.x.x.x.x.x."}
+
+"X" = frappe accentuée, "x" = frappe normale, "." ou "-" = silence, "|" est
+ignoré (repère visuel). On peut aussi donner une liste de vélocités (0..1).
+
+Chaque mesure est rendue une seule fois : les ondes des fûts (calculées une
+fois par Batterie.drum_wave) sont additionnées dans un seul tampon à des
+décalages calculés d'un bloc (np.bincount), puis la mesure est rejouée telle
+quelle en boucle dans le flux audio. La résonance qui dépasse la fin de la
+mesure est gardée et se superpose au début de la suivante : la boucle n'a ni
+trou ni coupure. Modifier un motif ne refait que la mesure concernée.
+"""
+import threading
+
+import numpy as np
+
+from synthese import get_dtype
+
+
+STEPS_PER_BEAT = 4          # doubles croches
+ACCENT = 1.0
+NORMAL = 0.6
+HIT_CHARS = {"X": ACCENT, "x": NORMAL, "o": NORMAL}
+REST_CHARS = ".- "
+
+DEMO = [
+    {"kick": "X...x...X...x...", "snare": "....X.......X...", "hihat": "x.x.x.x.x.x.x.x."},
+    {"kick": "X...x...X.x.x...", "snare": "....X.......X.XX", "hihat": "x.x.x.x.x.x.x.x.",
+     "crash": "X..............."},
+]
+
+
+def parse_steps(steps):
+    """Grille d'un fût -> vélocités float32 (une par pas)"""
+    if isinstance(steps, str):
+        values = []
+        for c in steps.replace("|", ""):
+            if c in HIT_CHARS:
+                values.append(HIT_CHARS[c])
+            elif c in REST_CHARS:
+                values.append(0.0)
+            else:
+                raise ValueError(f"Pas inconnu : {c!r}")
+        return np.array(values, dtype=np.float32)
+    return np.clip(np.asarray(steps, dtype=np.float32), 0.0, 1.0)
+
+
+def parse_pattern(pattern, drums):
+    """Motif d'une mesure -> {fût: vélocités}, toutes les grilles de même longueur"""
+    grid = {}
+    for drum, steps in pattern.items():
+        if drum not in drums:
+            raise ValueError(f"Fût inconnu : {drum}")
+        grid[drum] = parse_steps(steps)
+    lengths = {len(v) for v in grid.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Grilles de longueurs différentes dans la mesure : {sorted(lengths)}")
+    if not lengths or 0 in lengths:
+        raise ValueError("Mesure vide")
+    return grid
+
+
+class DrumSequencer:
+    def __init__(self, batterie, bars, bpm=120, swing=0.0):
+        """bars : liste de motifs (un par mesure), joués dans l'ordre puis en boucle
+
+        swing : retard des pas pairs (contretemps), en fraction de pas (0 = droit,
+        ~0.33 = ternaire).
+        """
+        from Instrument import DRUMS
+        self.batterie = batterie
+        self.sample_rate = batterie.sample_rate
+        self._drums = DRUMS
+        self.bars = [parse_pattern(p, DRUMS) for p in bars]
+        self._rendered = [None] * len(self.bars)
+        self._lock = threading.Lock()
+        self._bpm = float(bpm)
+        self._swing = float(swing)
+        self.renders = 0        # nb de mesures rendues (les boucles suivantes sont gratuites)
+        self._thread = None
+        self._stop = threading.Event()
+        self._handles = []
+
+    # ------------------------------------------------------------ réglages
+    @property
+    def bpm(self):
+        return self._bpm
+
+    @bpm.setter
+    def bpm(self, value):
+        with self._lock:
+            self._bpm = float(value)
+            self._rendered = [None] * len(self.bars)
+
+    @property
+    def swing(self):
+        return self._swing
+
+    @swing.setter
+    def swing(self, value):
+        with self._lock:
+            self._swing = float(value)
+            self._rendered = [None] * len(self.bars)
+
+    def set_bar(self, index, pattern):
+        """Remplace le motif d'une mesure ; seule celle-ci sera rendue à nouveau"""
+        grid = parse_pattern(pattern, self._drums)
+        with self._lock:
+            self.bars[index] = grid
+            self._rendered[index] = None
+
+    def set_step(self, index, drum, step, velocity=ACCENT):
+        """Allume (ou éteint avec velocity=0) un pas d'une mesure"""
+        with self._lock:
+            grid = self.bars[index]
+            n_steps = len(next(iter(grid.values())))
+            steps = grid.get(drum)
+            steps = np.zeros(n_steps, dtype=np.float32) if steps is None else steps.copy()
+            steps[step] = velocity
+            self.bars[index] = dict(grid, **{drum: steps})
+            self._rendered[index] = None
+
+    # --------------------------------------------------------------- rendu
+    def step_length(self):
+        """Durée d'un pas, en échantillons (non arrondie)"""
+        return self.sample_rate * 60.0 / self._bpm / STEPS_PER_BEAT
+
+    def bar_length(self, index):
+        n_steps = len(next(iter(self.bars[index].values())))
+        return int(round(n_steps * self.step_length()))
+
+    def step_offsets(self, n_steps):
+        """Début de chaque pas dans la mesure, swing compris (échantillons)"""
+        step = self.step_length()
+        positions = np.arange(n_steps) * step
+        positions[1::2] += self._swing * step
+        return np.rint(positions).astype(np.int64)
+
+    def render_bar(self, index):
+        """Tampon de la mesure (dtype de synthèse), résonance finale comprise (mis en cache)"""
+        with self._lock:
+            buf = self._rendered[index]
+            if buf is None:
+                buf = self._render(self.bars[index])
+                self._rendered[index] = buf
+                self.renders += 1
+            return buf
+
+    def _render(self, grid):
+        n_steps = len(next(iter(grid.values())))
+        offsets = self.step_offsets(n_steps)
+        waves = {drum: self.batterie.drum_wave(drum) for drum in grid}
+        total = int(round(n_steps * self.step_length())) + max(len(w) for w in waves.values())
+        buf = np.zeros(total, dtype=np.float64)
+        for drum, velocities in grid.items():
+            hits = np.flatnonzero(velocities)
+            if not len(hits):
+                continue
+            wave = waves[drum]
+            # toutes les frappes du fût d'un coup : indices (frappes x échantillons)
+            idx = offsets[hits, None] + np.arange(len(wave))
+            weights = velocities[hits, None] * wave
+            buf += np.bincount(idx.ravel(), weights=weights.ravel(), minlength=total)
+        # np.bincount additionne toujours en float64 : une seule conversion, par mesure
+        return buf.astype(get_dtype())
+
+    def render(self, loops=1):
+        """Rendu hors ligne de `loops` tours de toutes les mesures (pour un WAV)"""
+        order = [i for _ in range(loops) for i in range(len(self.bars))]
+        starts = np.cumsum([0] + [self.bar_length(i) for i in order])
+        rendered = [self.render_bar(i) for i in order]
+        out = np.zeros(max(s + len(b) for s, b in zip(starts, rendered)), dtype=get_dtype())
+        for start, bar in zip(starts, rendered):
+            out[start:start + len(bar)] += bar
+        return out
+
+    # ------------------------------------------------------------- lecture
+    def play(self, loops=None, gain=None):
+        """Joue les mesures en boucle dans le flux audio, sans bloquer
+
+        loops : nombre de tours (None = jusqu'à stop()). Chaque mesure est
+        programmée à l'échantillon près, une mesure à l'avance ; une mesure
+        modifiée pendant la lecture est prise en compte au tour suivant.
+        """
+        from flux_audio import get_stream
+        self.stop()
+        if gain is None:
+            player = self.batterie.player
+            gain = player.volume if player is not None else 1.0
+        stream = get_stream(self.sample_rate)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(stream, loops, gain),
+                                        name="sequenceur", daemon=True)
+        self._thread.start()
+        return self
+
+    def _wait_until(self, stream, frame):
+        while stream.now() < frame and not self._stop.is_set():
+            if stream.clock.virtual:
+                stream.clock.sleep(0.005)  # c'est cette attente qui fait avancer le flux
+            else:
+                self._stop.wait(0.005)
+
+    def _loop(self, stream, loops, gain):
+        first = stream.enqueue(self.render_bar(0), gain)
+        self._handles = [first]
+        start, index, played = first.start, 0, 1
+        total = None if loops is None else loops * len(self.bars)
+        while not self._stop.is_set() and (total is None or played < total):
+            next_start = start + self.bar_length(index)
+            index = (index + 1) % len(self.bars)
+            handle = stream.schedule(self.render_bar(index), next_start, gain)
+            self._handles = self._handles[-1:] + [handle]
+            played += 1
+            # on attend que cette mesure commence avant de programmer la suivante
+            self._wait_until(stream, start)
+            start = next_start
+        self._wait_until(stream, self._handles[-1].end)
+
+    def is_playing(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for handle in self._handles:
+            handle.stop()
+        self._handles = []
+
+
+def main():
+    import argparse
+    import os
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    from Instrument import Batterie
+
+    parser = argparse.ArgumentParser(description="Boîte à rythmes pas à pas")
+    parser.add_argument("--bpm", type=float, default=100)
+    parser.add_argument("--swing", type=float, default=0.0)
+    parser.add_argument("--loops", type=int, default=4, help="nombre de tours du motif")
+    parser.add_argument("--wav", help="écrit le rendu dans ce fichier au lieu de le jouer")
+    args = parser.parse_args()
+
+    if args.wav:
+        from rendu import ecrire_wav, VOLUME
+        batterie = Batterie(None)
+        seq = DrumSequencer(batterie, DEMO, args.bpm, args.swing)
+        tone = seq.render(args.loops)
+        ecrire_wav(args.wav, tone, batterie.sample_rate, VOLUME)
+        print(f"✅ {args.wav} : {len(tone) / batterie.sample_rate:.1f} s, "
+              f"{seq.renders} mesures rendues")
+        return
+
+    from MusicPlayer_base_original import MusicPlayer
+    batterie = Batterie(MusicPlayer())
+    seq = DrumSequencer(batterie, DEMO, args.bpm, args.swing)
+    print(f"🥁 {args.bpm:g} BPM, swing {args.swing:g}, {args.loops} tours (Ctrl+C pour arrêter)")
+    try:
+        seq.play(args.loops).wait()
+    except KeyboardInterrupt:
+        seq.stop()
+    print(f"{seq.renders} mesures rendues pour {args.loops * len(DEMO)} jouées")
+
+
+if __name__ == "__main__":
+    main()
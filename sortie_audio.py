@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Sortie audio interchangeable et horloges.
+
+Tout ce qui touche la carte son (ouverture du mixer, création des sons,
+canal du flux continu) et toutes les attentes (durée d'une note, silences,
+fenêtres du Guitar Hero) passent par le backend courant :
+
+- PygameBackend (défaut) : pygame.mixer et l'horloge réelle ;
+- NullBackend : aucune carte son. Chaque son « joué » est noté avec son
+  instant (en mémoire, et dans un fichier JSON lines si `capture` est donné),
+  et l'horloge est par défaut une VirtualClock : une attente de 3 minutes
+  avance l'horloge sans dormir. Le Menu, les partitions et le jeu tournent
+  alors à la vitesse du processeur, avec une sortie reproductible.
+
+Sélection par variable d'environnement, avant le premier son :
+
+    MUSIC_AUDIO=null MUSIC_AUDIO_CAPTURE=capture.jsonl python Menu.py
+
+ou dans le code : set_backend(NullBackend()).
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import zlib
+from collections import deque, namedtuple
+
+import numpy as np
+
+
+POLL = 0.005        # s entre deux vérifications pendant une attente
+MAX_EVENTS = 10000  # sons gardés en mémoire par le backend null de MUSIC_AUDIO
+
+# Un son passé à la « carte son » : instant de début (s, horloge du backend),
+# origine ("sound" = Sound.play, "stream" = bloc du flux continu), nb de trames,
+# volume, somme de contrôle des échantillons int16 et échantillons (ou None)
+PlayEvent = namedtuple("PlayEvent", "time source frames volume crc32 samples")
+
+
+# ---------------------------------------------------------------- horloges
+class RealClock:
+    """Temps réel (time.monotonic), les attentes dorment vraiment"""
+    virtual = False
+
+    def now(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def sleep_until(self, instant):
+        self.sleep(instant - self.now())
+
+
+class VirtualClock:
+    """Temps simulé : une attente avance l'horloge immédiatement
+
+    Les objets inscrits par add_listener() (le flux continu) sont réveillés à
+    chaque avance, et aussi à chacun des instants qu'ils demandent
+    (next_wakeup()) en chemin : un sleep(180) fait jouer le flux bloc par
+    bloc, exactement comme en temps réel, sans attendre.
+    """
+    virtual = True
+
+    def __init__(self, start=0.0):
+        self._now = float(start)
+        self._lock = threading.RLock()
+        self._listeners = []
+
+    def now(self):
+        return self._now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.advance_to(self._now + max(0.0, seconds))
+
+    def sleep_until(self, instant):
+        self.advance_to(instant)
+
+    def advance_to(self, instant):
+        with self._lock:
+            while True:
+                step = instant
+                for listener in self._listeners:
+                    wakeup = listener.next_wakeup()
+                    if wakeup is not None and self._now < wakeup < step:
+                        step = wakeup
+                self._now = max(self._now, step)
+                for listener in list(self._listeners):
+                    listener.advance(self._now)
+                if self._now >= instant:
+                    return
+
+    def add_listener(self, listener):
+        """listener.next_wakeup() -> instant ou None ; listener.advance(instant)"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+
+# ---------------------------------------------------------------- pygame
+class PygameBackend:
+    name = "pygame"
+
+    def __init__(self, clock=None):
+        self.clock = clock or RealClock()
+
+    def init(self, sample_rate=44100):
+        """Ouvre la carte son si ce n'est pas déjà fait"""
+        import pygame
+        if not pygame.mixer.get_init():
+            pygame.mixer.init(frequency=sample_rate, size=-16, channels=2)
+
+    def make_sound(self, pcm):
+        """Son jouable d'un tableau int16 (N, 2) ; les échantillons sont copiés"""
+        import pygame
+        return pygame.sndarray.make_sound(pcm)
+
+    def reserve_channel(self):
+        """Canal réservé au flux continu (jamais pris par Sound.play())"""
+        import pygame
+        pygame.mixer.set_reserved(1)
+        return pygame.mixer.Channel(0)
+
+    def close(self):
+        pass
+
+
+# ------------------------------------------------------------------ null
+class NullSound:
+    """Équivalent de pygame.mixer.Sound qui ne fait que noter ses lectures"""
+
+    def __init__(self, backend, pcm):
+        self.backend = backend
+        self.frames = len(pcm)
+        self.crc32 = zlib.crc32(np.ascontiguousarray(pcm).tobytes())
+        # copie comme pygame : le tampon d'origine retourne souvent à la réserve
+        self.samples = np.array(pcm) if backend.keep_samples else None
+        self.volume = 1.0
+
+    def play(self):
+        self.backend._record(self.backend.clock.now(), "sound", self)
+
+    def stop(self):
+        pass
+
+    def set_volume(self, value):
+        self.volume = float(value)
+
+    def get_volume(self):
+        return self.volume
+
+    def get_length(self):
+        return self.frames / self.backend.sample_rate
+
+
+class NullChannel:
+    """Canal du flux continu : un son en cours et un en attente, comme pygame
+
+    L'occupation suit l'horloge du backend : un bloc joué à t occupe le canal
+    jusqu'à t + durée, le bloc en attente démarre exactement à la fin du
+    précédent.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._end = 0.0
+        self._queued = None
+
+    def _promote(self):
+        if self._queued is not None and self.backend.clock.now() >= self._end:
+            sound, self._queued = self._queued, None
+            self._start(sound, self._end)
+
+    def _start(self, sound, at):
+        self._end = at + sound.get_length()
+        self.backend._record(at, "stream", sound)
+
+    def play(self, sound):
+        self._queued = None
+        self._start(sound, self.backend.clock.now())
+
+    def queue(self, sound):
+        self._promote()
+        if self.get_busy():
+            self._queued = sound
+        else:
+            self._start(sound, max(self._end, self.backend.clock.now()))
+
+    def get_busy(self):
+        self._promote()
+        return self.backend.clock.now() < self._end
+
+    def get_queue(self):
+        self._promote()
+        return self._queued
+
+    def busy_until(self):
+        """Fin du son en cours (s), pour réveiller une VirtualClock à cet instant"""
+        self._promote()
+        return self._end
+
+    def stop(self):
+        self._queued = None
+        self._end = min(self._end, self.backend.clock.now())
+
+
+class NullBackend:
+    name = "null"
+
+    def __init__(self, clock=None, capture=None, keep_samples=True, max_events=None):
+        """capture : fichier JSON lines où écrire chaque son joué (None = mémoire seule)
+
+        keep_samples : garde les échantillons de chaque son (pour mixdown()) ;
+        à désactiver pour les longues simulations, seules les sommes de
+        contrôle sont alors gardées. max_events : seuls les derniers sons
+        restent en mémoire (None = tous), le fichier de capture a tout.
+        """
+        self.clock = clock or VirtualClock()
+        self.keep_samples = keep_samples
+        self.sample_rate = 44100
+        self.events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._capture = open(capture, "w", encoding="utf-8") if capture else None
+
+    def init(self, sample_rate=44100):
+        self.sample_rate = sample_rate
+
+    def make_sound(self, pcm):
+        return NullSound(self, pcm)
+
+    def reserve_channel(self):
+        return NullChannel(self)
+
+    def _record(self, at, source, sound):
+        event = PlayEvent(at, source, sound.frames, sound.volume, sound.crc32, sound.samples)
+        with self._lock:
+            self.events.append(event)
+            if self._capture is not None:
+                self._capture.write(json.dumps({
+                    "t": round(at, 6), "source": source, "frames": sound.frames,
+                    "volume": sound.volume, "crc32": sound.crc32,
+                }) + "\n")
+
+    def mixdown(self, source=None):
+        """Tout ce qui a été joué, mélangé sur une ligne de temps : float32 (N, 2), -1..1
+
+        source : "sound" ou "stream" pour ne garder qu'une origine.
+        """
+        events = [e for e in self.events if source is None or e.source == source]
+        if any(e.samples is None for e in events):
+            raise ValueError("Échantillons non gardés (keep_samples=False)")
+        sr = self.sample_rate
+        starts = [int(round(e.time * sr)) for e in events]
+        out = np.zeros((max((s + e.frames for s, e in zip(starts, events)), default=0), 2),
+                       dtype=np.float32)
+        for start, event in zip(starts, events):
+            out[start:start + event.frames] += event.samples * np.float32(event.volume / 32767)
+        return out
+
+    def close(self):
+        with self._lock:
+            if self._capture is not None:
+                self._capture.close()
+                self._capture = None
+
+
+# -------------------------------------------------------- backend courant
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _from_env():
+    name = os.environ.get("MUSIC_AUDIO", "pygame")
+    if name == "null":
+        backend = NullBackend(capture=os.environ.get("MUSIC_AUDIO_CAPTURE") or None,
+                              keep_samples=False, max_events=MAX_EVENTS)
+        atexit.register(backend.close)
+        return backend
+    if name != "pygame":
+        raise ValueError(f"Backend audio inconnu : {name} (pygame ou null)")
+    return PygameBackend()
+
+
+def get_backend():
+    """Backend partagé par tout le processus (MUSIC_AUDIO au premier usage)"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _from_env()
+        return _backend
+
+
+def set_backend(backend):
+    """Change de backend ; à faire avant de créer instruments et claviers
+
+    Le flux continu et les sons du cache partagé, liés à l'ancien backend,
+    sont abandonnés.
+    """
+    global _backend
+    from flux_audio import close_stream
+    from cache_sons import shared_cache
+    close_stream()
+    shared_cache.clear()
+    with _backend_lock:
+        _backend = backend
+    return backend
+
+
+def get_clock():
+    return get_backend().clock
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Synthèse vectorisée d'une séquence entière de notes.
+
+Au lieu d'un linspace/sin par note (phase remise à zéro à chaque note, donc
+des clics), toute la séquence est calculée d'un bloc : la phase de début de chaque
+note cumule les cycles des notes précédentes (phase continue), chaque
+échantillon y ajoute l'incrément de sa note fois son rang, puis on prend le
+sinus. Le calcul avance par tranches de CHUNK échantillons pour que
+les tableaux temporaires restent petits, quelle que soit la longueur.
+
+Ce module fixe aussi la précision de calcul de toutes les ondes (instruments,
+enveloppes, mixage) : float32 par défaut, la sortie 16 bits n'a pas besoin de
+plus. set_dtype("float64") (ou MUSIC_DTYPE=float64) sert aux comparaisons.
+La phase, elle, est réduite à [0, 1[ cycle à partir de valeurs float64
+calculées sur peu de points (cycles()) : même en float32, une note de
+plusieurs minutes ne se désaccorde pas.
+"""
+import os
+
+import numpy as np
+
+
+SAMPLE_RATE = 44100
+FADE = 0.005       # rampe (s) à l'entrée et à la sortie des silences
+CHUNK = 1 << 16    # échantillons calculés par tranche
+PHASE_BLOCK = 1024  # cycles() : pas de la grille grossière de phase
+SLICE_NOTES = 256   # synthesize_sequence : au-delà, phase par sommes cumulées
+
+_dtype = np.dtype(os.environ.get("MUSIC_DTYPE", "float32"))
+
+
+def get_dtype():
+    """Précision (dtype NumPy) de toutes les ondes synthétisées"""
+    return _dtype
+
+
+def set_dtype(dtype):
+    global _dtype
+    dtype = np.dtype(dtype)
+    if dtype.kind != "f":
+        raise ValueError(f"Précision de synthèse invalide : {dtype}")
+    _dtype = dtype
+
+
+def time_axis(n, sample_rate=SAMPLE_RATE, dtype=None):
+    """Instants k / sr des n premiers échantillons (remplace linspace(0, d, n, False))"""
+    t = np.arange(n, dtype=dtype or _dtype)
+    t *= 1 / sample_rate
+    return t
+
+
+def cycles(freq, n, sample_rate=SAMPLE_RATE, dtype=None):
+    """Phase en cycles (partie fractionnaire, dans [0, 1[) de freq * k / sr
+
+    k = q * PHASE_BLOCK + r : les deux phases partielles sont calculées en
+    float64 sur n / PHASE_BLOCK + PHASE_BLOCK points seulement, réduites
+    modulo 1, puis additionnées dans le dtype de sortie. L'erreur reste de
+    l'ordre de l'epsilon du dtype, quelle que soit la longueur de la note.
+    """
+    dtype = dtype or _dtype
+    step = freq / sample_rate
+    rows = -(-n // PHASE_BLOCK)
+    coarse = np.arange(rows, dtype=np.float64) * (step * PHASE_BLOCK)
+    fine = np.arange(PHASE_BLOCK, dtype=np.float64) * step
+    coarse -= np.floor(coarse)
+    fine -= np.floor(fine)
+    out = np.empty((rows, PHASE_BLOCK), dtype=dtype)
+    np.add(coarse.astype(dtype)[:, None], fine.astype(dtype), out=out)
+    out = out.reshape(-1)[:n]
+    out -= np.floor(out)
+    return out
+
+
+def sine(freq, n, sample_rate=SAMPLE_RATE, dtype=None):
+    """sin(2 pi freq k / sr) dans le dtype de synthèse, calculé en place"""
+    wave = cycles(freq, n, sample_rate, dtype)
+    wave *= 2 * np.pi
+    return np.sin(wave, out=wave)
+
+
+def note_lengths(durations, sample_rate=SAMPLE_RATE):
+    """Nombre d'échantillons de chaque note (même arrondi que int(sr * durée))"""
+    return (np.asarray(durations, dtype=np.float64) * sample_rate).astype(np.int64)
+
+
+def synthesize_sequence(frequencies, durations, sample_rate=SAMPLE_RATE, dtype=None, out=None,
+                        articulate=False, fade=FADE):
+    """Sinusoïde à phase continue pour toute une séquence (fréquences, durées)
+
+    Une fréquence nulle ou NaN est un silence ; les notes voisines d'un silence
+    (ou du début/de la fin) reçoivent une rampe de `fade` s pour éviter les clics.
+    articulate=True : chaque note a sa rampe d'entrée et de sortie, deux notes
+    identiques qui se suivent s'entendent donc séparément. Renvoie un tableau mono
+    de `dtype` (défaut : get_dtype()) ou remplit `out`, de longueur sum(int(sr * durée)).
+    """
+    dtype = np.dtype(dtype or _dtype) if out is None else out.dtype
+    freqs = np.asarray(frequencies, dtype=np.float64)
+    lengths = note_lengths(durations, sample_rate)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    total = int(ends[-1]) if len(ends) else 0
+    if out is None:
+        out = np.empty(total, dtype=dtype)
+
+    rests = ~(freqs > 0)  # attrape aussi les NaN
+    # incrément de phase en cycles par échantillon (la phase est gardée en cycles)
+    increments = np.where(rests, 0.0, freqs / sample_rate)
+    # rampe d'entrée si la note précédente est un silence, de sortie si c'est la suivante
+    # (le début et la fin de la séquence comptent comme des silences)
+    fade_in = np.ones(len(freqs), dtype=bool)
+    fade_out = np.ones(len(freqs), dtype=bool)
+    if not articulate:
+        fade_in[1:] = rests[:-1]
+        fade_out[:-1] = rests[1:]
+    width = max(1, int(fade * sample_rate))
+
+    # phase (en cycles, réduite modulo 1) au premier échantillon de chaque note :
+    # les cycles des notes précédentes, cumulés en float64
+    spans = increments * lengths
+    spans -= np.floor(spans)
+    onsets = np.cumsum(spans)
+    onsets -= spans
+    onsets -= np.floor(onsets)
+
+    # tampons de travail réutilisés d'une tranche à l'autre
+    steps = np.arange(CHUNK, dtype=np.float64)
+    phase_buf = np.empty(CHUNK, dtype=np.float64)
+    whole = np.empty(CHUNK, dtype=np.float64)
+    frac = np.empty(CHUNK, dtype=dtype)
+
+    for c0 in range(0, total, CHUNK):
+        c1 = min(c0 + CHUNK, total)
+        n = c1 - c0
+        # notes touchées par la tranche, et leurs bornes dans la tranche
+        n0 = np.searchsorted(ends, c0, side="right")
+        n1 = np.searchsorted(ends, c1 - 1, side="right") + 1
+        first = np.maximum(starts[n0:n1], c0) - c0
+        last = np.minimum(ends[n0:n1], c1) - c0
+        played = np.flatnonzero(last > first)  # les notes de durée nulle n'ont pas d'échantillon
+        first, last, notes = first[played], last[played], played + n0
+        inc = increments[notes]
+
+        ph = phase_buf[:n]
+        if len(notes) <= SLICE_NOTES:
+            # note par note, en place : phase de début + incrément * rang de l'échantillon
+            for j, a, b in zip(notes.tolist(), first.tolist(), last.tolist()):
+                step = increments[j]
+                np.multiply(steps[:b - a], step, out=ph[a:b])
+                ph[a:b] += onsets[j] + step * (c0 + a - starts[j])
+        else:
+            # beaucoup de notes courtes : les sauts d'incrément aux débuts de notes
+            # (décalés d'un échantillon), une somme cumulée donne l'incrément de
+            # l'échantillon précédent, une seconde la phase
+            ph.fill(0.0)
+            ph[1:2] = inc[0]
+            jumps = first[1:] + 1
+            keep = jumps < n
+            ph[jumps[keep]] = np.diff(inc)[keep]
+            np.cumsum(ph, out=ph)
+            np.cumsum(ph, out=ph)
+            j = notes[0]
+            ph += onsets[j] + increments[j] * (c0 - starts[j])
+
+        # on ne garde que la partie fractionnaire (en float64) avant le sinus,
+        # ce qui préserve la précision même pour de très longues notes
+        ph -= np.floor(ph, out=whole[:n])
+        f = frac[:n]
+        np.multiply(ph, 2 * np.pi, out=f, casting="same_kind")
+        chunk = out[c0:c1]
+        np.sin(f, out=chunk)
+
+        silent = rests[notes]
+        if silent.any():
+            for a, b in zip(first[silent].tolist(), last[silent].tolist()):
+                chunk[a:b] = 0
+
+    # rampes sur les bords de notes voisins d'un silence (coût proportionnel
+    # au nombre de bords, pas à la longueur)
+    ramp = (np.arange(width, dtype=dtype) + 1) / width
+    _apply_ramps(out, starts[fade_in], ends[fade_in], ramp, rising=True)
+    _apply_ramps(out, starts[fade_out], ends[fade_out], ramp[::-1], rising=False)
+    return out
+
+
+def _apply_ramps(out, starts, ends, ramp, rising):
+    """Multiplie le début (rising) ou la fin de chaque note par la rampe, tranche par tranche"""
+    width = len(ramp)
+    for s, e in zip(starts.tolist(), ends.tolist()):
+        w = min(width, e - s)  # notes plus courtes que la rampe
+        if rising:
+            out[s:s + w] *= ramp[:w]
+        else:
+            out[e - w:e] *= ramp[width - w:]
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Étage de sortie commun : onde float -> int16 stéréo, sans copies inutiles.
+
+Avant, chaque note passait par vstack/column_stack, une transposée, un
+temporaire `32767 *`, un astype(int16) et un ascontiguousarray : environ six
+tableaux pleine longueur par note. Ici :
+
+- les tampons int16 (N, 2) C-contigus et les brouillons float32 viennent d'une
+  réserve (BufferPool) et y retournent dès que pygame a copié les échantillons ;
+- la conversion se fait en place (ufuncs avec out=) et le mono est diffusé sur
+  les deux canaux par broadcasting (np.copyto), sans tableau stéréo float ;
+- les tailles sont arrondies à la puissance de deux supérieure : une même
+  réserve sert à toutes les notes de durée voisine.
+
+shared_pool.stats() indique combien de demandes ont été servies sans allocation.
+"""
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+
+POOL_BYTES = 32 * 1024 * 1024   # mémoire gardée en réserve au repos
+MIN_FRAMES = 1024
+CHUNK = 1 << 16                 # conversion des longs signaux par morceaux
+
+
+def _capacity(n):
+    return max(MIN_FRAMES, 1 << max(0, int(n) - 1).bit_length())
+
+
+class BufferPool:
+    def __init__(self, max_bytes=POOL_BYTES):
+        self.max_bytes = max_bytes
+        self._free = {}          # (dtype, canaux, capacité) -> [tampons]
+        self._lock = threading.Lock()
+        self.pooled_bytes = 0
+        self.in_use = 0
+        self.requests = 0
+        self.reuses = 0
+        self.allocations = 0
+        self.discards = 0
+
+    def acquire(self, n, dtype=np.int16, channels=2):
+        """Vue C-contiguë (n, channels) — ou (n,) si channels=0 — d'un tampon de la réserve
+
+        Le contenu n'est pas remis à zéro.
+        """
+        dtype = np.dtype(dtype)
+        key = (dtype.str, channels, _capacity(n))
+        with self._lock:
+            self.requests += 1
+            self.in_use += 1
+            free = self._free.get(key)
+            if free:
+                base = free.pop()
+                self.pooled_bytes -= base.nbytes
+                self.reuses += 1
+                return base[:n]
+            self.allocations += 1
+        shape = (key[2], channels) if channels else (key[2],)
+        return np.empty(shape, dtype=dtype)[:n]
+
+    def release(self, view):
+        """Rend à la réserve un tampon obtenu par acquire()"""
+        base = view.base if view.base is not None else view
+        key = (base.dtype.str, base.shape[1] if base.ndim == 2 else 0, len(base))
+        with self._lock:
+            self.in_use -= 1
+            if self.pooled_bytes + base.nbytes > self.max_bytes:
+                self.discards += 1
+                return
+            self._free.setdefault(key, []).append(base)
+            self.pooled_bytes += base.nbytes
+
+    @contextmanager
+    def borrow(self, n, dtype=np.int16, channels=2):
+        buf = self.acquire(n, dtype, channels)
+        try:
+            yield buf
+        finally:
+            self.release(buf)
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
+            self.pooled_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "reuses": self.reuses,
+                "allocations": self.allocations,
+                "discards": self.discards,
+                "in_use": self.in_use,
+                "pooled_bytes": self.pooled_bytes,
+                "reuse_rate": self.reuses / self.requests if self.requests else 0.0,
+            }
+
+
+# Réserve commune à MusicPlayer, Instrument, Menu, flux_audio et rendu
+shared_pool = BufferPool()
+
+
+def fill_int16_stereo(tone, out, volume=1.0, pool=shared_pool):
+    """Écrit l'onde mono float (-1..1) dans `out`, int16 (N, 2), par morceaux et sans copie"""
+    scale = 32767 * volume
+    n = len(tone)
+    with pool.borrow(min(n, CHUNK), np.float32, 0) as scratch:
+        for start in range(0, n, CHUNK):
+            part = tone[start:start + CHUNK]
+            work = scratch[:len(part)]
+            np.multiply(part, scale, out=work, casting="same_kind")
+            np.clip(work, -32768, 32767, out=work)
+            # mono -> deux canaux par broadcasting, conversion int16 comprise
+            np.copyto(out[start:start + len(part)], work[:, None], casting="unsafe")
+    return out
+
+
+def to_int16_stereo(tone, volume=1.0):
+    """Onde mono float -> nouveau tableau int16 (N, 2) contigu (pour le garder, ex. cache)"""
+    return fill_int16_stereo(tone, np.empty((len(tone), 2), dtype=np.int16), volume)
+
+
+def make_sound(tone, volume=1.0, pool=shared_pool):
+    """Son jouable (pygame.mixer.Sound par défaut) d'une onde mono ; le tampon int16 retourne aussitôt à la réserve"""
+    from sortie_audio import get_backend
+    with pool.borrow(len(tone)) as pcm:
+        fill_int16_stereo(tone, pcm, volume, pool)
+        return get_backend().make_sound(pcm)  # make_sound copie les échantillons